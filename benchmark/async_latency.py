@@ -0,0 +1,79 @@
+"""
+AsyncSQLiteDataBaseに同時にタスクを投げたときの、1操作あたりのレイテンシ(p50/p99)の比較
+各タスクはinsert 1回 + idでのselect 4回を繰り返す
+
+実行:
+python -m benchmark.async_latency
+"""
+
+from pathlib import Path
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+
+import sql_module
+from sql_module import Field
+
+OPERATION_COUNT = 2000  # タスク全体での繰り返し回数
+READ_PER_WRITE = 4
+CONCURRENCY_LIST = [1, 8, 32, 128]
+
+
+class Bench(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.content_column = self.get_column("content", str, not_null=True)
+
+
+def percentile(latency_list: list[float], p: int) -> float:
+    """ミリ秒"""
+    return statistics.quantiles(latency_list, n=100)[p - 1] * 1000
+
+
+async def run(db_path: Path, concurrency: int) -> tuple[list[float], list[float], float]:
+    write_latency_list = []
+    read_latency_list = []
+
+    async with sql_module.AsyncSQLiteDataBase(db_path) as database:
+        bench = database.get_table_definition(Bench)
+        await bench.create()
+        max_id = await bench.insert(Field(bench.content_column, "うな"), is_returning_id=True)
+
+        async def worker(count: int):
+            nonlocal max_id
+            for i in range(count):
+                start = time.perf_counter()
+                max_id = await bench.insert(Field(bench.content_column, f"content {i}"), is_returning_id=True)
+                write_latency_list.append(time.perf_counter() - start)
+
+                for _ in range(READ_PER_WRITE):
+                    start = time.perf_counter()
+                    where = sql_module.conds.Eq(bench.id_column, random.randint(1, max_id))
+                    await bench.select(bench.content_column, where).fetchone_value()
+                    read_latency_list.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(OPERATION_COUNT // concurrency) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    return write_latency_list, read_latency_list, elapsed
+
+
+def main():
+    print(f"{'tasks':<8}{'ops/s':>10}{'write p50':>12}{'write p99':>12}{'read p50':>12}{'read p99':>12}  [ms]")
+    for concurrency in CONCURRENCY_LIST:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_latency_list, read_latency_list, elapsed = asyncio.run(
+                run(Path(tmp_dir) / "async_latency.db", concurrency)
+            )
+        operation_count = write_latency_list.__len__() + read_latency_list.__len__()
+        print(
+            f"{concurrency:<8}{operation_count / elapsed:>10,.0f}"
+            f"{percentile(write_latency_list, 50):>12.2f}{percentile(write_latency_list, 99):>12.2f}"
+            f"{percentile(read_latency_list, 50):>12.2f}{percentile(read_latency_list, 99):>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
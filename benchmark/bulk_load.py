@@ -0,0 +1,62 @@
+"""
+インデックスと外部キーのあるpostテーブルへの大量insertの、普通のbulk_insertとbulk_loadモードの比較
+
+実行:
+python -m benchmark.bulk_load
+"""
+
+from pathlib import Path
+import tempfile
+import time
+
+import sql_module
+
+from benchmark.schema import get_schema, regist_users, get_post_record_batch
+
+USER_COUNT = 1000
+CHUNK_COUNT = 10
+CHUNK_SIZE = 30000
+
+
+def elapsed_sec(db_path: Path, is_bulk_load: bool) -> float:
+    database = sql_module.SQLiteDataBase(db_path)
+    schema = get_schema(database)
+    schema.create()
+    user_id_list = regist_users(schema, USER_COUNT)
+    post = schema.post
+    post.create_index(post.date_column)
+    post.create_index([post.user_id_column, post.date_column])
+    post.create_index(post.lang_column)
+    record_batch_list = [
+        get_post_record_batch(schema, user_id_list, CHUNK_SIZE, start=i * CHUNK_SIZE, seed=i) for i in range(CHUNK_COUNT)
+    ]
+
+    start = time.perf_counter()
+    if is_bulk_load:
+        with post.bulk_load():
+            for record_batch in record_batch_list:
+                post.bulk_insert(record_batch)
+    else:
+        for record_batch in record_batch_list:
+            post.bulk_insert(record_batch)
+    elapsed = time.perf_counter() - start
+
+    count = post.select(sql_module.funcs.Count()).fetchone_value()
+    if count != CHUNK_COUNT * CHUNK_SIZE:
+        raise AssertionError(f"行数: {count}")
+    database.driver.close_full()
+    return elapsed
+
+
+def main():
+    row_count = CHUNK_COUNT * CHUNK_SIZE
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bulk_insert_sec = elapsed_sec(Path(tmp_dir) / "bulk_insert.db", False)
+        bulk_load_sec = elapsed_sec(Path(tmp_dir) / "bulk_load.db", True)
+    print(f"{'mode':<14}{'sec':>10}{'rows/s':>12}")
+    print(f"{'bulk_insert':<14}{bulk_insert_sec:>10.2f}{row_count / bulk_insert_sec:>12,.0f}")
+    print(f"{'bulk_load':<14}{bulk_load_sec:>10.2f}{row_count / bulk_load_sec:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+screen_nameの{名前: id}を作るときの、1件ずつinsert(DO NOTHING) + selectする場合と、bulk_upsertの比較
+半分は既にある名前
+
+実行:
+python -m benchmark.bulk_upsert
+"""
+
+from pathlib import Path
+import tempfile
+import time
+
+import sql_module
+from sql_module import Field, conds
+
+from benchmark.schema import ScreenName
+
+NAME_COUNT = 20000
+
+
+def get_screen_name(db_path: Path) -> ScreenName:
+    database = sql_module.SQLiteDataBase(db_path)
+    screen_name = database.get_table_definition(ScreenName)
+    screen_name.create()
+    # 偶数番目は既にある
+    screen_name.bulk_insert([[Field(screen_name.screen_name_column, f"user_{i}")] for i in range(0, NAME_COUNT, 2)])
+    return screen_name
+
+
+def one_by_one(screen_name: ScreenName, name_list: list[str]) -> dict[str, int]:
+    id_dict = {}
+    with screen_name.table.driver.transaction():
+        for name in name_list:
+            screen_name.insert(Field(screen_name.screen_name_column, name, upsert=True))
+            id_dict[name] = screen_name.select(
+                screen_name.id_column, conds.Eq(screen_name.screen_name_column, name)
+            ).fetchone_value()
+    return id_dict
+
+
+def bulk(screen_name: ScreenName, name_list: list[str]) -> dict[str, int]:
+    record_list = [[Field(screen_name.screen_name_column, name)] for name in name_list]
+    return screen_name.bulk_upsert(record_list, screen_name.screen_name_column)
+
+
+def main():
+    name_list = [f"user_{i}" for i in range(NAME_COUNT)]
+    print(f"{NAME_COUNT}件(半分は既存)")
+    print(f"{'mode':<14}{'sec':>10}")
+    id_dict_list = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode, func in [("one_by_one", one_by_one), ("bulk_upsert", bulk)]:
+            screen_name = get_screen_name(Path(tmp_dir) / f"{mode}.db")
+            start = time.perf_counter()
+            id_dict_list.append(func(screen_name, name_list))
+            print(f"{mode:<14}{time.perf_counter() - start:>10.3f}")
+            screen_name.table.driver.close_full()
+    if id_dict_list[0] != id_dict_list[1]:
+        raise AssertionError("結果が違います。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+複数プロセスから同じデータベースに書き込んだときの、'database is locked'での失敗数とリトライの集計
+timeout_secをわざと短くして競合させ、retry_policyなし/ありで比較する
+
+実行:
+python -m benchmark.busy_retry
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import sqlite3
+import tempfile
+
+import sql_module
+from sql_module import Field, conds
+
+PROCESS_COUNT = 4
+ROW_COUNT = 300  # プロセスごと
+TIMEOUT_SEC = 0.001
+
+
+class Bench(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.worker_column = self.get_column("worker", int, not_null=True)
+        self.count_column = self.get_column("count", int, not_null=True)
+
+
+def work(db_path: Path, worker: int, is_retry: bool) -> tuple[int, sql_module.RetryStats]:
+    retry_policy = sql_module.RetryPolicy(max_retry=10, base_sec=0.005) if is_retry else None
+    database = sql_module.SQLiteDataBase(db_path, timeout_sec=TIMEOUT_SEC, retry_policy=retry_policy)
+    bench = database.get_table_definition(Bench)
+
+    failure_count = 0
+    for i in range(ROW_COUNT):
+        try:
+            bench.insert([Field(bench.worker_column, worker), Field(bench.count_column, i)])
+            if i % 10 == 0:
+                where = conds.Eq(bench.worker_column, worker) & conds.Eq(bench.count_column, i)
+                bench.update(Field(bench.count_column, -i), where)
+        except sqlite3.OperationalError:
+            failure_count += 1
+            database.driver.rollback()
+    database.driver.close_full()
+    return failure_count, database.retry_stats
+
+
+def run(db_path: Path, is_retry: bool):
+    database = sql_module.SQLiteDataBase(db_path)
+    database.get_table_definition(Bench).create()
+    database.driver.close_full()
+
+    with ProcessPoolExecutor(PROCESS_COUNT) as executor:
+        future_list = [executor.submit(work, db_path, worker, is_retry) for worker in range(PROCESS_COUNT)]
+        result_list = [future.result() for future in future_list]
+
+    failure_count = sum(failure for failure, _ in result_list)
+    print(f"retry={is_retry}: 失敗 {failure_count} / {PROCESS_COUNT * ROW_COUNT}")
+    if not is_retry:
+        return
+
+    # プロセスごとの集計をまとめる
+    retry_stats = sql_module.RetryStats()
+    for _, worker_retry_stats in result_list:
+        retry_stats.merge(worker_retry_stats)
+    print(f"  total: {retry_stats.total}")
+    for title, counter_dict in [("table", retry_stats.table_dict), ("statement", retry_stats.statement_dict)]:
+        print(f"  {title}")
+        for name, counter in sorted(counter_dict.items(), key=lambda item: -item[1].retry_count):
+            print(
+                f"    retry {counter.retry_count:>5}  wait {counter.wait_sec:>7.3f}s"
+                f"  give up {counter.give_up_count:>3}  {name}"
+            )
+
+
+def main():
+    for is_retry in [False, True]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            run(Path(tmp_dir) / "busy_retry.db", is_retry)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+テキストカラムの部分一致(conds.Contains / EndsWith)の、LIKE(全件走査)と全文検索のテーブル(create_fts, trigram)の比較
+20万行の投稿本文(2000語からランダム)から、ヒットの多い語・普通の語・少ない語を引く。結果が同じことと、update / deleteがトリガーで同期されることも確認する
+
+実行:
+python -m benchmark.fts_search
+"""
+
+import random
+import time
+
+import sql_module
+from sql_module import RecordBatch, Field, Query, conds, funcs
+
+ROW_COUNT = 200000
+REPEAT = 5
+VOCABULARY_SIZE = 2000
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわん"
+COMMON_WORD_LIST = ["sqlite", "ラーメン"]
+# 条件ごとに、よくヒットする語・普通の語・レアな語
+SEARCH_WORD_DICT = {
+    "Contains": ["sqlite", "word123", "レアワード"],
+    "EndsWith": ["#199999", "999", "ーメン #12345"],
+}
+
+
+class Post(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.content_column = self.get_column("content", str, not_null=True)
+
+
+def get_vocabulary(rand: random.Random) -> list[str]:
+    return [
+        "".join(rand.choices(KANA, k=rand.randrange(2, 6))) + f"word{i}" for i in range(VOCABULARY_SIZE)
+    ] + COMMON_WORD_LIST * 100
+
+
+def get_content(rand: random.Random, vocabulary: list[str], i: int) -> str:
+    word_list = rand.choices(vocabulary, k=rand.randrange(3, 12))
+    if i % 50000 == 0:
+        word_list.append("レアワード")
+    return " ".join(word_list) + f" #{i}"
+
+
+def measure(post: Post, where: conds.Cond) -> tuple[float, list[int]]:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        id_list = post.select(post.id_column, where, order_by=None).fetchall()
+    return (time.perf_counter() - start) * 1000 / REPEAT, sorted(row[0] for row in id_list)
+
+
+def main():
+    database = sql_module.SQLiteDataBase()
+    post = database.get_table_definition(Post)
+    post.create()
+    rand = random.Random(0)
+    vocabulary = get_vocabulary(rand)
+    row_list = [(get_content(rand, vocabulary, i),) for i in range(ROW_COUNT)]
+    post.bulk_insert(RecordBatch([post.content_column], row_list=row_list))
+
+    start = time.perf_counter()
+    post.create_fts(post.content_column)
+    print(f"create_fts(trigram, {ROW_COUNT}行): {time.perf_counter() - start:.2f}s")
+
+    print(f"{'word':<14}{'hit':>8}{'like[ms]':>12}{'fts[ms]':>12}")
+    for cond_class in [conds.Contains, conds.EndsWith]:
+        print(cond_class.__name__)
+        for word in SEARCH_WORD_DICT[cond_class.__name__]:
+            like_ms, like_id_list = measure(post, cond_class(post.content_column, word))
+            fts_ms, fts_id_list = measure(post, cond_class(post.content_column, word, use_fts=True))
+            if like_id_list != fts_id_list:
+                raise AssertionError(f"{word}の結果が違います。")
+            print(f"{word:<14}{like_id_list.__len__():>8}{like_ms:>12.2f}{fts_ms:>12.2f}")
+
+    match_ms, match_id_list = measure(post, conds.Match(post.content_column, '"ラーメン" AND "word42"'))
+    print(f"Match('\"ラーメン\" AND \"word42\"'): hit {match_id_list.__len__()}, {match_ms:.2f}ms")
+
+    # トリガーでの同期
+    post.update(Field(post.content_column, "FTS同期チェック"), conds.Eq(post.id_column, 1))
+    post.bulk_query([Query("DELETE FROM post WHERE id = ", driver=database.driver) * 2])
+    for word in ["同期チェック", "sqlite"]:
+        like_count = post.select(funcs.Count(), conds.Contains(post.content_column, word)).fetchone_value()
+        fts_count = post.select(funcs.Count(), conds.Contains(post.content_column, word, use_fts=True)).fetchone_value()
+        if like_count != fts_count:
+            raise AssertionError(f"update / delete後の{word}の件数が違います。like: {like_count}, fts: {fts_count}")
+    print("update / delete後も一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+投稿ごとにscreen_name -> screen_name.idを引く場合の、1件ずつselectと、resolve_ids(LRUキャッシュ + INでまとめて引く)の比較
+投稿1000件ごとに、その中のscreen_nameをまとめて解決する。よく出てくるユーザーは偏っている
+
+実行:
+python -m benchmark.id_resolver
+"""
+
+from pathlib import Path
+import random
+import tempfile
+import time
+
+import sql_module
+from sql_module import Field, conds
+
+from benchmark.schema import ScreenName
+
+NAME_COUNT = 20000
+POST_COUNT = 100000
+CHUNK_SIZE = 1000
+
+
+def get_post_name_list() -> list[str]:
+    rand = random.Random(0)
+    # 一部のユーザーがたくさん投稿する
+    return [f"user_{int(rand.paretovariate(0.3)) % NAME_COUNT}" for _ in range(POST_COUNT)]
+
+
+def one_by_one(screen_name: ScreenName, post_name_list: list[str]) -> list[int]:
+    return [
+        screen_name.select(screen_name.id_column, conds.Eq(screen_name.screen_name_column, name)).fetchone_value()
+        for name in post_name_list
+    ]
+
+
+def resolve(screen_name: ScreenName, post_name_list: list[str]) -> list[int]:
+    id_list = []
+    for start in range(0, post_name_list.__len__(), CHUNK_SIZE):
+        name_chunk = post_name_list[start : start + CHUNK_SIZE]
+        id_dict = screen_name.resolve_ids(screen_name.screen_name_column, name_chunk, is_insert_missing=True)
+        id_list.extend(id_dict[name] for name in name_chunk)
+    return id_list
+
+
+def main():
+    post_name_list = get_post_name_list()
+    print(f"投稿{POST_COUNT}件, screen_name{NAME_COUNT}件")
+    print(f"{'mode':<14}{'sec':>10}")
+    id_list_list = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode, func in [("one_by_one", one_by_one), ("resolve_ids", resolve)]:
+            database = sql_module.SQLiteDataBase(Path(tmp_dir) / f"{mode}.db")
+            screen_name = database.get_table_definition(ScreenName)
+            screen_name.create()
+            screen_name.bulk_insert([[Field(screen_name.screen_name_column, f"user_{i}")] for i in range(NAME_COUNT)])
+
+            start = time.perf_counter()
+            id_list_list.append(func(screen_name, post_name_list))
+            print(f"{mode:<14}{time.perf_counter() - start:>10.3f}")
+            database.driver.close_full()
+    if id_list_list[0] != id_list_list[1]:
+        raise AssertionError("結果が違います。")
+
+    stats = screen_name.get_resolver_stats(screen_name.screen_name_column)
+    print(f"hit_rate: {stats.hit_rate:.3f}, average_batch_size: {stats.average_batch_size:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+conds.Inの値の渡し方(inline / json_each / temp_table)ごとの、キーの個数10, 1k, 100k, 1Mでのselectの時間
+100万行のテーブルのユニークカラムをINで引く(半分はテーブルにないキー)
+temp_tableは1回目(一時テーブルを作る)と2回目(使い回す)を分けて計測
+
+実行:
+python -m benchmark.in_strategy
+"""
+
+import random
+import time
+
+import sql_module
+from sql_module import RecordBatch, conds, funcs
+
+ROW_COUNT = 1000000
+KEY_COUNT_LIST = [10, 1000, 100000, 1000000]
+STRATEGY_LIST = ["inline", "json_each", "temp_table", "temp_table(2回目)", "auto"]
+
+
+class Item(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.key_column = self.get_column("key", str, not_null=True, unique=True)
+
+
+def measure_ms(item: Item, key_list: list[str], strategy: str) -> float:
+    start = time.perf_counter()
+    where = conds.In(item.key_column, key_list, strategy=strategy.removesuffix("(2回目)"))
+    item.select(funcs.Count(), where).fetchone_value()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    database = sql_module.SQLiteDataBase()
+    item = database.get_table_definition(Item)
+    item.create()
+    item.bulk_insert(RecordBatch([item.key_column], row_list=[(f"key{i}",) for i in range(ROW_COUNT)]))
+    max_variable_number = database.driver.get_max_variable_number()
+
+    rand = random.Random(0)
+    print(f"{'keys':>10}" + "".join(f"{strategy + '[ms]':>22}" for strategy in STRATEGY_LIST))
+    for key_count in KEY_COUNT_LIST:
+        key_list = [f"key{rand.randrange(ROW_COUNT * 2)}" for _ in range(key_count)]
+        text = f"{key_count:>10}"
+        for strategy in STRATEGY_LIST:
+            if strategy == "inline" and key_count > max_variable_number:
+                text += f"{'-':>22}"
+                continue
+            text += f"{measure_ms(item, key_list, strategy):>22.2f}"
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+advise_indexで、記録したワークロードからインデックスを提案させて、作る前と後で同じワークロードの時間を比べる
+10万行の投稿に対して
+- sourceで絞ってfavorite_countの範囲 / sourceで絞ってdateの新しい順 / sourceだけ -> (source, favorite_count)と(source, date)
+- まだダウンロードしていない(already_download = 0)もののうちuser_idで絞ってdate順 -> 部分インデックス
+- 使っていないlangのインデックスと、(date, favorite_count)の左端プレフィックスになっているdateのインデックス -> 消す(1行ずつのinsertが速くなる)
+提案をそのまま実行したあと、もう一度advise_indexすると作るものがないことも確認する
+
+実行:
+python -m benchmark.index_advisor
+"""
+
+import random
+import time
+
+import sql_module
+from sql_module import RecordBatch, Field, conds, OrderBy
+
+ROW_COUNT = 100000
+USER_COUNT = 1000
+REPEAT = 30
+SOURCE_LIST = ["Twitter for iPhone", "Twitter for Android", "Twitter Web App", "TweetDeck"]
+
+
+class Post(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.user_id_column = self.get_column("user_id", int, not_null=True)
+        self.source_column = self.get_column("source", str, not_null=True)
+        self.lang_column = self.get_column("lang", str, not_null=True)
+        self.date_column = self.get_column("date", int, not_null=True)
+        self.favorite_count_column = self.get_column("favorite_count", int, not_null=True)
+        self.already_download_column = self.get_column("already_download", int, not_null=True)
+
+
+def run_workload(database: sql_module.SQLiteDataBase, post: Post) -> float:
+    start = time.perf_counter()
+    for i in range(REPEAT):
+        source = SOURCE_LIST[i % SOURCE_LIST.__len__()]
+        post.select(
+            post.id_column,
+            conds.Eq(post.source_column, source) & conds.GreaterEq(post.favorite_count_column, 990),
+        ).fetchall()
+        post.select(
+            post.id_column,
+            conds.Eq(post.source_column, source),
+            order_by=OrderBy(post.date_column),
+            limit=10,
+        ).fetchall()
+        post.select(post.id_column, conds.Eq(post.source_column, source), limit=1).fetchall()
+        database.driver.execute(
+            "SELECT post.id FROM post WHERE post.already_download = 0 AND post.user_id = ? ORDER BY post.date",
+            (i,),
+        )
+        database.driver.fetchall()
+        post.insert(
+            [
+                Field(post.user_id_column, i),
+                Field(post.source_column, source),
+                Field(post.lang_column, "ja"),
+                Field(post.date_column, ROW_COUNT + i),
+                Field(post.favorite_count_column, 0),
+                Field(post.already_download_column, 0),
+            ]
+        )
+    return time.perf_counter() - start
+
+
+def main():
+    rand = random.Random(0)
+    database = sql_module.SQLiteDataBase()
+    post = database.get_table_definition(Post)
+    post.create()
+    column_list = [
+        post.user_id_column,
+        post.source_column,
+        post.lang_column,
+        post.date_column,
+        post.favorite_count_column,
+        post.already_download_column,
+    ]
+    row_list = [
+        (
+            rand.randrange(USER_COUNT),
+            rand.choice(SOURCE_LIST),
+            rand.choice(["ja", "en"]),
+            i,
+            rand.randrange(1000),
+            int(rand.random() < 0.95),
+        )
+        for i in range(ROW_COUNT)
+    ]
+    post.bulk_insert(RecordBatch(column_list, row_list=row_list))
+    post.create_index(post.lang_column)
+    post.create_index(post.date_column)
+    post.create_index([post.date_column, post.favorite_count_column], is_keep_order=True)
+
+    database.stats.reset()
+    before_sec = run_workload(database, post)
+    advice = database.advise_index()
+    print(advice)
+
+    for proposal in advice.create_list:
+        print(proposal.get_query())
+        database.driver.execute(proposal.get_query())
+    for proposal in advice.drop_list:
+        print(proposal.get_query())
+        database.driver.execute(proposal.get_query())
+    database.driver.commit()
+
+    database.stats.reset()
+    after_sec = run_workload(database, post)
+    print()
+    print(f"{'index':<10}{'sec':>10}")
+    print(f"{'before':<10}{before_sec:>10.3f}")
+    print(f"{'after':<10}{after_sec:>10.3f}")
+
+    advice = database.advise_index()
+    if advice.create_list.__len__() > 0:
+        raise AssertionError(f"まだ提案があります。\n{advice}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+bulk_insertのexecutemany(1行ずつ実行)と、複数行VALUES('INSERT ... VALUES (...), (...), ...')の比較
+カラム数の少ないテーブル・READMEのpost(13カラム)・カラムの多いテーブルで計測し、"auto"がどちらを選ぶかも表示する
+
+実行:
+python -m benchmark.multi_value_insert
+"""
+
+from pathlib import Path
+import tempfile
+import time
+
+import sql_module
+from sql_module import RecordBatch
+from sql_module.sqlite.table.insert.query_builder import InsertQueryBuilder
+
+from benchmark.schema import get_schema, regist_users, get_post_record_batch
+
+ROW_COUNT = 100000
+WIDE_COLUMN_COUNT = 60
+STRATEGY_LIST = ["executemany", "multi_value", "auto"]
+
+
+class Tag(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.name_column = self.get_column("name", str, not_null=True)
+        self.count_column = self.get_column("count", int, not_null=True)
+
+
+class Wide(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        # カラムは属性から集められるので1つずつ属性にする
+        for i in range(WIDE_COLUMN_COUNT):
+            setattr(self, f"v{i}_column", self.get_column(f"v{i}", int))
+
+
+def get_tag_record_batch(database: sql_module.SQLiteDataBase) -> tuple[sql_module.IDTableDefinition, RecordBatch]:
+    tag = database.get_table_definition(Tag)
+    tag.create()
+    row_list = [(f"tag{i}", i % 100) for i in range(ROW_COUNT)]
+    return tag, RecordBatch([tag.name_column, tag.count_column], row_list=row_list)
+
+
+def get_post_table_record_batch(
+    database: sql_module.SQLiteDataBase,
+) -> tuple[sql_module.IDTableDefinition, RecordBatch]:
+    schema = get_schema(database)
+    schema.create()
+    user_id_list = regist_users(schema, 100)
+    return schema.post, get_post_record_batch(schema, user_id_list, ROW_COUNT)
+
+
+def get_wide_record_batch(database: sql_module.SQLiteDataBase) -> tuple[sql_module.IDTableDefinition, RecordBatch]:
+    wide = database.get_table_definition(Wide)
+    wide.create()
+    row_list = [tuple(range(i, i + WIDE_COLUMN_COUNT)) for i in range(ROW_COUNT // 4)]
+    return wide, RecordBatch(
+        [getattr(wide, f"v{i}_column") for i in range(WIDE_COLUMN_COUNT)], row_list=row_list
+    )
+
+
+def rows_per_sec(db_path: Path, get_table_record_batch, strategy: str) -> float:
+    database = sql_module.SQLiteDataBase(db_path)
+    table_definition, record_batch = get_table_record_batch(database)
+
+    start = time.perf_counter()
+    table_definition.bulk_insert(record_batch, strategy=strategy)
+    elapsed = time.perf_counter() - start
+
+    count = table_definition.select(sql_module.funcs.Count()).fetchone_value()
+    if count != record_batch.__len__():
+        raise AssertionError(f"行数: {count}")
+    database.driver.close_full()
+    return record_batch.__len__() / elapsed
+
+
+def main():
+    table_list = [
+        ("tag(2)", get_tag_record_batch, 2),
+        ("post(13)", get_post_table_record_batch, 13),
+        (f"wide({WIDE_COLUMN_COUNT})", get_wide_record_batch, WIDE_COLUMN_COUNT),
+    ]
+    print(f"{'table(columns)':<16}" + "".join(f"{strategy + '[/s]':>18}" for strategy in STRATEGY_LIST) + "  auto")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for table_name, get_table_record_batch, column_count in table_list:
+            throughput_list = [
+                rows_per_sec(Path(tmp_dir) / f"{table_name}_{strategy}.db", get_table_record_batch, strategy)
+                for strategy in STRATEGY_LIST
+            ]
+            database = sql_module.SQLiteDataBase(Path(tmp_dir) / f"{table_name}_auto.db")
+            auto_strategy = InsertQueryBuilder(database.driver).get_bulk_strategy(column_count)
+            print(
+                f"{table_name:<16}"
+                + "".join(f"{throughput:>18,.0f}" for throughput in throughput_list)
+                + f"  {auto_strategy}"
+            )
+
+
+if __name__ == "__main__":
+    main()
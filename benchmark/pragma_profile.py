@@ -0,0 +1,86 @@
+"""
+PRAGMAのプロファイルごとの、READMEのpostテーブルでのinsert・selectのスループット
+read_replicaは書き込めないので、bulk_loadで作ったデータベースを読むだけ
+
+実行:
+python -m benchmark.pragma_profile
+"""
+
+from pathlib import Path
+import tempfile
+import time
+
+import sql_module
+from sql_module import Field, conds, funcs
+
+from benchmark.schema import get_schema, regist_users, get_post_record_batch
+
+USER_COUNT = 100
+INSERT_COUNT = 500  # 1行ずつコミット
+BULK_COUNT = 50000
+LOOKUP_COUNT = 3000
+AGGREGATE_COUNT = 30
+PROFILE_LIST = [None, "durable", "balanced", "bulk_load"]
+
+
+def per_sec(count: int, func) -> float:
+    start = time.perf_counter()
+    func()
+    return count / (time.perf_counter() - start)
+
+
+def measure_select(database: sql_module.SQLiteDataBase) -> tuple[float, float]:
+    post = get_schema(database).post
+
+    def lookup():
+        for i in range(LOOKUP_COUNT):
+            post.select(post.content_column, conds.Eq(post._post_id_column, i * 7 % BULK_COUNT)).fetchone_value()
+
+    def aggregate():
+        for _ in range(AGGREGATE_COUNT):
+            post.select([post.lang_column, funcs.Sum(post.favorite_count_column)], group_by=post.lang_column).fetchall()
+
+    return per_sec(LOOKUP_COUNT, lookup), per_sec(AGGREGATE_COUNT, aggregate)
+
+
+def measure(db_path: Path, profile: str | None) -> tuple[float, float, float, float]:
+    database = sql_module.SQLiteDataBase(db_path, pragma_profile=profile)
+    schema = get_schema(database)
+    schema.create()
+    user_id_list = regist_users(schema, USER_COUNT)
+    post = schema.post
+
+    record_batch = get_post_record_batch(schema, user_id_list, INSERT_COUNT, start=BULK_COUNT)
+    column_list = record_batch.column_list
+    record_list = [[Field(column, value) for column, value in zip(column_list, row)] for row in record_batch.iter_rows()]
+
+    def insert():
+        for record in record_list:
+            post.insert(record)
+
+    insert_throughput = per_sec(INSERT_COUNT, insert)
+    bulk_record_batch = get_post_record_batch(schema, user_id_list, BULK_COUNT)
+    bulk_throughput = per_sec(BULK_COUNT, lambda: post.bulk_insert(bulk_record_batch))
+    lookup_throughput, aggregate_throughput = measure_select(database)
+    database.driver.close_full()
+    return insert_throughput, bulk_throughput, lookup_throughput, aggregate_throughput
+
+
+def main():
+    print(f"{'profile':<14}{'insert[/s]':>12}{'bulk[/s]':>12}{'lookup[/s]':>12}{'aggregate[/s]':>15}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for profile in PROFILE_LIST:
+            db_path = Path(tmp_dir) / f"{profile}.db"
+            insert_throughput, bulk_throughput, lookup_throughput, aggregate_throughput = measure(db_path, profile)
+            print(
+                f"{str(profile):<14}{insert_throughput:>12,.0f}{bulk_throughput:>12,.0f}"
+                f"{lookup_throughput:>12,.0f}{aggregate_throughput:>15,.1f}"
+            )
+
+        database = sql_module.SQLiteDataBase(Path(tmp_dir) / "bulk_load.db", pragma_profile="read_replica")
+        lookup_throughput, aggregate_throughput = measure_select(database)
+        print(f"{'read_replica':<14}{'-':>12}{'-':>12}{lookup_throughput:>12,.0f}{aggregate_throughput:>15,.1f}")
+
+
+if __name__ == "__main__":
+    main()
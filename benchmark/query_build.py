@@ -0,0 +1,78 @@
+"""
+Queryの組み立て時間のマイクロベンチマーク
+要素数Nを倍々にしても、組み立て時間がだいたい倍々(線形)になっていればok
+
+実行:
+python -m benchmark.query_build
+"""
+
+import datetime
+import time
+
+import sql_module
+
+
+class Post(sql_module.AtIDTableDefinition):
+    def set_colmun_difinition(self):
+        self._post_id_column = self.get_column("_post_id", int, not_null=True, unique=True)
+        self.content_column = self.get_column("content", str, not_null=True)
+        self.date_column = self.get_column("date", datetime.datetime, not_null=True)
+
+
+def measure(func, repeat: int = 3) -> float:
+    """repeat回のうち最速の時間[s]"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(title: str, n_list: list[int], func):
+    print(title)
+    before = None
+    for n in n_list:
+        result = measure(lambda: func(n))
+        ratio = "" if before is None else f"  (x{result / before:.2f})"
+        print(f"  N={n:>7}: {result * 1000:10.3f}[ms]{ratio}")
+        before = result
+
+
+def main():
+    database = sql_module.SQLiteDataBase()
+    post: Post = database.get_table_definition(Post)
+    n_list = [1000, 2000, 4000, 8000, 16000]
+
+    # conds.In
+    def build_in(n: int):
+        where = sql_module.conds.In(post.id_column, list(range(n)))
+        where.measurement()
+
+    report("conds.In", n_list, build_in)
+
+    # Table.select (whereの要素数をNにする)
+    def build_select(n: int):
+        where = sql_module.conds.TRUE()
+        for i in range(n // 100):
+            where = where & sql_module.conds.Eq(post.id_column, i)
+        select = post.select([post.id_column, post.content_column], where, limit=10, is_execute=False)
+        select.measurement()
+
+    report("Table.select", n_list, build_select)
+
+    # InsertQueryBuilder.get_value_query (カラム数をNにする)
+    from sql_module.sqlite.table.insert.query_builder import InsertQueryBuilder
+
+    query_builder = InsertQueryBuilder(database.driver)
+
+    def build_value_query(n: int):
+        record = [sql_module.Field(post.content_column, f"content{i}") for i in range(n)]
+        value_query = query_builder.get_value_query(record)
+        value_query.measurement()
+
+    report("InsertQueryBuilder.get_value_query", n_list, build_value_query)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+WALモードのデータベースで、読み取り用コネクションプール(reader_count)を使ったときの読み取りスループットのスレッド数ごとの比較
+sqlite3はクエリ実行中にGILを手放すので、重めのクエリほどスレッド数に応じて伸びる
+
+実行:
+python -m benchmark.reader_pool
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import tempfile
+import time
+
+import sql_module
+
+ROW_COUNT = 200000
+QUERY_COUNT = 400
+THREAD_COUNT_LIST = [1, 2, 4, 8]
+
+
+class Bench(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.content_column = self.get_column("content", str, not_null=True)
+        self.number_column = self.get_column("number", int, not_null=True)
+
+
+def prepare(db_path: Path):
+    database = sql_module.SQLiteDataBase(db_path)
+    bench = database.get_table_definition(Bench)
+    bench.create()
+    bench.bulk_insert(
+        sql_module.RecordBatch(
+            [bench.content_column, bench.number_column],
+            column_value_list=[[f"content {i} ヤイヤイ" for i in range(ROW_COUNT)], list(range(ROW_COUNT))],
+        )
+    )
+    database.driver.close_full()
+
+
+def read(bench: Bench, i: int) -> int:
+    # インデックスの効かない集計で、sqlite側で時間を使うクエリ
+    where = sql_module.conds.GreaterEq(bench.number_column, i % 10)
+    select = bench.select(sql_module.funcs.Count(), where)
+    return select.driver.fetchone()[0]
+
+
+def throughput(db_path: Path, thread_count: int) -> float:
+    """1秒あたりの読み取りクエリ数"""
+    database = sql_module.SQLiteDataBase(db_path, reader_count=thread_count)
+    bench = database.get_table_definition(Bench)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(thread_count) as executor:
+        count_list = list(executor.map(lambda i: read(bench, i), range(QUERY_COUNT)))
+    elapsed = time.perf_counter() - start
+
+    if any(count == 0 for count in count_list):
+        raise AssertionError("読み取れていないクエリがあります。")
+    database.driver.close_full()
+    return QUERY_COUNT / elapsed
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "reader_pool.db"
+        prepare(db_path)
+
+        print(f"{'threads':<10}{'queries/s':>14}{'ratio':>8}")
+        base_throughput = None
+        for thread_count in THREAD_COUNT_LIST:
+            query_throughput = throughput(db_path, thread_count)
+            if base_throughput is None:
+                base_throughput = query_throughput
+            print(f"{thread_count:<10}{query_throughput:>14,.1f}{query_throughput / base_throughput:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+ダッシュボードのように同じ集計(langごとの件数、sourceごとのfavorite_countの合計)を何度も実行する場合の、select(is_cache=True)あり・なしの比較
+20万行の投稿に対して集計を120回。25回ごとにこのライブラリで1行insertし、50回ごとに別のコネクションから1行insertする(data_versionで気づく)
+結果が同じことも確認する
+
+実行:
+python -m benchmark.result_cache
+"""
+
+from pathlib import Path
+import random
+import sqlite3
+import tempfile
+import time
+
+import sql_module
+from sql_module import RecordBatch, Field, funcs
+
+ROW_COUNT = 200000
+REFRESH_COUNT = 120
+WRITE_INTERVAL = 25
+EXTERNAL_WRITE_INTERVAL = 50
+LANG_LIST = ["ja", "en", "ko", "zh", "und"]
+SOURCE_LIST = ["Twitter for iPhone", "Twitter for Android", "Twitter Web App"]
+
+
+class Post(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.lang_column = self.get_column("lang", str, not_null=True)
+        self.source_column = self.get_column("source", str, not_null=True)
+        self.favorite_count_column = self.get_column("favorite_count", int, not_null=True)
+
+
+def refresh(post: Post, is_cache: bool) -> tuple:
+    lang_count_list = post.select(
+        [post.lang_column, funcs.Count()], group_by=post.lang_column, is_cache=is_cache
+    ).fetchall()
+    source_sum_list = post.select(
+        [post.source_column, funcs.Sum(post.favorite_count_column)], group_by=post.source_column, is_cache=is_cache
+    ).fetchall()
+    return tuple(tuple(row) for row in lang_count_list), tuple(tuple(row) for row in source_sum_list)
+
+
+def run(db_path: Path, is_cache: bool) -> tuple[float, list[tuple], sql_module.SQLiteDataBase]:
+    database = sql_module.SQLiteDataBase(db_path)
+    post = database.get_table_definition(Post)
+    external_conn = sqlite3.connect(db_path)
+    result_list = []
+    start = time.perf_counter()
+    for i in range(REFRESH_COUNT):
+        if i % WRITE_INTERVAL == WRITE_INTERVAL - 1:
+            post.insert(
+                [
+                    Field(post.lang_column, "ja"),
+                    Field(post.source_column, SOURCE_LIST[0]),
+                    Field(post.favorite_count_column, 1),
+                ]
+            )
+        if i % EXTERNAL_WRITE_INTERVAL == EXTERNAL_WRITE_INTERVAL - 1:
+            external_conn.execute("INSERT INTO post (lang, source, favorite_count) VALUES ('en', 'Twitter Web App', 2)")
+            external_conn.commit()
+        result_list.append(refresh(post, is_cache))
+    sec = time.perf_counter() - start
+    external_conn.close()
+    database.driver.close_full()
+    return sec, result_list, database
+
+
+def main():
+    rand = random.Random(0)
+    row_list = [
+        (rand.choice(LANG_LIST), rand.choice(SOURCE_LIST), rand.randrange(1000)) for _ in range(ROW_COUNT)
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result_list_list = []
+        print(f"{'mode':<10}{'sec':>10}")
+        for is_cache in [False, True]:
+            db_path = Path(tmp_dir) / f"cache_{is_cache}.db"
+            database = sql_module.SQLiteDataBase(db_path)
+            post = database.get_table_definition(Post)
+            post.create()
+            column_list = [post.lang_column, post.source_column, post.favorite_count_column]
+            post.bulk_insert(RecordBatch(column_list, row_list=row_list))
+            database.driver.close_full()
+
+            sec, result_list, database = run(db_path, is_cache)
+            result_list_list.append(result_list)
+            print(f"{'cache' if is_cache else 'no_cache':<10}{sec:>10.3f}")
+        if result_list_list[0] != result_list_list[1]:
+            raise AssertionError("結果が違います。")
+        print(database.result_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+ベンチマークで使う、READMEと同じテーブル定義(screen_name, user, user_screen_name, post)と、投稿データの生成
+"""
+
+from dataclasses import dataclass
+import datetime
+import random
+
+import sql_module
+
+LANG_LIST = ["ja", "en", "ko", "zh", "und"]
+SOURCE_LIST = ["Twitter for iPhone", "Twitter for Android", "Twitter Web App"]
+WORD_LIST = ["うな", "ヤイヤイ", "音街", "ウナ", "ぬ", "sqlite", "python", "おはよう", "眠い", "ラーメン", "猫", "🐟"]
+
+
+class ScreenName(sql_module.AtIDTableDefinition):
+    def set_colmun_difinition(self):
+        self.screen_name_column = self.get_column("screen_name", str, not_null=True, unique=True)
+
+
+@dataclass
+class Schema:
+    database: sql_module.SQLiteDataBase
+    screen_name: ScreenName
+    user: sql_module.AtIDTableDefinition
+    user_screen_name: sql_module.AtIDTableDefinition
+    post: sql_module.AtIDTableDefinition
+
+    def create(self):
+        self.screen_name.create()
+        self.user.create()
+        self.user_screen_name.create(
+            sql_module.UniqueCompositeConstraint(
+                self.user_screen_name.user_id_column, self.user_screen_name.screen_name_id_column
+            )
+        )
+        self.post.create()
+
+
+def get_schema(database: sql_module.SQLiteDataBase) -> Schema:
+    screen_name = database.get_table_definition(ScreenName)
+
+    class User(sql_module.AtIDTableDefinition):
+        def set_colmun_difinition(self):
+            self._rest_id_column = self.get_column("_rest_id", str, not_null=True, unique=True)
+            self.current_name_column = self.get_column("current_name", str, not_null=True)
+            self.current_screen_name_id_column = self.get_column(
+                "current_screen_name_id", int, not_null=True, references=screen_name.id_column
+            )
+            self.description_column = self.get_column("description", str)
+            self.follows_count_column = self.get_column("follows_count", int)
+            self.followers_count_column = self.get_column("followers_count", int)
+
+    user = database.get_table_definition(User)
+
+    class UserScreenName(sql_module.AtIDTableDefinition):
+        def set_colmun_difinition(self):
+            self.user_id_column = self.get_column("user_id", int, not_null=True, references=user.id_column)
+            self.screen_name_id_column = self.get_column(
+                "screen_name_id", int, not_null=True, references=screen_name.id_column
+            )
+
+    user_screen_name = database.get_table_definition(UserScreenName)
+
+    class Post(sql_module.AtIDTableDefinition):
+        def set_colmun_difinition(self):
+            self._post_id_column = self.get_column("_post_id", int, not_null=True, unique=True)
+            self.user_id_column = self.get_column("user_id", int, not_null=True, references=user.id_column)
+            self.content_column = self.get_column("content", str, not_null=True)
+            self.date_column = self.get_column("date", datetime.datetime, not_null=True)
+            self.already_download_column = self.get_column("already_download", bool, default_value=False)
+            self.favorite_count_column = self.get_column("favorite_count", int, not_null=True)
+            self.quote_count_column = self.get_column("quote_count", int, not_null=True)
+            self.reply_count_column = self.get_column("reply_count", int, not_null=True)
+            self.retweet_count_column = self.get_column("retweet_count", int, not_null=True)
+            self.bookmark_count_column = self.get_column("bookmark_count", int, not_null=True)
+            self.view_count_column = self.get_column("view_count", int, not_null=True)
+            self.source_column = self.get_column("source", str, not_null=True)
+            self.lang_column = self.get_column("lang", str, not_null=True)
+
+    post = database.get_table_definition(Post)
+
+    return Schema(database, screen_name, user, user_screen_name, post)
+
+
+def regist_users(schema: Schema, user_count: int) -> list[int]:
+    """screen_name, user, user_screen_nameを登録して、userのidのリストを返す"""
+    screen_name_id_list = []
+    user_id_list = []
+    with schema.database.transaction():
+        for i in range(user_count):
+            screen_name_id = schema.screen_name.insert(
+                sql_module.Field(schema.screen_name.screen_name_column, f"user_{i}"), is_returning_id=True
+            ).fetch_id()
+            screen_name_id_list.append(screen_name_id)
+            user_id = schema.user.insert(
+                [
+                    sql_module.Field(schema.user._rest_id_column, str(10**15 + i)),
+                    sql_module.Field(schema.user.current_name_column, f"ユーザー{i}"),
+                    sql_module.Field(schema.user.current_screen_name_id_column, screen_name_id),
+                ],
+                is_returning_id=True,
+            ).fetch_id()
+            user_id_list.append(user_id)
+            schema.user_screen_name.insert(
+                [
+                    sql_module.Field(schema.user_screen_name.user_id_column, user_id),
+                    sql_module.Field(schema.user_screen_name.screen_name_id_column, screen_name_id),
+                ]
+            )
+    return user_id_list
+
+
+def get_post_record_batch(
+    schema: Schema, user_id_list: list[int], count: int, start: int = 0, seed: int = 0
+) -> sql_module.RecordBatch:
+    """投稿をcount行生成(_post_idはstartから連番)"""
+    post = schema.post
+    rand = random.Random(seed)
+    base_date = datetime.datetime(2024, 1, 1)
+    row_list = []
+    for i in range(start, start + count):
+        content = " ".join(rand.choices(WORD_LIST, k=rand.randint(3, 20)))
+        row_list.append(
+            (
+                i,
+                rand.choice(user_id_list),
+                f"{content} #{i}",
+                base_date + datetime.timedelta(seconds=i * 37),
+                rand.random() < 0.1,
+                rand.randint(0, 10000),
+                rand.randint(0, 100),
+                rand.randint(0, 500),
+                rand.randint(0, 3000),
+                rand.randint(0, 300),
+                rand.randint(0, 10**6),
+                rand.choice(SOURCE_LIST),
+                rand.choice(LANG_LIST),
+            )
+        )
+    column_list = [
+        post._post_id_column,
+        post.user_id_column,
+        post.content_column,
+        post.date_column,
+        post.already_download_column,
+        post.favorite_count_column,
+        post.quote_count_column,
+        post.reply_count_column,
+        post.retweet_count_column,
+        post.bookmark_count_column,
+        post.view_count_column,
+        post.source_column,
+        post.lang_column,
+    ]
+    return sql_module.RecordBatch(column_list, row_list=row_list)
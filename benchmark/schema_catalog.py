@@ -0,0 +1,92 @@
+"""
+Table.infoの、テーブルごとにPRAGMAを実行する(以前のやり方: table_info, foreign_key_list, index_list + カラム数 x インデックス数のindex_info)場合と
+schema_catalog(schema_versionが変わるまで使い回す)の比較。カラム20・インデックス8のテーブル50個
+結果のPRAGMAの中身が同じことも確認する
+
+実行:
+python -m benchmark.schema_catalog
+"""
+
+import time
+
+import sql_module
+
+TABLE_COUNT = 50
+COLUMN_COUNT = 20
+INDEX_COUNT = 8
+REPEAT = 5
+
+
+def create_schema(database: sql_module.SQLiteDataBase):
+    for i in range(TABLE_COUNT):
+        column_text = ", ".join(f"c{j} TEXT" for j in range(COLUMN_COUNT))
+        references_text = f", parent_id INTEGER REFERENCES t{i - 1}(id)" if i > 0 else ""
+        database.driver.execute(f"CREATE TABLE t{i} (id INTEGER PRIMARY KEY, {column_text}{references_text})")
+        for j in range(INDEX_COUNT):
+            column_name_text = f"c{j}" if j % 2 == 0 else f"c{j}, c{j + 1}"
+            database.driver.execute(f"CREATE INDEX t{i}_index{j} ON t{i} ({column_name_text})")
+    database.driver.commit()
+
+
+def fetch_by_pragma(driver, table_name: str) -> tuple:
+    """以前のInfoと同じ回数のPRAGMA"""
+
+    def fetchall(query: str) -> list[dict[str]]:
+        driver.execute(query)
+        return driver.fetchall(True)
+
+    raw_column_list = fetchall(f"PRAGMA table_info({table_name});")
+    raw_foreign_key_list = fetchall(f"PRAGMA foreign_key_list({table_name});")
+    raw_index_list = fetchall(f"PRAGMA index_list({table_name});")
+    raw_index_info_dict = {}
+    # get_index_counter(カラムごと) + get_multi_index_list
+    for _ in range(raw_column_list.__len__() + 1):
+        for raw_index in raw_index_list:
+            raw_index_info_dict[raw_index["name"]] = fetchall(f"PRAGMA index_info({raw_index['name']});")
+    return raw_column_list, raw_foreign_key_list, raw_index_list, raw_index_info_dict
+
+
+def main():
+    database = sql_module.SQLiteDataBase()
+    create_schema(database)
+    table_list = database.get_exists_table_list()
+
+    for table in table_list:
+        info = table.info()
+        if fetch_by_pragma(database.driver, table.name) != (
+            info.raw_column_list,
+            info.raw_foreign_key_list,
+            info.raw_index_list,
+            info.table_schema.raw_index_info_dict,
+        ):
+            raise AssertionError(f"{table.name}の情報が違います。")
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for table in table_list:
+            fetch_by_pragma(database.driver, table.name)
+    pragma_ms = (time.perf_counter() - start) * 1000 / REPEAT
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        database.driver.execute("CREATE TABLE dummy (id INTEGER)")  # schema_versionを変えて読み直させる
+        database.driver.execute("DROP TABLE dummy")
+        for table in table_list:
+            table.info()
+    cold_ms = (time.perf_counter() - start) * 1000 / REPEAT
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for table in table_list:
+            table.info()
+    warm_ms = (time.perf_counter() - start) * 1000 / REPEAT
+
+    print(f"テーブル{TABLE_COUNT}個のinfo()")
+    print(f"{'pragma(以前)':<20}{pragma_ms:>10.2f}ms")
+    print(f"{'catalog(読み直し)':<20}{cold_ms:>10.2f}ms")
+    print(f"{'catalog':<20}{warm_ms:>10.2f}ms")
+    print(database.schema_catalog.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+slow_query_logで、インデックスのないカラムでの検索(全件走査)が実行計画と一緒に記録され、フラグが立つことの確認
+20万行の投稿に対して、threshold_ms=5で
+- インデックスなしのuser_nameでselect -> SCAN postでフラグあり
+- user_nameにインデックスを作って同じselect -> 遅くなければ記録されない(記録されてもSEARCHなのでフラグなし)
+最後にログファイルの中身を表示する
+
+実行:
+python -m benchmark.slow_query_log
+"""
+
+from pathlib import Path
+import random
+import tempfile
+import time
+
+import sql_module
+from sql_module import RecordBatch, conds
+
+ROW_COUNT = 200000
+USER_COUNT = 1000
+SELECT_COUNT = 20
+
+
+class Post(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.user_name_column = self.get_column("user_name", str, not_null=True)
+        self.favorite_count_column = self.get_column("favorite_count", int, not_null=True)
+
+
+def select_loop(post: Post) -> float:
+    start = time.perf_counter()
+    for i in range(SELECT_COUNT):
+        post.select(post.favorite_count_column, conds.Eq(post.user_name_column, f"user{i}")).fetchall()
+    return time.perf_counter() - start
+
+
+def main():
+    rand = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = Path(tmp_dir) / "slow_query.log"
+        database = sql_module.SQLiteDataBase(slow_query_ms=5, slow_query_log_path=log_path)
+        post = database.get_table_definition(Post)
+        post.create()
+        row_list = [(f"user{rand.randrange(USER_COUNT)}", rand.randrange(1000)) for _ in range(ROW_COUNT)]
+        post.bulk_insert(RecordBatch([post.user_name_column, post.favorite_count_column], row_list=row_list))
+        database.slow_query_log.clear()
+
+        scan_sec = select_loop(post)
+        scan_count = database.slow_query_log.count
+        scan_flagged_count = database.slow_query_log.flagged_count
+
+        post.create_index(post.user_name_column)
+        database.slow_query_log.clear()
+        index_sec = select_loop(post)
+
+        print(f"{'mode':<10}{'sec':>10}{'slow':>10}{'flagged':>10}")
+        print(f"{'scan':<10}{scan_sec:>10.3f}{scan_count:>10}{scan_flagged_count:>10}")
+        print(
+            f"{'index':<10}{index_sec:>10.3f}{database.slow_query_log.count:>10}"
+            f"{database.slow_query_log.flagged_count:>10}"
+        )
+        if scan_flagged_count == 0:
+            raise AssertionError("全件走査にフラグが立っていません。")
+
+        print()
+        database.driver.close_full()
+        for line in log_path.read_text(encoding="utf-8").splitlines()[:2]:
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+conds.StartsWithがインデックスを使うかのチェック(EXPLAIN QUERY PLAN)と、前方一致検索の時間
+- LIKE :p0 || '%'(今まで通り): インデックスを使わずSCAN
+- is_range=True: 'col >= :p0 AND col < :p1'でSEARCH
+- collate="NOCASE"のカラム: 'col LIKE :p0 ESCAPE ...'でSEARCH
+インデックスが使われていなければAssertionError
+
+実行:
+python -m benchmark.starts_with_plan
+"""
+
+import random
+import time
+
+import sql_module
+from sql_module import RecordBatch, conds, funcs
+
+ROW_COUNT = 200000
+REPEAT = 200
+PREFIX_LIST = ["user_12", "ユーザー3", "user_%", "\U0010ffff"]
+
+
+class Account(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.screen_name_column = self.get_column("screen_name", str, not_null=True, unique=True)
+        self.nocase_screen_name_column = self.get_column("nocase_screen_name", str, not_null=True, collate="NOCASE")
+
+
+def get_plan(account: Account, where: conds.Cond) -> str:
+    select = account.select(account.id_column, where, is_execute=False)
+    return " / ".join(row["detail"] for row in select.view_plan())
+
+
+def measure_ms(account: Account, get_where) -> tuple[float, int]:
+    start = time.perf_counter()
+    for i in range(REPEAT):
+        count = account.select(funcs.Count(), get_where(f"user_{i % 100}")).fetchone_value()
+    return (time.perf_counter() - start) * 1000 / REPEAT, count
+
+
+def main():
+    database = sql_module.SQLiteDataBase()
+    account = database.get_table_definition(Account)
+    account.create()
+    account.create_index(account.nocase_screen_name_column)
+    rand = random.Random(0)
+    row_list = []
+    for i in range(ROW_COUNT):
+        screen_name = rand.choice(["user_", "ユーザー", "User_"]) + str(i)
+        row_list.append((screen_name, screen_name))
+    row_list.append(("user_%x", "user_%x"))
+    row_list.append(("\U0010ffffx", "\U0010ffffx"))
+    account.bulk_insert(RecordBatch([account.screen_name_column, account.nocase_screen_name_column], row_list=row_list))
+
+    case_dict = {
+        "like": lambda prefix: conds.StartsWith(account.screen_name_column, prefix),
+        "range": lambda prefix: conds.StartsWith(account.screen_name_column, prefix, is_range=True),
+        "nocase_like": lambda prefix: conds.StartsWith(account.nocase_screen_name_column, prefix),
+        "nocase_range": lambda prefix: conds.StartsWith(account.nocase_screen_name_column, prefix, is_range=True),
+    }
+    for name, get_where in case_dict.items():
+        plan = get_plan(account, get_where("user_12"))
+        print(f"{name:<14}{plan}")
+        if name != "like" and not ("SEARCH" in plan and "INDEX" in plan):
+            raise AssertionError(f"{name}: インデックスが使われていません。")
+
+    # 結果が正しいか(rangeはBINARYなので大文字小文字を区別する)
+    for prefix in PREFIX_LIST:
+        count_dict = {
+            name: account.select(funcs.Count(), get_where(prefix)).fetchone_value()
+            for name, get_where in case_dict.items()
+        }
+        expected_count = sum(1 for screen_name, _ in row_list if screen_name.startswith(prefix))
+        expected_nocase_count = sum(1 for screen_name, _ in row_list if screen_name.lower().startswith(prefix.lower()))
+        print(f"{prefix!r}: {count_dict}")
+        if count_dict["range"] != expected_count:
+            raise AssertionError(f"range: {count_dict['range']} != {expected_count}")
+        if not count_dict["nocase_like"] == count_dict["nocase_range"] == expected_nocase_count:
+            raise AssertionError(f"nocase: {count_dict} != {expected_nocase_count}")
+
+    print(f"{'mode':<14}{'ms/query':>10}")
+    for name, get_where in case_dict.items():
+        elapsed_ms, _ = measure_ms(account, get_where)
+        print(f"{name:<14}{elapsed_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
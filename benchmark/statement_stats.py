@@ -0,0 +1,64 @@
+"""
+database.stats(フィンガープリントごとの実行統計)のオーバーヘッド。1行ずつinsertするループ(1トランザクション)を、統計あり・なしで比較
+最後にreset()してから1回insertと100回selectしたときのtop(by="total_time")を表示する
+
+実行:
+python -m benchmark.statement_stats
+"""
+
+import time
+
+import sql_module
+from sql_module import Field, conds
+
+ROW_COUNT = 100000
+REPEAT = 5
+
+
+class Item(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.name_column = self.get_column("name", str, not_null=True)
+        self.count_column = self.get_column("count", int, not_null=True)
+
+
+def insert_loop(database: sql_module.SQLiteDataBase, item: Item) -> float:
+    start = time.perf_counter()
+    with database.transaction():
+        for i in range(ROW_COUNT):
+            item.insert([Field(item.name_column, f"item{i}"), Field(item.count_column, i)])
+    return time.perf_counter() - start
+
+
+def main():
+    database = sql_module.SQLiteDataBase()
+    item = database.get_table_definition(Item)
+    item.create()
+
+    sec_dict = {False: [], True: []}
+    # 交互に測って良いほうを取る
+    for _ in range(REPEAT):
+        for is_enabled in [False, True]:
+            database.stats.is_enabled = is_enabled
+            sec_dict[is_enabled].append(insert_loop(database, item))
+            item.bulk_query([sql_module.Query("DELETE FROM item", driver=database.driver)])
+
+    off_sec = min(sec_dict[False])
+    on_sec = min(sec_dict[True])
+    print(f"insert {ROW_COUNT}行")
+    print(f"{'stats':<10}{'sec':>10}{'us/row':>10}")
+    print(f"{'off':<10}{off_sec:>10.3f}{off_sec / ROW_COUNT * 1e6:>10.2f}")
+    print(f"{'on':<10}{on_sec:>10.3f}{on_sec / ROW_COUNT * 1e6:>10.2f}")
+    print(f"オーバーヘッド: {(on_sec / off_sec - 1) * 100:.1f}%")
+
+    database.stats.is_enabled = True
+    database.stats.reset()
+    insert_loop(database, item)
+    for i in range(100):
+        item.select(item.name_column, conds.Eq(item.count_column, i)).fetchall()
+    print()
+    for stats in database.stats.top(5, by="total_time"):
+        print(stats.to_dict())
+
+
+if __name__ == "__main__":
+    main()
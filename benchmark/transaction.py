@@ -0,0 +1,68 @@
+"""
+SCD2のregist_currentを1件ずつコミットする場合と、database.transaction()で1つのトランザクションにまとめた場合の比較
+ファイルのデータベース(WAL, DELETE)で計測。コミット(=fsync)の回数がそのまま効く
+
+実行:
+python -m benchmark.transaction
+"""
+
+from pathlib import Path
+import tempfile
+import time
+
+import sql_module
+from sql_module import Field, conds
+
+USER_COUNT = 200
+VERSION_COUNT = 3
+
+
+class UserName(sql_module.SCD2AtIDTableDefinition):
+    def set_colmun_difinition(self):
+        self._rest_id_column = self.get_column("_rest_id", str, not_null=True)
+        self.name_column = self.get_column("name", str, not_null=True)
+
+
+def regist_all(user_name: UserName):
+    for version in range(VERSION_COUNT):
+        for i in range(USER_COUNT):
+            where = conds.Eq(user_name._rest_id_column, f"rest{i}")
+            record = [Field(user_name._rest_id_column, f"rest{i}"), Field(user_name.name_column, f"name{i}-{version}")]
+            user_name.regist_current(where, record)
+
+
+def elapsed_sec(db_path: Path, is_wal_mode: bool, is_transaction: bool) -> float:
+    database = sql_module.SQLiteDataBase(db_path, is_wal_mode=is_wal_mode)
+    user_name = database.get_table_definition(UserName)
+    user_name.create()
+    user_name.create_is_current_unique_index(user_name._rest_id_column)
+
+    start = time.perf_counter()
+    if is_transaction:
+        with database.transaction("immediate"):
+            regist_all(user_name)
+    else:
+        regist_all(user_name)
+    elapsed = time.perf_counter() - start
+
+    count = user_name.select_current(sql_module.funcs.Count()).fetchone_value()
+    if count != USER_COUNT:
+        raise AssertionError(f"currentの行数: {count}")
+    database.driver.close_full()
+    return elapsed
+
+
+def main():
+    call_count = USER_COUNT * VERSION_COUNT
+    print(f"regist_current x {call_count}")
+    print(f"{'journal':<10}{'per-call[s]':>14}{'transaction[s]':>16}{'ratio':>8}")
+    for is_wal_mode in [True, False]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            per_call_sec = elapsed_sec(Path(tmp_dir) / "per_call.db", is_wal_mode, False)
+            transaction_sec = elapsed_sec(Path(tmp_dir) / "transaction.db", is_wal_mode, True)
+        journal_mode = "WAL" if is_wal_mode else "DELETE"
+        print(f"{journal_mode:<10}{per_call_sec:>14.3f}{transaction_sec:>16.3f}{per_call_sec / transaction_sec:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+値の変換(pythonの値 -> sqlの値)のスループット比較
+旧: get_sql_value(毎回型で分岐) / 新: ColumnConstraint.encoder(get_column時に型に特化したもの)
+
+実行:
+python -m benchmark.value_encode
+"""
+
+from pathlib import Path
+import datetime
+import time
+
+import sql_module
+
+N = 200000
+
+CASE_LIST = [
+    ("int", int, 114514),
+    ("bool", bool, True),
+    ("str", str, "うなっ😳"),
+    ("Path", Path, Path("/tmp/aaaaaaaa.db")),
+    ("bytes", bytes, b"\x00\x01\x02"),
+    ("datetime", datetime.datetime, datetime.datetime(2026, 1, 28, 3, 21, 53, 123456)),
+    ("date", datetime.date, datetime.date(2026, 1, 28)),
+    ("datetime(str)", datetime.datetime, "2026-01-28 03:21:53"),
+]
+
+
+def throughput(func, value) -> float:
+    """1秒あたりの変換数"""
+    start = time.perf_counter()
+    for _ in range(N):
+        func(value)
+    return N / (time.perf_counter() - start)
+
+
+def main():
+    database = sql_module.SQLiteDataBase()
+    table = database.get_table("bench")
+
+    print(f"{'type':<14}{'old[/s]':>14}{'new[/s]':>14}{'ratio':>8}")
+    for title, python_type, value in CASE_LIST:
+        column = table.get_column(title, python_type, not_null=True)
+
+        def old(python_value):
+            return sql_module.get_sql_value(python_value, python_type, is_not_null=True)
+
+        new = column.constraint.encoder
+        # 同じ値になっていること
+        old_value, new_value = old(value), new(value)
+        if old_value != new_value:
+            raise AssertionError(f"{title}: old={old_value!r}, new={new_value!r}")
+
+        old_throughput = throughput(old, value)
+        new_throughput = throughput(new, value)
+        print(f"{title:<14}{old_throughput:>14,.0f}{new_throughput:>14,.0f}{new_throughput / old_throughput:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
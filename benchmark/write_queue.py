@@ -0,0 +1,76 @@
+"""
+複数スレッドからinsertするときの、1行ごとにコミット(insertのデフォルト)とWriteQueue(まとめてコミット)のスループット比較
+WALモードとDELETEモードそれぞれで計測
+
+実行:
+python -m benchmark.write_queue
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import tempfile
+import time
+
+import sql_module
+from sql_module import Field
+
+ROW_COUNT = 4000
+PRODUCER_COUNT = 4
+
+
+class Bench(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.content_column = self.get_column("content", str, not_null=True)
+
+
+def produce(insert, producer_index: int):
+    for i in range(ROW_COUNT // PRODUCER_COUNT):
+        insert(f"content {producer_index}-{i}")
+
+
+def throughput(db_path: Path, is_wal_mode: bool, is_write_queue: bool) -> float:
+    """1秒あたりのinsert数"""
+    database = sql_module.SQLiteDataBase(db_path, is_wal_mode=is_wal_mode)
+    bench = database.get_table_definition(Bench)
+    bench.create()
+
+    if is_write_queue:
+        write_queue = database.get_write_queue()
+
+        def insert(content: str):
+            write_queue.insert(bench, Field(bench.content_column, content))
+
+    else:
+
+        def insert(content: str):
+            bench.insert(Field(bench.content_column, content))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(PRODUCER_COUNT) as executor:
+        list(executor.map(lambda i: produce(insert, i), range(PRODUCER_COUNT)))
+    if is_write_queue:
+        write_queue.close()
+    elapsed = time.perf_counter() - start
+
+    count = bench.select(sql_module.funcs.Count()).fetchone_value()
+    if count != ROW_COUNT:
+        raise AssertionError(f"行数: {count}")
+    database.driver.close_full()
+    return ROW_COUNT / elapsed
+
+
+def main():
+    print(f"{'journal':<10}{'per-row[/s]':>14}{'queue[/s]':>14}{'ratio':>8}")
+    for is_wal_mode in [True, False]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            per_row_throughput = throughput(Path(tmp_dir) / "per_row.db", is_wal_mode, False)
+            queue_throughput = throughput(Path(tmp_dir) / "queue.db", is_wal_mode, True)
+        journal_mode = "WAL" if is_wal_mode else "DELETE"
+        print(
+            f"{journal_mode:<10}{per_row_throughput:>14,.0f}{queue_throughput:>14,.0f}"
+            f"{queue_throughput / per_row_throughput:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,12 @@ from sql_module import exceptions
 from sql_module import utils
 
 # driver
+from sql_module.sqlite.retry import RetryPolicy, RetryStats
+from sql_module.sqlite.pragma import PRAGMA_PROFILE_DICT, get_pragma_dict
 from sql_module.sqlite.driver import Driver
 
 # value
-from sql_module.sqlite.table.value import get_sql_value
+from sql_module.sqlite.table.value import get_sql_value, get_sql_encoder, get_python_decoder, decode_row_list
 
 # query1
 from sql_module.sqlite.query import Query, query_join_comma, query_join_space
@@ -19,6 +21,7 @@ from sql_module.sqlite.table.expression import cond as conds
 # base1
 from sql_module.sqlite.table.column.column import Column
 from sql_module.sqlite.table.record.record import Field
+from sql_module.sqlite.table.record.batch import RecordBatch
 
 # expression2
 from sql_module.sqlite.table.expression.join.join import Join
@@ -45,4 +48,6 @@ from sql_module.sqlite.definition import (
     SCD2AtIDTableDefinition,
     SQLiteMaster,
 )
+from sql_module.sqlite.write_queue import WriteQueue
 from sql_module.sqlite.sqlite import SQLiteDataBase
+from sql_module.sqlite.async_sqlite import AsyncSQLiteDataBase, AsyncTable, AsyncSelect
@@ -28,3 +28,15 @@ class SQLTypeError(SQLException):
 
 class SQLValueError(SQLException):
     "そのPythonの値に対応するsqlite用の値がないときのエラー"
+
+
+class PoolTimeoutError(SQLException):
+    "コネクションプールの空きを待ちきれなかったときのエラー"
+
+
+class ForeignKeyViolationError(SQLException):
+    "PRAGMA foreign_key_checkで外部キー違反が見つかったときのエラー。reportに違反の一覧が入っている"
+
+    def __init__(self, message: str, report=None):
+        super().__init__(message)
+        self.report = report
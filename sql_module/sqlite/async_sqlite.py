@@ -0,0 +1,247 @@
+from pathlib import Path
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal, Callable, AsyncIterator, Self
+import asyncio
+import functools
+import sqlite3
+
+from sql_module import (
+    utils,
+    Column,
+    Field,
+    RecordBatch,
+    conds,
+    expressions,
+    Join,
+    OrderBy,
+    Insert,
+    Select,
+    Table,
+    TableDefinition,
+    CompositeConstraint,
+)
+from sql_module.sqlite.sqlite import SQLiteDataBase
+
+
+@dataclass
+class AsyncSQLiteDataBase:
+    """
+    asyncio用のSQLiteDataBase。awaitしている間はイベントループを止めない
+    書き込みは専用の書き込みスレッド1つで順番に、読み取りはreader_count個のスレッドで並列に実行する
+    中身は普通のSQLiteDataBase(reader_countのコネクションプール)で、QueryやQueryBuilderもそのまま使う
+
+    例:
+    async with sql_module.AsyncSQLiteDataBase("./test.db") as database:
+        post = database.get_table_definition(Post)
+        await post.insert([Field(post.content_column, "うな")])
+        async for row in post.select():
+            ...
+    """
+
+    db_path: Path | str  # スレッド間でコネクションを分けるので、インメモリデータベースは不可
+    is_wal_mode: bool = True
+    timeout_sec: int | float = 5
+    reader_count: int = 4
+
+    def __post_init__(self):
+        # 書き込みスレッドでもSELECT(existsなど)をするので、その分1つ多く読み取り用コネクションを用意する
+        self.database = SQLiteDataBase(self.db_path, self.is_wal_mode, self.timeout_sec, self.reader_count + 1)
+        self.driver = self.database.driver
+        self._writer_executor = ThreadPoolExecutor(1, thread_name_prefix="sql_module_writer")
+        self._reader_executor = ThreadPoolExecutor(self.reader_count, thread_name_prefix="sql_module_reader")
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def run_write(self, func: Callable, *args, **kwargs):
+        """funcを書き込みスレッドで実行してawaitする"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer_executor, functools.partial(func, *args, **kwargs))
+
+    async def run_read(self, func: Callable, *args, **kwargs):
+        """funcを読み取りスレッドで実行してawaitする"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._reader_executor, functools.partial(func, *args, **kwargs))
+
+    async def close(self):
+        # 実行中のものを待ってから閉じる
+        await self.run_write(lambda: None)
+        self._reader_executor.shutdown(wait=True)
+        self._writer_executor.shutdown(wait=True)
+        self.driver.close_full()
+
+    def get_table(self, name: str) -> "AsyncTable":
+        return AsyncTable(self, self.database.get_table(name))
+
+    def get_table_definition(self, table_definition_class: type, name: str | None = None) -> "AsyncTable":
+        """TableDefinitionを包んだAsyncTableを取得。カラムはpost.content_columnのようにそのまま参照できる"""
+        return AsyncTable(self, self.database.get_table_definition(table_definition_class, name))
+
+    async def get_exists_table_list(self) -> list[Table]:
+        return await self.run_read(self.database.get_exists_table_list)
+
+
+class AsyncTable:
+    def __init__(self, database: AsyncSQLiteDataBase, table: Table | TableDefinition):
+        """
+        TableかTableDefinitionのinsert, selectなどをawaitできるようにしたもの
+        書き込みは書き込みスレッド、selectのfetchは読み取りスレッドで実行する
+        """
+        self.database = database
+        self.table = table
+
+    def __getattr__(self, name: str) -> Column:
+        # カラムだけ素通しする(同期のメソッドを別スレッドのつもりで呼んでしまわないように)
+        attr = getattr(self.table, name)
+        if isinstance(attr, Column):
+            return attr
+        raise AttributeError(f"AsyncTableで使えるのはカラムとasyncのメソッドだけです: {name}")
+
+    async def create(
+        self,
+        composite_constraint: list[CompositeConstraint] | CompositeConstraint | None = None,
+        exists_ok: bool = True,
+        time_log: utils.LogLike | None = None,
+    ):
+        if isinstance(self.table, TableDefinition):
+            await self.database.run_write(self.table.create, composite_constraint, exists_ok, time_log=time_log)
+            return
+        raise TypeError("Tableのcreateはカラムのリストが必要なので、run_writeで実行してください。")
+
+    async def insert(
+        self,
+        record: list[Field] | Field,
+        is_returning_id: bool = False,
+        time_log: utils.LogLike | None = None,
+    ) -> int | None:
+        """行を挿入。is_returning_idならidを返す(fetch_idまで書き込みスレッドで済ませる)"""
+
+        def insert_sync() -> int | None:
+            insert: Insert = self.table.insert(record, is_returning_id=is_returning_id, time_log=time_log)
+            if is_returning_id:
+                return insert.fetch_id(time_log=time_log)
+            return None
+
+        return await self.database.run_write(insert_sync)
+
+    async def bulk_insert(
+        self,
+        record_list: list[list[Field]] | list[Field] | RecordBatch,
+        strategy: Literal["auto", "executemany", "multi_value"] = "auto",
+        is_returning_id: bool = False,
+        time_log: utils.LogLike | None = None,
+    ) -> list[int] | None:
+        return await self.database.run_write(
+            self.table.bulk_insert, record_list, strategy, is_returning_id, time_log=time_log
+        )
+
+    async def update(
+        self,
+        record: list[Field] | Field,
+        where: conds.Cond | None = None,
+        non_where_safe: bool = True,
+        time_log: utils.LogLike | None = None,
+    ):
+        await self.database.run_write(self.table.update, record, where, non_where_safe, time_log=time_log)
+
+    async def bulk_update(
+        self,
+        record_list: list[list[Field]] | list[Field] | RecordBatch,
+        where_list: list[conds.Cond] | None,
+        non_where_safe: bool = True,
+        time_log: utils.LogLike | None = None,
+    ):
+        await self.database.run_write(self.table.bulk_update, record_list, where_list, non_where_safe, time_log=time_log)
+
+    def select(
+        self,
+        expression: list[expressions.Expression | Literal[1]] | expressions.Expression | Literal[1] | None = None,
+        where: conds.Cond | None = None,
+        join: list[Join] | Join | None = None,
+        group_by: list[Column] | Column | None = None,
+        order_by: list[OrderBy] | OrderBy | None = None,
+        having: conds.Cond | None = None,
+        limit: int | None = None,
+        is_from: bool = True,
+        is_cache: bool = False,
+    ) -> "AsyncSelect":
+        """
+        selectを組み立てるだけ(まだ実行しない)。fetchall()などをawaitしたときに読み取りスレッドで実行する
+        await post.select(where=...).fetchall()
+        """
+        select = self.table.select(
+            expression, where, join, group_by, order_by, having, limit, is_from, is_execute=False, is_cache=is_cache
+        )
+        return AsyncSelect(self.database, select)
+
+
+class AsyncSelect:
+    def __init__(self, database: AsyncSQLiteDataBase, select: Select):
+        """
+        Selectをawaitできるようにしたもの。実行とfetchは同じ読み取りスレッドで行う(cursorはスレッドごとなので)
+        async for row in select: でも取り出せる
+        """
+        self.database = database
+        self.select = select
+
+    async def _run(self, fetch: Callable, time_log: utils.LogLike | None = None):
+        def run_sync():
+            self.select.execute(time_log=time_log)
+            return fetch()
+
+        return await self.database.run_read(run_sync)
+
+    async def fetchall(
+        self, dict_output: bool = False, time_log: utils.LogLike | None = None
+    ) -> list[dict[str]] | list[sqlite3.Row]:
+        return await self._run(lambda: self.select.fetchall(dict_output, time_log=time_log), time_log)
+
+    async def fetchmany(
+        self, limit: int, dict_output: bool = False, time_log: utils.LogLike | None = None
+    ) -> list[dict[str]] | list[sqlite3.Row]:
+        return await self._run(lambda: self.select.fetchmany(limit, dict_output, time_log=time_log), time_log)
+
+    async def fetchone(self, dict_output: bool = False, time_log: utils.LogLike | None = None) -> dict[str] | sqlite3.Row:
+        return await self._run(lambda: self.select.fetchone(dict_output, time_log=time_log), time_log)
+
+    async def fetchall_typed(
+        self, dict_output: bool = False, size: int = 1000, time_log: utils.LogLike | None = None
+    ) -> list[tuple] | list[dict[str]]:
+        return await self._run(lambda: self.select.fetchall_typed(dict_output, size, time_log=time_log), time_log)
+
+    async def fetchall_value_list(self, time_log: utils.LogLike | None = None) -> list[int | str | None]:
+        return await self._run(lambda: self.select.fetchall_value_list(time_log=time_log), time_log)
+
+    async def fetchone_value(self, time_log: utils.LogLike | None = None) -> int | str | None:
+        return await self._run(lambda: self.select.fetchone_value(time_log=time_log), time_log)
+
+    def __aiter__(self) -> AsyncIterator[sqlite3.Row]:
+        return self.iter_rows()
+
+    async def iter_rows(
+        self, size: int = 1000, dict_output: bool = False, typed: bool = False
+    ) -> AsyncIterator[sqlite3.Row] | AsyncIterator[dict[str]] | AsyncIterator[tuple]:
+        """1行ずつ取り出す。中身はiter_batchesなので、一度にメモリに載るのはsize行だけ"""
+        async for row_list in self.iter_batches(size, dict_output, typed):
+            for row in row_list:
+                yield row
+
+    async def iter_batches(
+        self, size: int = 1000, dict_output: bool = False, typed: bool = False
+    ) -> AsyncIterator[list[sqlite3.Row]] | AsyncIterator[list[dict[str]]] | AsyncIterator[list[tuple]]:
+        """sizeごとのかたまりを順に返す。かたまりごとに読み取りスレッドでfetchする"""
+
+        def start_sync():
+            # iter_batchesは呼んだときにこのスレッドで実行したcursorを掴むので、executeと同じスレッドで呼んで1つ目まで進めておく
+            self.select.execute()
+            batch_iterator = self.select.iter_batches(size, dict_output, typed)
+            return batch_iterator, next(batch_iterator, None)
+
+        batch_iterator, row_list = await self.database.run_read(start_sync)
+        while not row_list is None:
+            yield row_list
+            row_list = await self.database.run_read(next, batch_iterator, None)
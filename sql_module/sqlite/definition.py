@@ -11,6 +11,7 @@ from sql_module import (
     CompositeConstraint,
     Query,
     Field,
+    RecordBatch,
     conds,
     Join,
     OrderBy,
@@ -20,6 +21,8 @@ from sql_module import (
     utils,
     expressions,
 )
+from sql_module.sqlite.table.bulk_load import BulkLoad
+from sql_module.sqlite.id_resolver import IDResolverStats
 
 
 @dataclass
@@ -47,8 +50,9 @@ class TableDefinition:
         primary: bool = False,  # AUTO_INCREMENTは廃止されました。そのうちuuid対応するかも
         references: Column | None = None,
         default_value: str | int | bytes | Path | datetime.date | None = None,  # bool, datetime.datetime内包
+        collate: Literal["BINARY", "NOCASE", "RTRIM"] | None = None,  # NOCASEなら大文字小文字を区別しない(ASCIIのみ)
     ) -> Column:
-        return self.table.get_column(name, type, unique, not_null, primary, references, default_value)
+        return self.table.get_column(name, type, unique, not_null, primary, references, default_value, collate)
 
     def info(self, show: bool = False):
         """テーブルの生の声"""
@@ -64,9 +68,10 @@ class TableDefinition:
         is_unique: bool = False,
         where: conds.Cond | None = None,
         index_name: str | None = None,
+        is_keep_order: bool = False,
         time_log: utils.LogLike | None = None,
     ):
-        self.table.create_index(column_list, exists_ok, is_unique, where, index_name, time_log=time_log)
+        self.table.create_index(column_list, exists_ok, is_unique, where, index_name, is_keep_order, time_log=time_log)
 
     def delete_index(
         self,
@@ -74,9 +79,22 @@ class TableDefinition:
         not_exists_ok: bool = True,
         is_unique: bool = False,
         index_name: str | None = None,
+        is_keep_order: bool = False,
         time_log: utils.LogLike | None = None,
     ):
-        self.table.delete_index(column_list, not_exists_ok, is_unique, index_name, time_log=time_log)
+        self.table.delete_index(column_list, not_exists_ok, is_unique, index_name, is_keep_order, time_log=time_log)
+
+    def create_fts(
+        self,
+        column_list: list[Column] | Column,
+        tokenizer: Literal["trigram", "unicode61", "porter"] | str = "trigram",
+        exists_ok: bool = True,
+        time_log: utils.LogLike | None = None,
+    ):
+        self.table.create_fts(column_list, tokenizer, exists_ok, time_log=time_log)
+
+    def delete_fts(self):
+        self.table.delete_fts()
 
     def create(
         self,
@@ -100,12 +118,28 @@ class TableDefinition:
         insert = self.table.insert(record, is_execute, is_commit, is_returning_id, time_log=time_log)
         return insert
 
-    def bulk_insert(self, record_list: list[list[Field]] | list[Field], time_log: utils.LogLike | None = None):
-        self.table.bulk_insert(record_list, time_log=time_log)
+    def bulk_insert(
+        self,
+        record_list: list[list[Field]] | list[Field] | RecordBatch,
+        strategy: Literal["auto", "executemany", "multi_value"] = "auto",
+        is_returning_id: bool = False,
+        time_log: utils.LogLike | None = None,
+    ) -> list[int] | None:
+        return self.table.bulk_insert(record_list, strategy, is_returning_id, time_log=time_log)
+
+    def bulk_upsert(
+        self,
+        record_list: list[list[Field]] | list[Field] | RecordBatch,
+        key_column_list: list[Column] | Column,
+        returning_column_list: list[Column] | Column | None = None,
+        time_log: utils.LogLike | None = None,
+    ) -> dict:
+        """ナチュラルキーでバルクupsertして、{キー: id}の辞書を取得(既にあった行も含む)"""
+        return self.table.bulk_upsert(record_list, key_column_list, returning_column_list, time_log=time_log)
 
     def bulk_update(
         self,
-        record_list: list[list[Field]] | list[Field],
+        record_list: list[list[Field]] | list[Field] | RecordBatch,
         where_list: list[conds.Cond] | None,
         non_where_safe: bool = True,
         time_log: utils.LogLike | None = None,
@@ -115,6 +149,11 @@ class TableDefinition:
     def bulk_query(self, executable_query_list: list[Query], time_log: utils.LogLike | None = None):
         self.table.bulk_query(executable_query_list, time_log=time_log)
 
+    def bulk_load(
+        self, is_drop_unique: bool = False, is_raise_violation: bool = True, max_violation: int = 100
+    ) -> BulkLoad:
+        return self.table.bulk_load(is_drop_unique, is_raise_violation, max_violation)
+
     def update(
         self,
         record: list[Field] | Field,
@@ -141,11 +180,14 @@ class TableDefinition:
         limit: int | None = None,
         is_from: bool = True,
         is_execute: bool = True,
+        is_cache: bool = False,
         time_log: utils.LogLike | None = None,
     ) -> Select:
         select = self.table.select(
-            expression, where, join, group_by, order_by, having, limit, is_from, is_execute, time_log=time_log
+            expression, where, join, group_by, order_by, having, limit, is_from, is_execute, is_cache, time_log=time_log
         )
+        # 'SELECT *'でもfetchしたカラム名からpythonの型に戻せるように
+        select.set_column_dict(self._get_column_dict())
         return select
 
     def _get_create_column(self):
@@ -153,6 +195,9 @@ class TableDefinition:
         column_list = [attr for attr in attrs if isinstance(attr, Column)]
         return column_list
 
+    def _get_column_dict(self) -> dict[str, Column]:
+        return {column.name.name: column for column in self._get_create_column()}
+
 
 class IDTableDefinition(TableDefinition):
     """
@@ -172,6 +217,58 @@ class IDTableDefinition(TableDefinition):
     def set_colmun_difinition(self):
         pass
 
+    def resolve_ids(
+        self,
+        unique_column: Column,
+        value_list: list,
+        is_insert_missing: bool = False,
+        chunk_size: int = 1000,
+        time_log: utils.LogLike | None = None,
+    ) -> dict:
+        """
+        ユニークカラムの値からidを引いて{値: id}の辞書を取得。LRUキャッシュにあるものはselectしない
+        キャッシュにない値はchunk_size個ずつINでまとめて引き、is_insert_missingならそれでもない値をbulk_upsertで入れる
+        (is_insert_missingはunique_column以外のカラムがNULLでいいテーブルのみ)
+        is_insert_missingでなければ、テーブルにない値は辞書に入らない
+
+        screen_name_id_dict = screen_name.resolve_ids(screen_name.screen_name_column, ["yaiyai", "una"], is_insert_missing=True)
+        -> {'yaiyai': 1, 'una': 2}
+        """
+        resolver = self.table.driver.id_resolver_cache.get_resolver(self.table.name, unique_column.name.name)
+        id_dict, missing_value_list = resolver.get_many(value_list)
+        if missing_value_list.__len__() == 0:
+            return id_dict
+
+        timer = utils.Timer(time_log=time_log)
+        # SQLの値 -> 元の値
+        encoder = unique_column.constraint.encoder
+        missing_value_dict = {encoder(value): value for value in missing_value_list}
+        sql_result_dict = self.table.lookup_by_key(
+            unique_column, [(sql_value,) for sql_value in missing_value_dict], chunk_size=chunk_size
+        )
+        found_id_dict = {
+            missing_value_dict[sql_key[0]]: result[0]
+            for sql_key, result in sql_result_dict.items()
+            if sql_key[0] in missing_value_dict
+        }
+        resolver.stats.lookup_count += -(-missing_value_dict.__len__() // chunk_size)
+        resolver.stats.lookup_key_count += missing_value_dict.__len__()
+
+        if is_insert_missing:
+            insert_value_list = [value for value in missing_value_list if not value in found_id_dict]
+            if insert_value_list.__len__() > 0:
+                record_list = [[Field(unique_column, value)] for value in insert_value_list]
+                found_id_dict |= self.bulk_upsert(record_list, unique_column, time_log=time_log)
+                resolver.stats.insert_count += insert_value_list.__len__()
+
+        resolver.set_many(found_id_dict)
+        timer.finish("resolve_ids時間")
+        return id_dict | found_id_dict
+
+    def get_resolver_stats(self, unique_column: Column) -> IDResolverStats:
+        """resolve_idsのヒット率や、INで引いたキーの数の平均など"""
+        return self.table.driver.id_resolver_cache.get_resolver(self.table.name, unique_column.name.name).stats
+
 
 class AtIDTableDefinition(IDTableDefinition):
     """
@@ -222,15 +319,40 @@ class AtIDTableDefinition(IDTableDefinition):
 
     def bulk_insert(
         self,
-        record_list: list[list[Field]] | list[Field],
+        record_list: list[list[Field]] | list[Field] | RecordBatch,
+        strategy: Literal["auto", "executemany", "multi_value"] = "auto",
+        is_returning_id: bool = False,
+        time_log: utils.LogLike | None = None,
+    ) -> list[int] | None:
+        record_list2 = self._get_append_update_column_record_list(record_list)
+
+        return self.table.bulk_insert(record_list2, strategy, is_returning_id, time_log=time_log)
+
+    def bulk_upsert(
+        self,
+        record_list: list[list[Field]] | list[Field] | RecordBatch,
+        key_column_list: list[Column] | Column,
+        returning_column_list: list[Column] | Column | None = None,
         time_log: utils.LogLike | None = None,
-    ):
+    ) -> dict:
+        # updated_atがあるので、既にあった行はDO UPDATEでupdated_atが更新される
+        record_list2 = self._get_append_update_column_record_list(record_list)
+
+        return self.table.bulk_upsert(record_list2, key_column_list, returning_column_list, time_log=time_log)
+
+    def _get_append_update_column_record_list(
+        self, record_list: list[list[Field]] | list[Field] | RecordBatch
+    ) -> list[list[Field]] | RecordBatch:
+        # RecordBatchなら全行共通のカラムとして1つ足すだけ
+        if isinstance(record_list, RecordBatch):
+            now = datetime.datetime.now(datetime.timezone.utc)
+            return record_list.append_constant(Field(self.updated_at_column, now))
+
         record_list2 = []
         for record in record_list:
             record = self._get_append_update_column_record(record)
             record_list2.append(record)
-
-        self.table.bulk_insert(record_list2, time_log=time_log)
+        return record_list2
 
     def update(
         self,
@@ -251,15 +373,12 @@ class AtIDTableDefinition(IDTableDefinition):
 
     def bulk_update(
         self,
-        record_list: list[list[Field]] | list[Field],
+        record_list: list[list[Field]] | list[Field] | RecordBatch,
         where_list: list[conds.Cond] | None,
         non_where_safe: bool = True,
         time_log: utils.LogLike | None = None,
     ):
-        record_list2 = []
-        for record in record_list:
-            record = self._get_append_update_column_record(record)
-            record_list2.append(record)
+        record_list2 = self._get_append_update_column_record_list(record_list)
 
         self.table.bulk_update(record_list2, where_list, non_where_safe, time_log=time_log)
 
@@ -344,19 +463,20 @@ class SCD2AtIDTableDefinition(AtIDTableDefinition):
 
         where = update_unique_where & conds.Eq(self.is_current_column, True)
 
-        self.table.update(user_update_record, where, is_commit=False, time_log=time_log)
-        # 新版を追加
-        # + SCD系カラム
-        insert_record2 = insert_record.copy() + [
-            Field(self.valid_from_column, now),
-            Field(self.is_current_column, True),
-        ]
-        # + updated_at系カラム
-        insert_record3 = self._get_append_update_column_record(insert_record2, now=now)
-        # まだコミットしない(id拾うため)
-        insert = self.table.insert(insert_record3, is_returning_id=True, time_log=time_log)
-        # fetch_idでコミットされる
-        fetch_id = insert.fetch_id(time_log=time_log)
+        # 閉じるのと新版の追加は両方成功したときだけ反映(transactionのブロック内ならコミットはブロックを抜けるとき)
+        with self.table.driver.savepoint():
+            self.table.update(user_update_record, where, is_commit=False, time_log=time_log)
+            # 新版を追加
+            # + SCD系カラム
+            insert_record2 = insert_record.copy() + [
+                Field(self.valid_from_column, now),
+                Field(self.is_current_column, True),
+            ]
+            # + updated_at系カラム
+            insert_record3 = self._get_append_update_column_record(insert_record2, now=now)
+            # まだコミットしない(id拾うため)
+            insert = self.table.insert(insert_record3, is_returning_id=True, time_log=time_log)
+            fetch_id = insert.fetch_id(time_log=time_log)
 
         return fetch_id
 
@@ -371,6 +491,7 @@ class SCD2AtIDTableDefinition(AtIDTableDefinition):
         limit: int | None = None,
         is_from: bool = True,
         is_execute: bool = True,
+        is_cache: bool = False,
         time_log: utils.LogLike | None = None,
     ) -> Select:
         """whereにis_current_column=1の条件を追加してselect"""
@@ -380,8 +501,10 @@ class SCD2AtIDTableDefinition(AtIDTableDefinition):
         where = where & conds.Eq(self.is_current_column, True)
 
         select = self.table.select(
-            expression, where, join, group_by, order_by, having, limit, is_from, is_execute, time_log=time_log
+            expression, where, join, group_by, order_by, having, limit, is_from, is_execute, is_cache, time_log=time_log
         )
+        # 'SELECT *'でもfetchしたカラム名からpythonの型に戻せるように
+        select.set_column_dict(self._get_column_dict())
         return select
 
     def history(
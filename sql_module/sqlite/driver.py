@@ -3,8 +3,21 @@ from dataclasses import dataclass, field
 import sqlite3
 import time
 from typing import Self, Literal
+from collections.abc import Iterable, Iterator, Sized, Sequence, Callable
+import contextlib
+import threading
+import weakref
 
 from sql_module import utils, exceptions
+from sql_module.sqlite.statement_cache import StatementCache
+from sql_module.sqlite.pool import ReaderPool
+from sql_module.sqlite.retry import RetryPolicy, RetryStats
+from sql_module.sqlite.id_resolver import IDResolverCache
+from sql_module.sqlite.temp_value_table import TempValueTableCache, TempValueTable
+from sql_module.sqlite.schema_catalog import SchemaCatalog
+from sql_module.sqlite.result_cache import ResultCache, CachedCursor
+from sql_module.sqlite.statement_stats import StatementStatsRegistry
+from sql_module.sqlite.slow_query_log import SlowQueryLog
 
 
 @dataclass
@@ -33,11 +46,84 @@ class Driver:
     status: Status = field(default_factory=Status)
     conn: sqlite3.Connection | None = None
     cursor: sqlite3.Cursor | None = None
+    statement_cache: StatementCache = field(default_factory=StatementCache)
+    # 0なら1コネクションだけ。1以上なら書き込み用1つ + 読み取り用reader_count個のコネクションプール(スレッドごとに貸し出す)
+    reader_count: int = 0
+    # 新しいコネクションを開くたびに適用するPRAGMA
+    pragma_dict: dict[str, str | int] = field(default_factory=dict)
+    # set_pragma_dictで外したPRAGMAの、SQLiteのデフォルト(pragma_dictより先に適用する)
+    reset_pragma_dict: dict[str, str | int] = field(default_factory=dict)
+    # Noneならリトライしない('database is locked'はtimeout_sec待ってそのままraise)
+    retry_policy: RetryPolicy | None = None
+    retry_stats: RetryStats = field(default_factory=RetryStats)
+    # resolve_idsの{値: id}のキャッシュ
+    id_resolver_cache: IDResolverCache = field(default_factory=IDResolverCache)
+    # conds.In / NotInのtemp_tableの一時テーブル(書き込み用コネクションにある)
+    temp_value_table_cache: TempValueTableCache = field(default_factory=TempValueTableCache)
+    # テーブル・インデックスなどの情報(PRAGMA schema_versionが変わるまで使い回す)
+    schema_catalog: SchemaCatalog = field(default_factory=SchemaCatalog)
+    # Select(is_cache=True)の結果のキャッシュ
+    result_cache: ResultCache = field(default_factory=ResultCache)
+    # execute, executemanyのフィンガープリントごとの実行統計
+    statement_stats: StatementStatsRegistry = field(default_factory=StatementStatsRegistry)
+    # slow_query_log.threshold_ms以上かかったSQLを、EXPLAIN QUERY PLANと一緒にログに残す
+    slow_query_log: SlowQueryLog = field(default_factory=SlowQueryLog)
 
     def __post_init__(self):
         if self.database_file_path is None:
             self.database_file_path = ":memory:"
 
+        self._local = threading.local()  # スレッドごとの、最後に実行したcursorなど
+        self._streaming_cursor_set = weakref.WeakSet()  # iter_batchesで読んでいる途中のcursor(次のexecuteで閉じない)
+        # 書き込み用コネクションを複数スレッドから直列に使うため。トランザクション中はそのスレッドが持ち続ける(_update_write_owner)
+        self._write_lock = threading.RLock()
+        self.reader_pool = None
+        if self.reader_count > 0:
+            if self.database_file_path == ":memory:":
+                raise ValueError("インメモリデータベースではコネクションプールを使えません。")
+            self.reader_pool = ReaderPool(self._connect, self.reader_count, self.timeout_sec, self._apply_pragma)
+
+    @property
+    def is_pool(self) -> bool:
+        return not self.reader_pool is None
+
+    @property
+    def write_lock(self) -> threading.RLock:
+        """
+        書き込み用コネクションのロック。持っている間は他のスレッドの書き込みが割り込まない
+        書き込んでトランザクションが始まったら、そのスレッドがcommit, rollbackするまで持ち続ける
+        """
+        return self._write_lock
+
+    @property
+    def _transaction_depth(self) -> int:
+        """このスレッドのtransaction, savepointの入れ子の深さ。1以上ならcommit, rollbackは外側に任せる"""
+        return getattr(self._local, "transaction_depth", 0)
+
+    @_transaction_depth.setter
+    def _transaction_depth(self, transaction_depth: int):
+        self._local.transaction_depth = transaction_depth
+
+    @property
+    def is_write_owner(self) -> bool:
+        """このスレッドが書き込み用コネクションのトランザクションを持っている(commit, rollbackするまで他のスレッドは書き込めない)"""
+        return getattr(self._local, "is_write_owner", False)
+
+    def _update_write_owner(self):
+        """
+        書き込み用コネクションのロックの中で、実行・commit・rollbackのたびに呼ぶ
+        トランザクションが始まったら、このスレッドがcommit, rollbackするまでロックを持ち続ける
+        (他のスレッドの書き込みが途中に混ざったり、他のスレッドのcommit, rollbackで一緒に確定・取り消しされたり、
+        コミットしていない行を他のスレッドが書き込み用コネクションで読んだりしないように)
+        """
+        is_in_transaction = self.status.conn and self.conn.in_transaction
+        if is_in_transaction and not self.is_write_owner:
+            self._write_lock.acquire()
+            self._local.is_write_owner = True
+        elif not is_in_transaction and self.is_write_owner:
+            self._local.is_write_owner = False
+            self._write_lock.release()
+
     def __repr__(self) -> str:
         status_text = self.status.info_status_text()
         db_path_text = f"db_path: {self.database_file_path}"
@@ -49,8 +135,6 @@ class Driver:
         """
         if not self.status.conn:
             self.open_conn()
-            # これをしないと外部キー制約がオフになったまま(connect時毎回必要)
-            self.execute("PRAGMA foreign_keys = ON")
         if not self.status.cursor:
             self.open_cursor()
 
@@ -62,22 +146,86 @@ class Driver:
             self.close_cursor()
         if self.status.conn:
             self.close_conn()
+        if self.is_pool:
+            self.reader_pool.close_all()
+        self.slow_query_log.close()
 
     def open_conn(self):
-        self.conn = sqlite3.connect(self.database_file_path, timeout=self.timeout_sec)
-        self.conn.row_factory = sqlite3.Row  # sqlite3.Rowオブジェクトはdictと同等以上の機能があるが、row: sqlite3.Rowオブジェクトとしてisinstance(row, dict)ではFalseだった。isinstance(row, list)でもFalseだった。
+        self.conn = self._connect()
         self.status.conn = True
 
+    def _connect(self) -> sqlite3.Connection:
+        """新しいコネクションを開いて、PRAGMAを適用する。書き込み用・読み取り用どちらもこれで開く"""
+        conn = sqlite3.connect(
+            self.database_file_path,
+            timeout=self.timeout_sec,
+            check_same_thread=False,  # 書き込み用はself._write_lockで直列にするので、別スレッド(WriteQueueなど)からも使える
+        )
+        conn.row_factory = sqlite3.Row  # sqlite3.Rowオブジェクトはdictと同等以上の機能があるが、row: sqlite3.Rowオブジェクトとしてisinstance(row, dict)ではFalseだった。isinstance(row, list)でもFalseだった。
+        # これをしないと外部キー制約がオフになったまま(connect時毎回必要)
+        conn.execute("PRAGMA foreign_keys = ON")
+        self._apply_pragma(conn)
+        return conn
+
+    def _apply_pragma(self, conn: sqlite3.Connection):
+        """reset_pragma_dict, pragma_dictの順にPRAGMAを適用する(読み取り用コネクションはそのスレッドで)"""
+        for pragma_name, pragma_value in (self.reset_pragma_dict | self.pragma_dict).items():
+            conn.execute(f"PRAGMA {pragma_name} = {pragma_value}").fetchall()
+
+    def set_pragma(self, pragma_name: str, pragma_value: str | int):
+        """
+        PRAGMAを書き込み用コネクションに適用し、今後開くコネクション(再接続も)にも適用する
+        プールの読み取り用コネクションは、次のクエリのときにそのスレッドで適用する
+        """
+        with self._write_lock:
+            self.pragma_dict[pragma_name] = pragma_value
+            self.execute(f"PRAGMA {pragma_name} = {pragma_value}")
+        if self.is_pool:
+            self.reader_pool.reconfigure()
+
+    def set_pragma_dict(self, pragma_dict: dict[str, str | int]):
+        """
+        PRAGMAをpragma_dictに置き換える(set_pragmaと違って、pragma_dictにないものは前に設定していてもSQLiteのデフォルトに戻す)
+        適用する先はset_pragmaと同じ
+        """
+        with self._write_lock:
+            removed_name_list = [pragma_name for pragma_name in self.pragma_dict if not pragma_name in pragma_dict]
+            self.reset_pragma_dict |= self._get_default_pragma_dict(removed_name_list)
+            self.pragma_dict = dict(pragma_dict)
+            for pragma_name, pragma_value in (self.reset_pragma_dict | self.pragma_dict).items():
+                self.execute(f"PRAGMA {pragma_name} = {pragma_value}")
+        if self.is_pool:
+            self.reader_pool.reconfigure()
+
+    def _get_default_pragma_dict(self, pragma_name_list: list[str]) -> dict[str, str | int]:
+        """同じデータベースに開いた、PRAGMAを何も設定していないコネクションの値(busy_timeoutはtimeout_sec)"""
+        # インメモリだとmmap_sizeなどが返ってこないので、同じファイルに開く
+        conn = sqlite3.connect(self.database_file_path, timeout=self.timeout_sec)
+        try:
+            default_pragma_dict = {}
+            for pragma_name in pragma_name_list:
+                row = conn.execute(f"PRAGMA {pragma_name}").fetchone()
+                if not row is None:
+                    default_pragma_dict[pragma_name] = row[0]
+            return default_pragma_dict
+        finally:
+            conn.close()
+
     def close_conn(self):
         # cursorも無効化するべき
         if self.status.cursor:
             self.close_cursor()
         self.conn.close()
         self.status.conn = False
+        # コミットしていないものは閉じたら消えるので、持っていたロックも返す
+        if self.is_write_owner:
+            self._local.is_write_owner = False
+            self._write_lock.release()
+        self.temp_value_table_cache.clear()
+        self.result_cache.clear()
 
     def open_cursor(self):
         self.cursor = self.conn.cursor()
-        self.conn.execute("PRAGMA foreign_keys = ON")  # これをしないと外部キー制約がオフになったまま(connect時毎回必要)
         self.status.cursor = True
 
     def close_cursor(self):
@@ -85,51 +233,397 @@ class Driver:
         self.status.cursor = False
 
     def begin(self):
-        self.conn.execute("BEGIN")
+        with self._write_lock:
+            self.conn.execute("BEGIN")
+            self._update_write_owner()
+
+    @property
+    def is_in_transaction(self) -> bool:
+        """transaction, savepointのブロックの中かどうか"""
+        return self._transaction_depth > 0
+
+    @contextlib.contextmanager
+    def transaction(self, mode: Literal["deferred", "immediate", "exclusive"] = "deferred") -> Iterator[Self]:
+        """
+        ブロック内の書き込みを1つのトランザクションにまとめる。ブロック内のcommit(insertのis_commitなど)はブロックを抜けるまで待つ
+        例外で抜けたらロールバック。入れ子にするとsavepointになる
+        ブロックの間は書き込み用コネクションのロックを持つので、他のスレッドの書き込みは割り込まない(ブロックの外の書き込みも、commit, rollbackまでは同じ)
+        ブロックの前にコミットしていない書き込みがあったり、ブロック内でrollbackを呼んだらDefenseAccidentException
+
+        with driver.transaction("immediate"):
+            post.insert(...)
+            user.update(...)
+        """
+        with self._write_lock:
+            if self.is_in_transaction:
+                with self.savepoint():
+                    yield self
+                return
+
+            self.open_full()
+            # ブロックの前のコミットしていない書き込みまで、ブロックのcommit, rollbackに巻き込まないように
+            if self.conn.in_transaction:
+                raise exceptions.DefenseAccidentException(
+                    "コミットしていない書き込みがあります。transactionの前にcommitかrollbackしてください。"
+                )
+            self.execute(f"BEGIN {mode.upper()}")
+            self._transaction_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._transaction_depth = 0
+                self.rollback()
+                raise
+            self._transaction_depth = 0
+            self.commit()
+
+    @contextlib.contextmanager
+    def savepoint(self) -> Iterator[Self]:
+        """
+        トランザクション内で、例外で抜けたらこのブロックの分だけ取り消す。トランザクションの外ならtransactionと同じ
+        with driver.transaction():
+            for record in record_list:
+                try:
+                    with driver.savepoint():
+                        post.insert(record)
+                except sqlite3.IntegrityError:
+                    pass
+        """
+        with self._write_lock:
+            if not self.is_in_transaction:
+                with self.transaction():
+                    yield self
+                return
+
+            savepoint_name = f"sql_module_{self._transaction_depth}"
+            self.execute(f"SAVEPOINT {savepoint_name}")
+            self._transaction_depth += 1
+            try:
+                yield self
+            except BaseException:
+                # エラーによってはsqliteがトランザクションごとロールバックしている
+                if self.conn.in_transaction:
+                    self.execute(f"ROLLBACK TO {savepoint_name}")
+                # 取り消した行のidや、取り消したCREATEなどのスキーマをキャッシュしているかもしれない
+                self.id_resolver_cache.clear()
+                self.schema_catalog.clear()
+                self.temp_value_table_cache.sync(self.conn)
+                raise
+            finally:
+                self._transaction_depth -= 1
+                if self.conn.in_transaction:
+                    self.execute(f"RELEASE {savepoint_name}")
+
+    def run_transaction(
+        self, func: Callable[[], object], mode: Literal["deferred", "immediate", "exclusive"] = "immediate"
+    ):
+        """
+        funcをtransactionのブロック内で実行し、'database is locked'で失敗したらロールバックして最初からやり直す
+        (WALでdeferredのトランザクションが読み取りから書き込みに移れなかった場合など、文単位のリトライでは解決しないもの用)
+        リトライ回数はretry_policy.max_replay。funcは何回呼ばれても大丈夫なように作ること
+        """
+        retry_policy = self.retry_policy
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+
+        attempt = 0
+        while True:
+            try:
+                with self.transaction(mode):
+                    return func()
+            except sqlite3.OperationalError as e:
+                # 入れ子のときは外側のトランザクションごとやり直す必要がある
+                is_replayable = not self.is_in_transaction and retry_policy.is_retryable(e)
+                if not is_replayable or attempt >= retry_policy.max_replay:
+                    if attempt > 0:
+                        self.retry_stats.record_give_up("(transaction)")
+                    raise
+                wait_sec = retry_policy.get_wait_sec(attempt)
+                self.retry_stats.record_retry("(transaction)", wait_sec)
+                time.sleep(wait_sec)
+                attempt += 1
+
+    def _run_with_retry(self, statement: str, run: Callable[[], object]):
+        """retry_policyに従って、'database is locked'ならバックオフしてrunをやり直す"""
+        attempt = 0
+        while True:
+            try:
+                return run()
+            except sqlite3.OperationalError as e:
+                if self.retry_policy is None or not self.retry_policy.is_retryable(e):
+                    raise
+                if attempt >= self.retry_policy.max_retry:
+                    self.retry_stats.record_give_up(statement)
+                    raise
+                wait_sec = self.retry_policy.get_wait_sec(attempt)
+                self.retry_stats.record_retry(statement, wait_sec)
+                time.sleep(wait_sec)
+                attempt += 1
+
+    def get_cursor(self, query: str | None = None, is_writer_only: bool = False) -> sqlite3.Cursor:
+        """
+        queryを実行するcursorを取得。queryがNoneなら、このスレッドで最後に実行したcursor(execute_cachedならCachedCursor)
+        プール時は、SELECTなどの読み取りは読み取り用コネクション、それ以外とis_writer_only(In(temp_table)の一時テーブルを使うなど)は書き込み用コネクションのcursor
+        クエリごとに新しいcursorにするので、他のスレッドや、iter_batchesで読んでいる途中の結果を次のクエリで上書きしない
+        (このスレッドの前のcursorの残りの結果は、次のクエリの前に_release_cursorで捨てる)
+        """
+        if query is None:
+            return getattr(self._local, "cursor", self.cursor)
+        if self.is_pool and not is_writer_only and self._is_read_query(query):
+            # このスレッドが書き込み中なら、自分の書いたものが見えるように書き込み用コネクションで読む
+            if not self.is_write_owner:
+                return self.reader_pool.get_cursor()
+        return self.conn.cursor()
+
+    def _release_cursor(self):
+        """
+        このスレッドで最後に実行したcursorの残りの結果を捨てる(次のクエリを実行する前に)
+        読み終わっていないSELECTが残っていると、DROP TABLEなどが'database table is locked'になるので
+        iter_batchesで読んでいる途中のものはそのまま
+        """
+        cursor = getattr(self._local, "cursor", None)
+        if not isinstance(cursor, sqlite3.Cursor) or cursor is self.cursor or cursor in self._streaming_cursor_set:
+            return
+        with self._lock_for(cursor):
+            cursor.close()
+
+    def _rollback_failed_statement(self, cursor: sqlite3.Cursor, is_in_transaction: bool):
+        """
+        失敗した文が始めたトランザクション(sqlite3が書き込みの前に自動でBEGINしたもの)を取り消す
+        残すと、中身のないトランザクションでロックを持ったままになり、次のtransactionもDefenseAccidentExceptionになる
+        """
+        if cursor.connection is self.conn and not is_in_transaction and self.conn.in_transaction:
+            self.conn.rollback()
+
+    def get_max_variable_number(self) -> int:
+        """1つのクエリで使えるプレースホルダの最大数(SQLITE_MAX_VARIABLE_NUMBER)。ビルドによって違うので実行時に聞く"""
+        if getattr(self, "_max_variable_number", None) is None:
+            self.open_full()
+            self._max_variable_number = self.conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+        return self._max_variable_number
+
+    def get_description(self) -> tuple:
+        """このスレッドで最後に実行したcursorのdescription(カラム名など)"""
+        return self.get_cursor().description
+
+    def _is_read_query(self, query: str) -> bool:
+        head = query.lstrip()[:7].upper()
+        return head.startswith("SELECT") or head.startswith("EXPLAIN")
+
+    def _lock_for(self, cursor: sqlite3.Cursor) -> contextlib.AbstractContextManager:
+        """書き込み用コネクションは複数スレッドで共有しているのでロックする"""
+        if cursor.connection is self.conn:
+            return self._write_lock
+        return contextlib.nullcontext()
 
     def execute(
         self,
         query: str,
-        parameters: dict[str] | None = None,
+        parameters: dict[str] | tuple | None = None,
         time_log: utils.LogLike | None = None,
+        temp_value_table_list: list[TempValueTable] | None = None,
     ):
         """
         cursorを実行
 
         Args:
             query (str): クエリ
-            parameters (dict[str] | None): プレースホルダのパラメータ
+            parameters (dict[str] | tuple | None): プレースホルダのパラメータ。:p0形式ならdict, ?形式ならtuple
             time_log (ログ系オブジェクト | None): 時間計測のログ。
             - Noneなら出さない
             - 'print_log'ならprintだけする
             - ログ系オブジェクト(debugメソッドなどを持つ)なら、そのログを使う。
+            temp_value_table_list (list[TempValueTable] | None): queryが使う値の一時テーブル(Query.temp_value_table_list)。実行する直前に作る
         """
         timer = utils.Timer(time_log=time_log)
 
         self.open_full()
-        if parameters is None or parameters.__len__() == 0:
-            self.cursor.execute(query)
-        else:
-            self.cursor.execute(query, parameters)
+        self._release_cursor()
+        is_temp_value_table = not temp_value_table_list is None and temp_value_table_list.__len__() > 0
+        cursor = self.get_cursor(query, is_temp_value_table)
+        result_cursor = cursor
+
+        def run() -> int:
+            nonlocal result_cursor
+            with self._lock_for(cursor):
+                if is_temp_value_table:
+                    self.temp_value_table_cache.prepare(self.conn, temp_value_table_list)
+                is_in_transaction = self.conn.in_transaction
+                try:
+                    if parameters is None or parameters.__len__() == 0:
+                        cursor.execute(query)
+                    else:
+                        cursor.execute(query, parameters)
+                    if (
+                        cursor.connection is self.conn
+                        and not cursor.description is None
+                        and not self.conn.in_transaction
+                        and not self._is_read_query(query)
+                    ):
+                        # トランザクション外の書き込み用コネクションの結果(PRAGMAなど)は読み切っておく
+                        # 途中のまま残すと、他のスレッドのcommitが'SQL statements in progress'になったり、読み取りがロックされたりする
+                        result_cursor = CachedCursor(cursor.description, cursor.fetchall())
+                    return cursor.rowcount
+                except BaseException:
+                    self._rollback_failed_statement(cursor, is_in_transaction)
+                    raise
+                finally:
+                    if cursor.connection is self.conn:
+                        self._update_write_owner()
+
+        start_ns = time.perf_counter_ns()
+        rowcount = self._run_with_retry(query, run)
+        time_ns = time.perf_counter_ns() - start_ns
+        self._record_stats(query, time_ns, rowcount)
+        if not self.slow_query_log.threshold_ms is None:
+            self._set_slow_query(cursor, query, parameters, time_ns)
+        self._local.cursor = result_cursor
+        if cursor.connection is self.conn and not self._is_read_query(query):
+            self.result_cache.record_write(query)
+
+        timer.finish("実行時間")
+
+    def execute_cached(
+        self,
+        query: str,
+        parameters: tuple | None = None,
+        time_log: utils.LogLike | None = None,
+        temp_value_table_list: list[TempValueTable] | None = None,
+    ):
+        """
+        読み取りのqueryを、result_cacheにあればそこから、なければ実行して全行をfetchしてキャッシュする
+        どちらもこのスレッドで最後に実行したcursor(CachedCursor)として、fetchallなどでそのまま取り出せる
+        temp_value_table_listはexecuteと同じ
+        """
+        timer = utils.Timer(time_log=time_log)
+
+        self.open_full()
+        key = self.result_cache.get_key(query, parameters or ())
+        data_version = self.get_data_version()
+        if not data_version is None:
+            cached_cursor = self.result_cache.get(key, data_version)
+            if not cached_cursor is None:
+                self._local.cursor = cached_cursor
+                self._local.statement_stats = None
+                timer.finish("キャッシュから取得")
+                return
+
+        # 実行中に書き込まれたら次は使わないように、書き込み回数は実行する前に取っておく
+        table_name_list = self._get_dependent_table_name_list(self.result_cache.get_read_table_name_list(query))
+        write_count_dict = self.result_cache.get_write_count_dict(table_name_list)
+        self.execute(query, parameters, temp_value_table_list=temp_value_table_list)
+        cursor = self.get_cursor()
+        start_ns = time.perf_counter_ns()
+        with self._lock_for(cursor):
+            row_list = cursor.fetchall()
+            # コミットしていない書き込みが見えている結果はキャッシュしない
+            is_uncommitted = cursor.connection is self.conn and self.conn.in_transaction
+        fetch_time_ns = time.perf_counter_ns() - start_ns
+        self._add_fetch_time(fetch_time_ns, True)
+        if not data_version is None and not is_uncommitted:
+            self.result_cache.set(key, cursor.description, row_list, data_version, write_count_dict)
+        self._add_rows_returned(row_list.__len__(), fetch_time_ns=fetch_time_ns)
+        self._local.cursor = CachedCursor(cursor.description, row_list)
+        self._local.statement_stats = None
 
         timer.finish("実行時間")
 
+    def _record_stats(self, query: str, time_ns: int, rowcount: int):
+        """statement_statsに記録して、このスレッドでfetchした行数を足す先にする"""
+        if not self.statement_stats.is_enabled:
+            self._local.statement_stats = None
+            return
+        # SELECTのrowcountは-1
+        self._local.statement_stats = self.statement_stats.record(query, time_ns, max(rowcount, 0))
+
+    def _set_slow_query(self, cursor: sqlite3.Cursor, query: str, parameters: object, time_ns: int):
+        """
+        slow_query_logに記録するか判定する
+        sqlite3は行をfetchしながら実行するので、結果の行があるものはfetchし終わるまで(次のexecuteまで)の時間で判定する
+        """
+        self._flush_slow_query()
+        if cursor.description is None:
+            if self.slow_query_log.is_slow(time_ns):
+                self._record_slow_query(cursor, query, parameters, time_ns)
+            return
+        self._local.slow_query = [cursor, query, parameters, time_ns]
+
+    def _add_fetch_time(self, time_ns: int, is_done: bool, slow_query: list | None = None):
+        """fetchにかかった時間を足す。fetchし終わったら判定する"""
+        if slow_query is None:
+            slow_query = getattr(self._local, "slow_query", None)
+        if slow_query is None:
+            return
+        slow_query[3] += time_ns
+        if is_done and slow_query is getattr(self._local, "slow_query", None):
+            self._flush_slow_query()
+
+    def _flush_slow_query(self):
+        slow_query = getattr(self._local, "slow_query", None)
+        if slow_query is None:
+            return
+        self._local.slow_query = None
+        cursor, query, parameters, time_ns = slow_query
+        if self.slow_query_log.is_slow(time_ns):
+            self._record_slow_query(cursor, query, parameters, time_ns)
+
+    def _record_slow_query(
+        self, cursor: sqlite3.Cursor, query: str, parameters: object, time_ns: int, is_executemany: bool = False
+    ):
+        """実行したコネクションでEXPLAIN QUERY PLANを取って記録する(cursorの結果はそのまま残る)"""
+        with self._lock_for(cursor):
+            self.slow_query_log.record(cursor.connection, query, parameters, time_ns, is_executemany)
+
+    def _add_rows_returned(self, row_count: int, stats=None, fetch_time_ns: int = 0):
+        if stats is None:
+            stats = getattr(self._local, "statement_stats", None)
+        if not stats is None:
+            self.statement_stats.add_rows_returned(stats, row_count, fetch_time_ns)
+
+    def get_data_version(self) -> int | None:
+        """
+        書き込み用コネクションのPRAGMA data_version(他のコネクションがコミットすると変わる)
+        プール時に他のスレッドが書き込み用コネクションを使っていたら、待たずにNone
+        """
+        if not self._write_lock.acquire(blocking=not self.is_pool):
+            return None
+        try:
+            self.open_full()
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            self._write_lock.release()
+
+    def _get_dependent_table_name_list(self, table_name_list: list[str]) -> list[str]:
+        """外部キーの親テーブルもたどる(親の行を消すとON DELETE CASCADEで子の行も変わる)"""
+        dependent_table_name_dict = dict.fromkeys(table_name_list)
+        stack = list(table_name_list)
+        while stack.__len__() > 0:
+            table_schema = self.schema_catalog.get_table_schema(self, stack.pop())
+            for raw_foreign_key in table_schema.raw_foreign_key_list:
+                parent_table_name = raw_foreign_key["table"].lower()
+                if not parent_table_name in dependent_table_name_dict:
+                    dependent_table_name_dict[parent_table_name] = None
+                    stack.append(parent_table_name)
+        return list(dependent_table_name_dict)
+
     def executemany(
         self,
         query: str,
-        parameters: list[dict[str]],
+        parameters: Iterable[dict[str] | tuple],
         time_log: utils.LogLike | None = None,
+        temp_value_table_list: list[TempValueTable] | None = None,
     ):
         """
         cursorを実行
 
         Args:
             query (str): クエリ
-            parameters (dict[str] | None): プレースホルダのパラメータ
+            parameters (Iterable[dict[str] | tuple]): プレースホルダのパラメータ。ジェネレータも可
             time_log (ログ系オブジェクト | None): 時間計測のログ。
             - Noneなら出さない
             - 'print_log'ならprintだけする
             - ログ系オブジェクト(debugメソッドなどを持つ)なら、そのログを使う。
+            temp_value_table_list (list[TempValueTable] | None): queryが使う値の一時テーブル(Query.temp_value_table_list)。実行する直前に作る
         """
         timer = utils.Timer(time_log=time_log)
 
@@ -138,17 +632,64 @@ class Driver:
             raise exceptions.BulkError("バルクはパラメータが必要です。")
 
         # パラメータの長さ0だとバルクする意味がない
-        if parameters.__len__() == 0:
+        if isinstance(parameters, Sized) and parameters.__len__() == 0:
             timer.no("バルク実行・パラメータ数が0")
             return
 
         self.open_full()
-        self.cursor.executemany(query, parameters)
+        self._release_cursor()
+        is_temp_value_table = not temp_value_table_list is None and temp_value_table_list.__len__() > 0
+        cursor = self.get_cursor(query, is_temp_value_table)
+
+        def run() -> int:
+            with self._lock_for(cursor):
+                if is_temp_value_table:
+                    self.temp_value_table_cache.prepare(self.conn, temp_value_table_list)
+                is_in_transaction = self.conn.in_transaction
+                try:
+                    cursor.executemany(query, parameters)
+                    return cursor.rowcount
+                except BaseException:
+                    self._rollback_failed_statement(cursor, is_in_transaction)
+                    raise
+                finally:
+                    if cursor.connection is self.conn:
+                        self._update_write_owner()
+
+        start_ns = time.perf_counter_ns()
+        # ジェネレータは途中まで読んでしまうのでやり直せない(transaction("immediate")で先にロックを取っておくこと)
+        if isinstance(parameters, Sequence):
+            rowcount = self._run_with_retry(query, run)
+        else:
+            rowcount = run()
+        time_ns = time.perf_counter_ns() - start_ns
+        self._record_stats(query, time_ns, rowcount)
+        if not self.slow_query_log.threshold_ms is None:
+            self._flush_slow_query()
+            if self.slow_query_log.is_slow(time_ns):
+                self._record_slow_query(cursor, query, parameters, time_ns, is_executemany=True)
+        self._local.cursor = cursor
+        if cursor.connection is self.conn:
+            self.result_cache.record_write(query)
 
         timer.finish("バルク実行")
 
     def rollback(self):
-        self.conn.rollback()
+        with self._write_lock:
+            # ブロック内で黙って無視すると、取り消したつもりの書き込みがブロックを抜けたときにコミットされてしまう
+            if self.is_in_transaction:
+                raise exceptions.DefenseAccidentException(
+                    "transactionのブロック内ではrollbackできません。取り消すなら例外でブロック(savepointなど)を抜けてください。"
+                )
+            try:
+                self.conn.rollback()
+            finally:
+                self._update_write_owner()
+            # 取り消した行のidや、取り消したCREATEなどのスキーマをキャッシュしているかもしれない
+            self.id_resolver_cache.clear()
+            self.schema_catalog.clear()
+            self.temp_value_table_cache.sync(self.conn)
+            self.result_cache.record_commit()
 
     def commit(self, time_log: utils.LogLike | None = None):
         """
@@ -162,7 +703,13 @@ class Driver:
         timer = utils.Timer(time_log=time_log)
 
         try:
-            self.conn.commit()
+            with self._write_lock:
+                # transactionのブロック内なら、ブロックを抜けるまでコミットしない
+                if self.is_in_transaction:
+                    return
+                self._run_with_retry("COMMIT", self.conn.commit)
+                self.result_cache.record_commit()
+                self._update_write_owner()
         except sqlite3.DatabaseError:
             self.rollback()
             raise
@@ -183,7 +730,13 @@ class Driver:
         """
         timer = utils.Timer(time_log=time_log)
 
-        fetchall_list = self.cursor.fetchall()
+        cursor = self.get_cursor()
+        start_ns = time.perf_counter_ns()
+        with self._lock_for(cursor):
+            fetchall_list = cursor.fetchall()
+        fetch_time_ns = time.perf_counter_ns() - start_ns
+        self._add_fetch_time(fetch_time_ns, True)
+        self._add_rows_returned(fetchall_list.__len__(), fetch_time_ns=fetch_time_ns)
         if dict_output:
             fetchall_list = [dict(fetch) for fetch in fetchall_list]
 
@@ -205,7 +758,13 @@ class Driver:
         """
         timer = utils.Timer(time_log=time_log)
 
-        fetchmany_list = self.cursor.fetchmany(limit)
+        cursor = self.get_cursor()
+        start_ns = time.perf_counter_ns()
+        with self._lock_for(cursor):
+            fetchmany_list = cursor.fetchmany(limit)
+        fetch_time_ns = time.perf_counter_ns() - start_ns
+        self._add_fetch_time(fetch_time_ns, fetchmany_list.__len__() < limit)
+        self._add_rows_returned(fetchmany_list.__len__(), fetch_time_ns=fetch_time_ns)
         if dict_output:
             fetchmany_list = [dict(fetch) for fetch in fetchmany_list]
 
@@ -225,9 +784,15 @@ class Driver:
         """
         timer = utils.Timer(time_log=time_log)
 
-        fetchone = self.cursor.fetchone()
+        cursor = self.get_cursor()
+        start_ns = time.perf_counter_ns()
+        with self._lock_for(cursor):
+            fetchone = cursor.fetchone()
+        fetch_time_ns = time.perf_counter_ns() - start_ns
+        self._add_fetch_time(fetch_time_ns, True)
         if fetchone is None:
             raise exceptions.FetchNotFoundError
+        self._add_rows_returned(1, fetch_time_ns=fetch_time_ns)
         if dict_output:
             fetchone = dict(fetchone)
 
@@ -239,7 +804,7 @@ class Driver:
         self, limit: int, dict_output: bool = False, time_log: utils.LogLike | None = None
     ) -> list[list[dict[str]]] | list[list[sqlite3.Row]]:
         """
-        全行をlimitごとに取り出してリストに分ける
+        全行をlimitごとに取り出してリストに分ける。全部メモリに載るので、大きいテーブルはiter_batchesを使う
         Args:
             dict_output (bool): 辞書で出力
             time_log (ログ系オブジェクト | None): 時間計測のログ。
@@ -247,19 +812,48 @@ class Driver:
             - 'print_log'ならprintだけする
             - ログ系オブジェクト(debugメソッドなどを持つ)なら、そのログを使う。
         """
-        all_list = []
         timer = utils.Timer(time_log=time_log)
 
-        while True:
-            fetchmany_list = self.cursor.fetchmany(limit)
-            # fetchmany_listがなくなるまで
-            if fetchmany_list.__len__() == 0:
-                break
-
-            if dict_output:
-                fetchmany_list = [dict(fetch) for fetch in fetchmany_list]
-            all_list.append(fetchmany_list)
+        all_list = list(self.iter_batches(limit, dict_output))
 
         timer.finish("fetchmany時間")
 
         return all_list
+
+    def iter_batches(
+        self, limit: int, dict_output: bool = False
+    ) -> Iterator[list[dict[str]]] | Iterator[list[sqlite3.Row]]:
+        """
+        limitごとにfetchmanyして、そのかたまりを順に返すジェネレータ
+        一度にメモリに載るのはlimit行だけ
+        呼んだ時点で、このスレッドで最後に実行したcursorを掴む。途中で別のクエリを実行しても、そのcursorから取り出す
+        Args:
+            dict_output (bool): 辞書で出力
+        """
+        cursor = self.get_cursor()
+        if isinstance(cursor, sqlite3.Cursor):
+            self._streaming_cursor_set.add(cursor)
+        stats = getattr(self._local, "statement_stats", None)
+        slow_query = getattr(self._local, "slow_query", None)
+        return self._iter_batches(cursor, limit, dict_output, stats, slow_query)
+
+    def _iter_batches(
+        self, cursor: sqlite3.Cursor, limit: int, dict_output: bool, stats, slow_query: list | None
+    ) -> Iterator[list[dict[str]]] | Iterator[list[sqlite3.Row]]:
+        try:
+            while True:
+                start_ns = time.perf_counter_ns()
+                with self._lock_for(cursor):
+                    fetchmany_list = cursor.fetchmany(limit)
+                fetch_time_ns = time.perf_counter_ns() - start_ns
+                self._add_fetch_time(fetch_time_ns, fetchmany_list.__len__() < limit, slow_query)
+                # fetchmany_listがなくなるまで
+                if fetchmany_list.__len__() == 0:
+                    return
+                self._add_rows_returned(fetchmany_list.__len__(), stats, fetch_time_ns)
+
+                if dict_output:
+                    fetchmany_list = [dict(fetch) for fetch in fetchmany_list]
+                yield fetchmany_list
+        finally:
+            self._streaming_cursor_set.discard(cursor)
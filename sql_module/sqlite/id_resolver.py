@@ -0,0 +1,118 @@
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from typing import Hashable
+import threading
+
+
+@dataclass
+class IDResolverStats:
+    hit: int = 0
+    miss: int = 0
+    lookup_count: int = 0  # INで引いたクエリの数
+    lookup_key_count: int = 0  # INで引いたキーの数の合計
+    insert_count: int = 0  # is_insert_missingで新しく入れた行の数
+    invalidate_count: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hit + self.miss
+        if total == 0:
+            return 0.0
+        return self.hit / total
+
+    @property
+    def average_batch_size(self) -> float:
+        """1回のINで引いたキーの数の平均"""
+        if self.lookup_count == 0:
+            return 0.0
+        return self.lookup_key_count / self.lookup_count
+
+
+@dataclass
+class IDResolver:
+    """
+    1つのテーブルの1つのユニークカラムの{値: id}のLRUキャッシュ
+    例: screen_name.screen_name -> screen_name.id
+    """
+
+    max_size: int = 100000
+    stats: IDResolverStats = field(default_factory=IDResolverStats)
+    _id_dict: OrderedDict = field(default_factory=OrderedDict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return self._id_dict.__len__()
+
+    def get_many(self, value_list: list[Hashable]) -> tuple[dict, list]:
+        """キャッシュにある分の{値: id}と、ない値のリスト(重複なし)を取得"""
+        id_dict = {}
+        missing_value_list = []
+        with self._lock:
+            for value in dict.fromkeys(value_list):
+                id_ = self._id_dict.get(value)
+                if id_ is None:
+                    self.stats.miss += 1
+                    missing_value_list.append(value)
+                    continue
+                self.stats.hit += 1
+                self._id_dict.move_to_end(value)
+                id_dict[value] = id_
+        return id_dict, missing_value_list
+
+    def set_many(self, id_dict: dict):
+        with self._lock:
+            for value, id_ in id_dict.items():
+                self._id_dict[value] = id_
+                self._id_dict.move_to_end(value)
+            # 古いものから捨てる
+            while self._id_dict.__len__() > self.max_size:
+                self._id_dict.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._id_dict.clear()
+            self.stats.invalidate_count += 1
+
+
+@dataclass
+class IDResolverCache:
+    """
+    (テーブル名, カラム名)ごとのIDResolverを持つ。Driverに1つ
+    このライブラリを通してupdate, delete, 'ON CONFLICT DO UPDATE'のinsertなどをしたテーブルのキャッシュは捨てる
+    ただのinsertとDO NOTHINGのinsertは、既にある行の値とidの組み合わせを変えないので捨てない
+    """
+
+    max_size: int = 100000  # 1つのIDResolverあたり
+    _resolver_dict: dict[tuple[str, str], IDResolver] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def get_resolver(self, table_name: str, column_name: str) -> IDResolver:
+        with self._lock:
+            key = (table_name, column_name)
+            if not key in self._resolver_dict:
+                self._resolver_dict[key] = IDResolver(self.max_size)
+            return self._resolver_dict[key]
+
+    def invalidate(self, table_name: str):
+        """このテーブルのキャッシュを捨てる(統計は残す)"""
+        with self._lock:
+            resolver_list = [
+                resolver for (_table_name, _), resolver in self._resolver_dict.items() if _table_name == table_name
+            ]
+        for resolver in resolver_list:
+            resolver.clear()
+
+    def clear(self):
+        """全テーブルのキャッシュを捨てる(ロールバックで、キャッシュしたidが無くなったかもしれないとき)"""
+        with self._lock:
+            resolver_list = list(self._resolver_dict.values())
+        for resolver in resolver_list:
+            resolver.clear()
+
+    def get_stats(self) -> dict[str, IDResolverStats]:
+        """{'screen_name.screen_name': IDResolverStats(...)}"""
+        with self._lock:
+            return {
+                f"{table_name}.{column_name}": resolver.stats
+                for (table_name, column_name), resolver in self._resolver_dict.items()
+            }
@@ -0,0 +1,601 @@
+from dataclasses import dataclass, field
+import re
+import sqlite3
+
+from sql_module.sqlite.driver import Driver
+from sql_module.sqlite.statement_stats import StatementStats, get_fingerprint, STRING_LITERAL_PATTERN
+from sql_module.sqlite.slow_query_log import SCAN_PATTERN, get_row_count
+from sql_module.sqlite.result_cache import WRITE_TABLE_PATTERN
+from sql_module.sqlite.table.column.name import ColumnName
+from sql_module.sqlite.table.index.query_builder import IndexQueryBuilder
+
+# EXPLAIN QUERY PLANに出るもの
+USING_INDEX_PATTERN = re.compile(r"\bUSING (?:COVERING )?INDEX (\w+)")
+TEMP_B_TREE_PATTERN = re.compile(r"^USE TEMP B-TREE FOR (?:RIGHT PART OF )?(ORDER BY|GROUP BY)")
+# テーブルと別名。"FROM post", "FROM post p", "JOIN post AS p", "UPDATE post"
+TABLE_REF_PATTERN = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE(?:\s+OR\s+\w+)?)\s+([\w.]+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE
+)
+# 別名ではないもの(FROM post WHEREのWHEREなど)
+KEYWORD_SET = set(
+    "where join left right full inner cross natural outer on using group order limit offset having window set indexed"
+    " not union except intersect values returning as".split()
+)
+# WHERE, ONの後ろから、次の句まで
+CONDITION_PATTERN = re.compile(
+    r"\b(?:WHERE|ON)\b(.*?)(?=\b(?:GROUP\s+BY|ORDER\s+BY|LIMIT|HAVING|WINDOW|RETURNING|UNION|EXCEPT|INTERSECT"
+    r"|(?:NATURAL\s+|LEFT\s+|RIGHT\s+|FULL\s+|INNER\s+|CROSS\s+|OUTER\s+)*JOIN)\b|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+# 1つの比較。左がカラム、右がプレースホルダ・リテラル・カラム
+PREDICATE_PATTERN = re.compile(
+    r"(?<![\w.'])(?:(\w+)\.)?(\w+)\s*(==|=|IS\s+NOT|IS|NOT\s+IN|IN|<=|>=|<>|!=|<|>|BETWEEN|LIKE|GLOB)\s*"
+    r"(\?\d*|[:@$]\w+|'(?:[^']|'')*'|-?\d+(?:\.\d+)?\b|\(|(?:\w+\.)?\w+)",
+    re.IGNORECASE,
+)
+ORDER_BY_PATTERN = re.compile(r"\bORDER\s+BY\b(.*?)(?=\bLIMIT\b|\bOFFSET\b|\)|$)", re.IGNORECASE | re.DOTALL)
+GROUP_BY_PATTERN = re.compile(
+    r"\bGROUP\s+BY\b(.*?)(?=\bHAVING\b|\bORDER\s+BY\b|\bLIMIT\b|\bWINDOW\b|\)|$)", re.IGNORECASE | re.DOTALL
+)
+SORT_ITEM_PATTERN = re.compile(r"^\s*(?:(\w+)\.)?(\w+)(?:\s+(ASC|DESC))?\s*$", re.IGNORECASE)
+# プレースホルダ(EXPLAIN QUERY PLANにはNoneを渡す)
+NAMED_PARAMETER_PATTERN = re.compile(r"[:@$](\w+)")
+NUMBER_PATTERN = re.compile(r"^-?\d+(?:\.\d+)?$")
+EQ_OPERATOR_SET = {"=", "==", "is", "in"}
+RANGE_OPERATOR_SET = {"<", "<=", ">", ">=", "between"}
+
+
+def get_explain_parameters(sql: str) -> dict[str, None] | tuple:
+    """EXPLAIN QUERY PLANするための、全部Noneのパラメータ(実行計画は値によらない)"""
+    stripped_sql = STRING_LITERAL_PATTERN.sub("''", sql)
+    name_list = NAMED_PARAMETER_PATTERN.findall(stripped_sql)
+    if name_list.__len__() > 0:
+        return dict.fromkeys(name_list)
+    return (None,) * stripped_sql.count("?")
+
+
+@dataclass
+class Predicate:
+    table_name: str
+    column_name: str
+    kind: str  # "eq", "range", "const"(リテラルとの=やIS NULL)
+    where_text: str | None = None  # constのときの部分インデックスの条件(カラム名だけ)
+    value: object = None  # constのときの値(コード用)
+
+
+@dataclass
+class StatementPlan:
+    """1つの文の実行計画と、テーブルごとの条件"""
+
+    stats: StatementStats
+    scan_table_name_list: list[str]
+    used_index_name_set: set[str]
+    sort_kind: str | None  # "ORDER BY", "GROUP BY"(一時B-treeで並び替えている)
+    predicate_list: list[Predicate]
+    sort_table_name: str | None  # ORDER BY(なければGROUP BY)のカラムがすべてこのテーブルのもの
+    sort_column_name_list: list[str]
+    plan_text_list: list[str]
+
+
+@dataclass
+class IndexProposal:
+    """作るといいインデックス"""
+
+    table_name: str
+    column_name_list: list[str]  # 左端プレフィックスの順番(等号のカラム -> 範囲か並び替えのカラム)
+    where_text: str | None = None  # 部分インデックスの条件
+    where_predicate_list: list[Predicate] = field(default_factory=list, repr=False)
+    benefit_ms: float = 0.0  # 関係する文の実行時間とfetchの時間の合計(速くなる分の上限の見積もり)
+    scanned_row_count: int = 0  # 関係する文で全件走査していた行数の合計(実行回数 x 行数)
+    reason_list: list[str] = field(default_factory=list)
+    fingerprint_list: list[str] = field(default_factory=list)
+
+    @property
+    def index_name(self) -> str:
+        column_name_list = [ColumnName(column_name, self.table_name) for column_name in self.column_name_list]
+        index_name = IndexQueryBuilder(None).get_index_name(column_name_list, is_keep_order=True)
+        if self.where_text is None:
+            return index_name
+        where_column_name_list = [predicate.column_name for predicate in self.where_predicate_list]
+        return f"{index_name}_where_{'_'.join(where_column_name_list)}"
+
+    def get_query(self) -> str:
+        query = f"CREATE INDEX IF NOT EXISTS {self.index_name} ON {self.table_name}({', '.join(self.column_name_list)})"
+        if not self.where_text is None:
+            query += f" WHERE {self.where_text}"
+        return query
+
+    def get_code(self) -> str:
+        """TableDefinitionのcreate_index。カラムはself.{カラム名}_columnと名前を付けている前提"""
+        column_code_list = [f"{self.table_name}.{column_name}_column" for column_name in self.column_name_list]
+        if column_code_list.__len__() == 1:
+            argument_list = [column_code_list[0]]
+        else:
+            argument_list = [f"[{', '.join(column_code_list)}]", "is_keep_order=True"]
+        if not self.where_text is None:
+            where_code_list = [self._get_where_code(predicate) for predicate in self.where_predicate_list]
+            if where_code_list.__len__() == 1:
+                argument_list.append(f"where={where_code_list[0]}")
+            else:
+                argument_list.append(f"where=conds.And({', '.join(where_code_list)})")
+            argument_list.append(f'index_name="{self.index_name}"')
+        return f"{self.table_name}.create_index({', '.join(argument_list)})"
+
+    def _get_where_code(self, predicate: Predicate) -> str:
+        column_code = f"{self.table_name}.{predicate.column_name}_column"
+        if predicate.where_text.upper().endswith("IS NOT NULL"):
+            return f"conds.Not(conds.Eq({column_code}, None, is_column_only_name=True))"
+        return f"conds.Eq({column_code}, {predicate.value!r}, is_column_only_name=True)"
+
+
+@dataclass
+class DropProposal:
+    """消していいインデックス(書き込みのたびに更新しなくて済む)"""
+
+    table_name: str
+    index_name: str
+    column_name_list: list[str]
+    reason: str
+    benefit_ms: float = 0.0  # このテーブルへの書き込みの実行時間の合計 / (インデックス数 + 1)
+
+    def get_query(self) -> str:
+        return f"DROP INDEX IF EXISTS {self.index_name}"
+
+    def get_code(self) -> str:
+        column_code_list = [f"{self.table_name}.{column_name}_column" for column_name in self.column_name_list]
+        column_code = column_code_list[0] if column_code_list.__len__() == 1 else f"[{', '.join(column_code_list)}]"
+        return f'{self.table_name}.delete_index({column_code}, index_name="{self.index_name}")'
+
+
+@dataclass
+class IndexAdvice:
+    create_list: list[IndexProposal] = field(default_factory=list)
+    drop_list: list[DropProposal] = field(default_factory=list)
+    statement_plan_list: list[StatementPlan] = field(default_factory=list, repr=False)
+
+    def __str__(self) -> str:
+        text = "作るインデックス:\n"
+        for proposal in self.create_list:
+            text += f"{proposal.benefit_ms:>12.1f}ms  {proposal.get_code()}\n"
+            for reason in proposal.reason_list:
+                text += f"{'':>16}{reason}\n"
+        text += "消すインデックス:\n"
+        for proposal in self.drop_list:
+            text += f"{proposal.benefit_ms:>12.1f}ms  {proposal.get_code()}\n"
+            text += f"{'':>16}{proposal.reason}\n"
+        return text
+
+
+@dataclass
+class IndexAdvisor:
+    """
+    記録した文(driver.statement_stats)をEXPLAIN QUERY PLANして、作るといいインデックスと消していいインデックスを出す
+    - 作る: min_row_count行以上のテーブルのSCAN(全件走査)と、USE TEMP B-TREE(並び替え)から。WHERE, ON, ORDER BY, GROUP BYのカラムを
+      等号のカラム(ワークロードでよく使うもの順) -> 範囲のカラム1つか並び替えのカラム の順にする(左端プレフィックス)
+      いつも同じリテラルとの比較やIS NULL, IS NOT NULLは部分インデックスの条件にする。他の提案の左端プレフィックスになる提案はまとめる
+    - 消す: 他のインデックス(提案も含む)の左端プレフィックスになっているものと、記録した文で一度も使われていないもの
+      (ユニーク・主キーのインデックスと、外部キーのカラムのインデックスは消さない)
+    SQLを正規表現で見ているので、ORを含む条件・サブクエリ・式のカラムは対象外。提案は実行する前に確認すること
+    """
+
+    driver: Driver
+    min_row_count: int = 1000
+
+    def advise(self, stats_list: list[StatementStats] | None = None, sql_list: list[str] | None = None) -> IndexAdvice:
+        """stats_list(デフォルトはdriver.statement_statsのすべて)か、sql_list(それぞれ1回実行したとみなす)から"""
+        if not sql_list is None:
+            stats_list = [
+                StatementStats(get_fingerprint(sql), call_count=1, sample_sql=sql, sql_count=1) for sql in sql_list
+            ]
+        elif stats_list is None:
+            stats_list = self.driver.statement_stats.get_list()
+
+        self._table_name_dict = {
+            table_name.lower(): table_name
+            for table_name in self.driver.schema_catalog.get_table_name_list(self.driver)
+            if not table_name.startswith("sqlite_")
+        }
+        self._row_count_dict = {}
+        statement_plan_list = []
+        for stats in stats_list:
+            statement_plan = self._get_statement_plan(stats)
+            if not statement_plan is None:
+                statement_plan_list.append(statement_plan)
+
+        create_list = self._get_create_list(statement_plan_list)
+        drop_list = self._get_drop_list(stats_list, statement_plan_list, create_list)
+        return IndexAdvice(create_list, drop_list, statement_plan_list)
+
+    def _get_statement_plan(self, stats: StatementStats) -> StatementPlan | None:
+        sql = stats.sample_sql
+        head = sql.lstrip()[:7].upper()
+        if not (head.startswith(("SELECT", "WITH", "UPDATE", "DELETE")) or "SELECT" in sql.upper()):
+            return None
+        if head.startswith(("EXPLAIN", "PRAGMA", "CREATE", "DROP", "ALTER")):
+            return None
+        raw_plan_list = self._explain(sql)
+        if raw_plan_list is None:
+            return None
+
+        ref_dict = self._get_ref_dict(sql)
+        if ref_dict.__len__() == 0:
+            return None
+        scan_table_name_list = []
+        used_index_name_set = set()
+        sort_kind = None
+        plan_text_list = []
+        for raw_plan in raw_plan_list:
+            detail = raw_plan[3]
+            plan_text_list.append(detail)
+            match = SCAN_PATTERN.match(detail)
+            if not match is None and match.group(1).lower() in ref_dict:
+                scan_table_name_list.append(ref_dict[match.group(1).lower()])
+            match = USING_INDEX_PATTERN.search(detail)
+            if not match is None:
+                used_index_name_set.add(match.group(1))
+            match = TEMP_B_TREE_PATTERN.match(detail)
+            if not match is None and sort_kind is None:
+                sort_kind = match.group(1)
+
+        predicate_list = self._get_predicate_list(sql, ref_dict, stats.sql_count <= 1)
+        # 一時B-treeがなくても、並び替えのためにインデックスを全部たどっている(SCAN post USING INDEX)ことがある
+        pattern_list = [GROUP_BY_PATTERN, ORDER_BY_PATTERN] if sort_kind == "GROUP BY" else [ORDER_BY_PATTERN, GROUP_BY_PATTERN]
+        sort_table_name, sort_column_name_list = None, []
+        for pattern in pattern_list:
+            if not pattern.search(sql) is None:
+                sort_table_name, sort_column_name_list = self._get_sort_column(sql, pattern, ref_dict)
+                break
+        return StatementPlan(
+            stats,
+            list(dict.fromkeys(scan_table_name_list)),
+            used_index_name_set,
+            sort_kind,
+            predicate_list,
+            sort_table_name,
+            sort_column_name_list,
+            plan_text_list,
+        )
+
+    def _explain(self, sql: str) -> list[tuple] | None:
+        """書き込み用コネクションで(driver.executeを通すと実行統計に入ってしまうので直接)"""
+        with self.driver.write_lock:
+            self.driver.open_full()
+            try:
+                return self.driver.conn.execute(f"EXPLAIN QUERY PLAN {sql}", get_explain_parameters(sql)).fetchall()
+            except sqlite3.Error:
+                # 消した一時テーブル(conds.Inのtemp_table)など
+                return None
+
+    def _get_ref_dict(self, sql: str) -> dict[str, str]:
+        """テーブル名・別名(小文字) -> テーブル名"""
+        ref_dict = {}
+        for ref_name, alias in TABLE_REF_PATTERN.findall(sql):
+            table_name = self._table_name_dict.get(ref_name.split(".")[-1].lower())
+            if table_name is None:
+                continue
+            ref_dict[table_name.lower()] = table_name
+            if alias != "" and not alias.lower() in KEYWORD_SET:
+                ref_dict[alias.lower()] = table_name
+        return ref_dict
+
+    def _get_column_name(self, ref_dict: dict[str, str], qualifier: str, column_name: str) -> tuple[str, str] | None:
+        """(テーブル名, カラム名)。テーブル名がなければ、そのカラムを持つテーブルが1つだけのとき"""
+        if qualifier != "":
+            table_name_list = [ref_dict[qualifier.lower()]] if qualifier.lower() in ref_dict else []
+        else:
+            table_name_list = list(dict.fromkeys(ref_dict.values()))
+        result_list = []
+        for table_name in table_name_list:
+            for raw_column in self.driver.schema_catalog.get_table_schema(self.driver, table_name).raw_column_list:
+                if raw_column["name"].lower() == column_name.lower():
+                    result_list.append((table_name, raw_column["name"]))
+        if result_list.__len__() != 1:
+            return None
+        return result_list[0]
+
+    def _get_predicate_list(self, sql: str, ref_dict: dict[str, str], is_stable: bool) -> list[Predicate]:
+        predicate_list = []
+        for condition_text in CONDITION_PATTERN.findall(sql):
+            # ORのどちらかだけでは絞れない
+            if re.search(r"\bOR\b", condition_text, re.IGNORECASE):
+                continue
+            for qualifier, column_name, operator, right in PREDICATE_PATTERN.findall(condition_text):
+                column = self._get_column_name(ref_dict, qualifier, column_name)
+                if column is None:
+                    continue
+                table_name, column_name = column
+                operator = " ".join(operator.lower().split())
+                predicate = self._get_predicate(ref_dict, table_name, column_name, operator, right, is_stable)
+                if not predicate is None:
+                    predicate_list.append(predicate)
+                # 結合のカラム同士の等号は、右のテーブルからも引ける
+                if operator in ["=", "=="] and re.match(r"^(?:\w+\.)?\w+$", right) and not right[0].isdigit():
+                    right_qualifier, _, right_column_name = right.rpartition(".")
+                    right_column = self._get_column_name(ref_dict, right_qualifier, right_column_name)
+                    if not right_column is None and right_column[0] != table_name:
+                        predicate_list.append(Predicate(right_column[0], right_column[1], "eq"))
+        return predicate_list
+
+    def _get_predicate(
+        self, ref_dict: dict[str, str], table_name: str, column_name: str, operator: str, right: str, is_stable: bool
+    ) -> Predicate | None:
+        right_upper = right.upper()
+        if right_upper == "NULL" and operator in ["is", "is not"]:
+            return Predicate(table_name, column_name, "const", f"{column_name} {operator.upper()} NULL")
+        is_literal = right.startswith("'") or NUMBER_PATTERN.match(right)
+        if is_literal and operator in ["=", "=="]:
+            # 値を埋め込んだSQLが何種類もあるなら、いつも同じ値ではないので普通のカラムにする
+            if not is_stable:
+                return Predicate(table_name, column_name, "eq")
+            if right.startswith("'"):
+                value = right[1:-1].replace("''", "'")
+            elif "." in right:
+                value = float(right)
+            else:
+                value = int(right)
+            return Predicate(table_name, column_name, "const", f"{column_name} = {right}", value)
+        if operator in EQ_OPERATOR_SET:
+            if operator == "is" and not right.startswith(("?", ":", "@", "$")):
+                return None
+            return Predicate(table_name, column_name, "eq")
+        if operator in RANGE_OPERATOR_SET:
+            return Predicate(table_name, column_name, "range")
+        # NOT IN, !=, LIKE, GLOBはインデックスで絞れない
+        return None
+
+    def _get_sort_column(
+        self, sql: str, pattern: re.Pattern, ref_dict: dict[str, str]
+    ) -> tuple[str | None, list[str]]:
+        """並び替えのカラムがすべて同じテーブルの、同じ向きのカラムなら(テーブル名, カラム名のリスト)"""
+        match_list = pattern.findall(sql)
+        if match_list.__len__() != 1:
+            return None, []
+        table_name_set = set()
+        column_name_list = []
+        direction_set = set()
+        for item in match_list[0].split(","):
+            match = SORT_ITEM_PATTERN.match(item)
+            if match is None:
+                return None, []
+            column = self._get_column_name(ref_dict, match.group(1) or "", match.group(2))
+            if column is None:
+                return None, []
+            table_name_set.add(column[0])
+            column_name_list.append(column[1])
+            direction_set.add((match.group(3) or "ASC").upper())
+        # インデックスは逆向きにもたどれるので、全部同じ向きならいい
+        if table_name_set.__len__() != 1 or direction_set.__len__() != 1:
+            return None, []
+        return table_name_set.pop(), list(dict.fromkeys(column_name_list))
+
+    def _get_row_count(self, table_name: str) -> int:
+        if not table_name in self._row_count_dict:
+            with self.driver.write_lock:
+                self._row_count_dict[table_name] = get_row_count(self.driver.conn, table_name) or 0
+        return self._row_count_dict[table_name]
+
+    def _get_create_list(self, statement_plan_list: list[StatementPlan]) -> list[IndexProposal]:
+        # 等号のカラムの並びは、ワークロード全体でよく使うもの順(左端プレフィックスを共有しやすいように)
+        use_count_dict = {}
+        for statement_plan in statement_plan_list:
+            for predicate in statement_plan.predicate_list:
+                if predicate.kind == "eq":
+                    key = (predicate.table_name, predicate.column_name)
+                    use_count_dict[key] = use_count_dict.get(key, 0) + statement_plan.stats.call_count
+
+        proposal_list = []
+        for statement_plan in statement_plan_list:
+            table_name_list = list(statement_plan.scan_table_name_list)
+            if (
+                not statement_plan.sort_kind is None
+                and not statement_plan.sort_table_name is None
+                and not statement_plan.sort_table_name in table_name_list
+            ):
+                table_name_list.append(statement_plan.sort_table_name)
+            for table_name in table_name_list:
+                row_count = self._get_row_count(table_name)
+                if row_count < self.min_row_count:
+                    continue
+                proposal = self._get_proposal(statement_plan, table_name, row_count, use_count_dict)
+                if not proposal is None:
+                    proposal_list.append(proposal)
+
+        # 他の提案の左端プレフィックスになる提案はまとめる
+        proposal_list.sort(key=lambda proposal: proposal.column_name_list.__len__(), reverse=True)
+        merged_proposal_list = []
+        for proposal in proposal_list:
+            for merged_proposal in merged_proposal_list:
+                if (
+                    merged_proposal.table_name == proposal.table_name
+                    and merged_proposal.where_text == proposal.where_text
+                    and merged_proposal.column_name_list[: proposal.column_name_list.__len__()]
+                    == proposal.column_name_list
+                ):
+                    merged_proposal.benefit_ms += proposal.benefit_ms
+                    merged_proposal.scanned_row_count += proposal.scanned_row_count
+                    merged_proposal.reason_list += [
+                        reason for reason in proposal.reason_list if not reason in merged_proposal.reason_list
+                    ]
+                    merged_proposal.fingerprint_list += proposal.fingerprint_list
+                    break
+            else:
+                merged_proposal_list.append(proposal)
+
+        merged_proposal_list = [proposal for proposal in merged_proposal_list if not self._is_covered(proposal)]
+        merged_proposal_list.sort(key=lambda proposal: (proposal.benefit_ms, proposal.scanned_row_count), reverse=True)
+        return merged_proposal_list
+
+    def _get_proposal(
+        self, statement_plan: StatementPlan, table_name: str, row_count: int, use_count_dict: dict[tuple[str, str], int]
+    ) -> IndexProposal | None:
+        # rowid(INTEGER PRIMARY KEY)はどのインデックスにも最後に入っているので、キーにしなくていい
+        rowid_column_name = self._get_rowid_column_name(table_name)
+        predicate_list = [
+            predicate
+            for predicate in statement_plan.predicate_list
+            if predicate.table_name == table_name and predicate.column_name != rowid_column_name
+        ]
+        eq_column_name_list = list(
+            dict.fromkeys(predicate.column_name for predicate in predicate_list if predicate.kind == "eq")
+        )
+        eq_column_name_list.sort(
+            key=lambda column_name: (-use_count_dict.get((table_name, column_name), 0), column_name)
+        )
+        range_column_name_list = [predicate.column_name for predicate in predicate_list if predicate.kind == "range"]
+        const_predicate_list = list(
+            {predicate.where_text: predicate for predicate in predicate_list if predicate.kind == "const"}.values()
+        )
+
+        reason_list = []
+        tail_column_name_list = []
+        is_scan = table_name in statement_plan.scan_table_name_list
+        is_sort = not statement_plan.sort_kind is None
+        if statement_plan.sort_table_name == table_name and (is_scan or is_sort):
+            sort_column_name_list = [
+                column_name
+                for column_name in statement_plan.sort_column_name_list
+                if not column_name in eq_column_name_list and column_name != rowid_column_name
+            ]
+            # 範囲で絞るカラムと並び替えのカラムが違うと、どちらかしかインデックスで引けない
+            if range_column_name_list.__len__() == 0 or range_column_name_list[:1] == sort_column_name_list[:1]:
+                tail_column_name_list = sort_column_name_list
+                if is_sort:
+                    reason_list.append(f"USE TEMP B-TREE FOR {statement_plan.sort_kind}")
+        if tail_column_name_list.__len__() == 0 and range_column_name_list.__len__() > 0:
+            tail_column_name_list = range_column_name_list[:1]
+        if is_scan:
+            reason_list.insert(0, f"SCAN {table_name} ({row_count}行)")
+
+        column_name_list = list(dict.fromkeys(eq_column_name_list + tail_column_name_list))
+        where_predicate_list = sorted(const_predicate_list, key=lambda predicate: predicate.where_text)
+        if column_name_list.__len__() == 0:
+            # いつも同じ値で絞るだけなら、そのカラムのインデックス
+            column_name_list = list(dict.fromkeys(predicate.column_name for predicate in where_predicate_list))
+            where_predicate_list = []
+        if column_name_list.__len__() == 0 or reason_list.__len__() == 0:
+            return None
+
+        stats = statement_plan.stats
+        return IndexProposal(
+            table_name,
+            column_name_list,
+            " AND ".join(predicate.where_text for predicate in where_predicate_list) or None,
+            where_predicate_list,
+            stats.total_time_ms + stats.fetch_time_ms,
+            stats.call_count * row_count if is_scan else 0,
+            reason_list,
+            [stats.fingerprint],
+        )
+
+    def _get_index_list(self, table_name: str) -> list[tuple[dict[str], list[str | None], str | None]]:
+        """(PRAGMA index_list, カラム名のリスト(式ならNone), 部分インデックスの条件)"""
+        table_schema = self.driver.schema_catalog.get_table_schema(self.driver, table_name)
+        index_list = []
+        for raw_index in table_schema.raw_index_list:
+            raw_index_info_list = sorted(
+                table_schema.raw_index_info_dict.get(raw_index["name"], []), key=lambda raw: raw["seqno"]
+            )
+            where_text = None
+            if raw_index["partial"]:
+                with self.driver.write_lock:
+                    row = self.driver.conn.execute(
+                        "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", (raw_index["name"],)
+                    ).fetchone()
+                match = re.search(r"\bWHERE\b(.*)$", row[0] if not row is None else "", re.IGNORECASE | re.DOTALL)
+                where_text = " ".join(match.group(1).split()) if not match is None else ""
+            index_list.append((raw_index, [raw["name"] for raw in raw_index_info_list], where_text))
+        return index_list
+
+    def _get_rowid_column_name(self, table_name: str) -> str | None:
+        """INTEGER PRIMARY KEYのカラム(rowidそのものなのでインデックスはいらない)"""
+        raw_column_list = self.driver.schema_catalog.get_table_schema(self.driver, table_name).raw_column_list
+        pk_column_list = [raw_column for raw_column in raw_column_list if raw_column["pk"] > 0]
+        if pk_column_list.__len__() == 1 and pk_column_list[0]["type"].upper() == "INTEGER":
+            return pk_column_list[0]["name"]
+        return None
+
+    def _is_covered(self, proposal: IndexProposal) -> bool:
+        """今あるインデックスの左端プレフィックスで引ける(ANALYZEしていないので使われていないだけ)"""
+        if proposal.column_name_list == [self._get_rowid_column_name(proposal.table_name)]:
+            return True
+        for _, column_name_list, where_text in self._get_index_list(proposal.table_name):
+            if where_text != proposal.where_text and not where_text is None:
+                continue
+            if where_text is None and not proposal.where_text is None:
+                continue
+            if column_name_list[: proposal.column_name_list.__len__()] == proposal.column_name_list:
+                return True
+        return False
+
+    def _get_drop_list(
+        self,
+        stats_list: list[StatementStats],
+        statement_plan_list: list[StatementPlan],
+        create_list: list[IndexProposal],
+    ) -> list[DropProposal]:
+        used_index_name_set = set()
+        read_table_name_set = set()
+        for statement_plan in statement_plan_list:
+            used_index_name_set |= statement_plan.used_index_name_set
+            read_table_name_set |= {predicate.table_name for predicate in statement_plan.predicate_list}
+            read_table_name_set |= set(statement_plan.scan_table_name_list)
+        # 書き込みのたびにテーブルとすべてのインデックスを更新するので、その分を等分したものを消したときの見積もりにする
+        write_time_ms_dict = {}
+        for stats in stats_list:
+            match = WRITE_TABLE_PATTERN.match(stats.sample_sql)
+            if not match is None:
+                table_name = self._table_name_dict.get(match.group(1).split(".")[-1].lower())
+                if not table_name is None:
+                    write_time_ms_dict[table_name] = write_time_ms_dict.get(table_name, 0.0) + stats.total_time_ms
+
+        drop_list = []
+        for table_name in self._table_name_dict.values():
+            index_list = self._get_index_list(table_name)
+            foreign_key_column_name_set = {
+                raw_foreign_key["from"]
+                for raw_foreign_key in self.driver.schema_catalog.get_table_schema(
+                    self.driver, table_name
+                ).raw_foreign_key_list
+            }
+            other_column_name_list_list = [
+                (raw_index["name"], raw_index["origin"], bool(raw_index["unique"]), column_name_list)
+                for raw_index, column_name_list, where_text in index_list
+                if where_text is None
+            ] + [
+                (proposal.index_name, "proposal", False, proposal.column_name_list)
+                for proposal in create_list
+                if proposal.table_name == table_name and proposal.where_text is None
+            ]
+            benefit_ms = write_time_ms_dict.get(table_name, 0.0) / (index_list.__len__() + 1)
+            rowid_column_name = self._get_rowid_column_name(table_name)
+            for raw_index, column_name_list, where_text in index_list:
+                # UNIQUE, PRIMARY KEYの制約のインデックスは消せない
+                if raw_index["origin"] != "c" or raw_index["unique"] or None in column_name_list:
+                    continue
+                reason = None
+                if column_name_list == [rowid_column_name]:
+                    reason = f"{rowid_column_name}はINTEGER PRIMARY KEY(rowid)です。"
+                elif where_text is None:
+                    for other_index_name, origin, is_unique, other_column_name_list in other_column_name_list_list:
+                        if other_index_name == raw_index["name"]:
+                            continue
+                        if other_column_name_list[: column_name_list.__len__()] != column_name_list:
+                            continue
+                        # 同じカラムのインデックス同士なら片方だけ消す
+                        if other_column_name_list == column_name_list and origin == "c" and not is_unique:
+                            if other_index_name > raw_index["name"]:
+                                continue
+                        reason = f"{other_index_name}({', '.join(other_column_name_list)})の左端プレフィックスです。"
+                        break
+                if (
+                    reason is None
+                    and statement_plan_list.__len__() > 0
+                    and table_name in read_table_name_set
+                    and not raw_index["name"] in used_index_name_set
+                    and not column_name_list[0] in foreign_key_column_name_set  # 親の行を消すときに子を探すのに使う
+                ):
+                    reason = f"記録した{statement_plan_list.__len__()}個の文で使われていません。"
+                if not reason is None:
+                    drop_list.append(DropProposal(table_name, raw_index["name"], column_name_list, reason, benefit_ms))
+        drop_list.sort(key=lambda proposal: proposal.benefit_ms, reverse=True)
+        return drop_list
@@ -0,0 +1,104 @@
+from dataclasses import dataclass, field
+from typing import Callable
+import sqlite3
+import threading
+import weakref
+import queue
+
+from sql_module import exceptions
+
+
+class ReaderLease:
+    """スレッドに貸し出している読み取り用コネクション。スレッドが終わってこれが消えるとプールに返る"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+@dataclass
+class ReaderPool:
+    """
+    読み取り専用に使うコネクションのプール。スレッド(やタスク)ごとに1つ貸し出す
+    WALモードなら、書き込み用のコネクションが書いている間も並列に読める
+    """
+
+    connect: Callable[[], sqlite3.Connection]
+    size: int
+    timeout_sec: int | float
+    # 開いたあとにPRAGMAなどを適用し直す(reconfigureのあと、コネクションを使うスレッドで呼ぶ)
+    configure: Callable[[sqlite3.Connection], None] | None = None
+    conn_list: list[sqlite3.Connection] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._idle_queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._version = 0  # reconfigureした回数
+        self._version_dict: dict[int, int] = {}  # id(コネクション) -> 最後にconfigureしたときの_version
+
+    def reconfigure(self):
+        """
+        PRAGMAを変えたとき。どのコネクションも、次に使うときにそのスレッドでconfigureし直す
+        (貸し出し中のコネクションも、他のスレッドのクエリの途中で触らないように、借りているスレッドの次のクエリで)
+        """
+        with self._lock:
+            self._version += 1
+
+    def get_cursor(self) -> sqlite3.Cursor:
+        """
+        このスレッドに貸し出しているコネクションの新しいcursor。まだなければ借りる
+        クエリごとに新しいcursorにするので、iter_batchesで読んでいる途中の結果を次のクエリで上書きしない
+        """
+        lease = getattr(self._local, "lease", None)
+        if lease is None:
+            conn = self._acquire()
+            lease = ReaderLease(conn)
+            # スレッドが終わってthreading.localが消えたら、コネクションをプールに返す
+            weakref.finalize(lease, self._put_back, conn)
+            self._local.lease = lease
+        if self._version_dict.get(id(lease.conn), 0) != self._version:
+            version = self._version
+            if not self.configure is None:
+                self.configure(lease.conn)
+            self._version_dict[id(lease.conn)] = version
+        return lease.conn.cursor()
+
+    def release(self):
+        """このスレッドに貸し出しているコネクションを返す。スレッドを使い回すタスク単位で使う場合に"""
+        if hasattr(self._local, "lease"):
+            del self._local.lease
+
+    def close_all(self):
+        with self._lock:
+            for conn in self.conn_list:
+                conn.close()
+            self.conn_list = []
+            self._version_dict = {}
+            self._idle_queue = queue.Queue()
+        self.release()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle_queue.get_nowait()
+        except queue.Empty:
+            pass
+        # 空きがなければsizeまで新しく作る
+        with self._lock:
+            if self.conn_list.__len__() < self.size:
+                conn = self.connect()
+                self.conn_list.append(conn)
+                # 開いたときに今のPRAGMAが適用されている
+                self._version_dict[id(conn)] = self._version
+                return conn
+        # それでもなければ返ってくるのを待つ
+        try:
+            return self._idle_queue.get(timeout=self.timeout_sec)
+        except queue.Empty:
+            raise exceptions.PoolTimeoutError(
+                f"読み取り用コネクション(最大{self.size}個)が{self.timeout_sec}秒待っても空きませんでした。"
+            )
+
+    def _put_back(self, conn: sqlite3.Connection):
+        # close_all済みのコネクションは戻さない
+        if any(conn is pool_conn for pool_conn in self.conn_list):
+            self._idle_queue.put(conn)
@@ -0,0 +1,54 @@
+from sql_module.exceptions import SQLValueError
+
+# コネクションを開くたびに適用するPRAGMAのプロファイル
+# journal_modeはデータベースファイルに保存されるので、ここではなくSQLiteDataBase.is_wal_modeで決める
+# page_sizeもデータベースファイルを作る前(最初のテーブルを作る前)にしか効かないので入れない(あとから変えるならVACUUMが要る)
+# busy_timeoutはSQLiteDataBase.timeout_secで決める(ここに入れるとtimeout_secより後に適用されて上書きしてしまう)
+PRAGMA_PROFILE_DICT: dict[str, dict[str, str | int]] = {
+    # 電源断でもコミット済みのものは消えない(SQLiteのデフォルトに近い)
+    "durable": {
+        "synchronous": "FULL",
+        "temp_store": "DEFAULT",
+        "wal_autocheckpoint": 1000,
+    },
+    # WALならNORMALでもデータベースは壊れない(電源断で直前のコミットが消えることはある)。キャッシュとmmapを増やす
+    "balanced": {
+        "synchronous": "NORMAL",
+        "cache_size": -64 * 1024,  # 負の値はKiB単位。64MiB
+        "temp_store": "MEMORY",
+        "mmap_size": 256 * 1024 * 1024,
+        "wal_autocheckpoint": 1000,
+    },
+    # 大量に流し込む用。fsyncしないので、途中で落ちたら作り直す前提
+    "bulk_load": {
+        "synchronous": "OFF",
+        "cache_size": -256 * 1024,
+        "temp_store": "MEMORY",
+        "mmap_size": 1024 * 1024 * 1024,
+        "wal_autocheckpoint": 10000,
+    },
+    # 読むだけのプロセス用。誤って書き込めないようにする(WALにしたデータベースに使う)
+    "read_replica": {
+        "query_only": "ON",
+        "cache_size": -128 * 1024,
+        "temp_store": "MEMORY",
+        "mmap_size": 1024 * 1024 * 1024,
+    },
+}
+
+
+def get_pragma_dict(
+    profile: str | None = None, pragma_dict: dict[str, str | int] | None = None
+) -> dict[str, str | int]:
+    """
+    プロファイルのPRAGMAに、pragma_dictを上書きしたもの
+    例: get_pragma_dict("balanced", {"cache_size": -20000, "busy_timeout": 10000})
+    """
+    merged_pragma_dict = {}
+    if not profile is None:
+        if not profile in PRAGMA_PROFILE_DICT:
+            raise SQLValueError(f"PRAGMAのプロファイル: {profile}はありません。{list(PRAGMA_PROFILE_DICT)}から選んでください。")
+        merged_pragma_dict.update(PRAGMA_PROFILE_DICT[profile])
+    if not pragma_dict is None:
+        merged_pragma_dict.update(pragma_dict)
+    return merged_pragma_dict
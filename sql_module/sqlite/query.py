@@ -4,12 +4,56 @@ import datetime
 from typing import Self, Literal
 import sqlite3
 from sql_module import utils, Driver, exceptions
+from sql_module.sqlite.statement_cache import CompiledStatement
+from sql_module.sqlite.temp_value_table import TempValueTable
+
+
+class Placeholder:
+    """ロープ上のプレースホルダの値(measurementで:p0みたいになる)"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: str | int | sqlite3.Binary | None):
+        self.value = value
+
+
+def flatten_rope(
+    rope: str | Placeholder | TempValueTable | tuple, temp_value_table_list: list[TempValueTable] | None = None
+) -> tuple[list[str], list]:
+    """
+    ロープを(string_list, value_list)に展開する。再帰しないので深いロープでもok
+    ("SELECT ", ("a = ", Placeholder(1)), " AND b = ", Placeholder(2))
+    ->
+    ['SELECT a = ', ' AND b = ', ''], [1, 2]
+    TempValueTableはテーブル名の文字列になり、temp_value_table_listがあればそこに追記する
+    """
+    string_list = []
+    value_list = []
+    buffer = []
+    stack = [rope]
+    while stack:
+        node = stack.pop()
+        if node.__class__ is tuple:
+            stack.extend(reversed(node))
+        elif node.__class__ is Placeholder:
+            string_list.append("".join(buffer))
+            buffer = []
+            value_list.append(node.value)
+        elif node.__class__ is TempValueTable:
+            buffer.append(node.table_name)
+            if not temp_value_table_list is None:
+                temp_value_table_list.append(node)
+        else:
+            buffer.append(node)
+    string_list.append("".join(buffer))
+    return string_list, value_list
 
 
 class Query:
     def __init__(self, first_string: str | None = None, driver: Driver = None):
         """
         sqlのクエリを司るオブジェクト。+で文字結合, *で値結合して使う
+        中身は追記専用のロープ(str, Placeholder, TempValueTable, tupleの入れ子)で、演算のたびにコピーしない。measurementなどで観測した時に初めて展開される。
         # TODO Python3.14からテンプレート文字列というのがあるらしい。これ使えるんじゃね...?
         """
         self.driver = driver
@@ -17,9 +61,83 @@ class Query:
         # 最初の文字を設定
         if first_string is None:
             first_string = ""
-        self.string_list = [first_string]
-        # 最初の値リストを設定(空のリスト)
-        self.value_list = []
+        self._set_rope(first_string)
+
+    @classmethod
+    def from_rope(cls, rope: str | Placeholder | tuple, driver: Driver | None = None) -> Self:
+        """ロープから直接Queryオブジェクトを作る"""
+        query = Query(driver=driver)
+        query._set_rope(rope)
+        return query
+
+    @classmethod
+    def from_compiled(cls, statement: CompiledStatement, value_list: list, driver: Driver | None = None) -> Self:
+        """コンパイル済みステートメントに値を差し込んでQueryオブジェクトを作る(QueryBuilderを通さない)"""
+        rope = [statement.string_list[0]]
+        for value, string in zip(value_list, statement.string_list[1:]):
+            rope.append(Placeholder(value))
+            rope.append(string)
+        query = cls(driver=driver)
+        query._set_rope(tuple(rope))
+        query._flatten_cache = (list(statement.string_list), value_list)
+        # ロープは文字列に戻っているので、一時テーブルはステートメントに覚えておいたもの
+        query._temp_value_table_list = list(statement.extra.get("temp_value_table_list", ()))
+        query._compiled_sql = statement.sql
+        return query
+
+    def _set_rope(self, rope: str | Placeholder | tuple):
+        # ロープのノードは不変なので、他のQueryオブジェクトと共有しても問題ない
+        self._rope = rope
+        self._flatten_cache = None
+        self._temp_value_table_list = None
+        self._compiled_sql = None
+
+    def _flatten(self) -> tuple[list[str], list]:
+        if self._flatten_cache is None:
+            temp_value_table_list = []
+            self._flatten_cache = flatten_rope(self._rope, temp_value_table_list)
+            self._temp_value_table_list = temp_value_table_list
+        return self._flatten_cache
+
+    @property
+    def string_list(self) -> list[str]:
+        return self._flatten()[0]
+
+    @string_list.setter
+    def string_list(self, string_list: list[str]):
+        self._set_lists(string_list, self.value_list if hasattr(self, "_rope") else [])
+
+    @property
+    def value_list(self) -> list:
+        return self._flatten()[1]
+
+    @value_list.setter
+    def value_list(self, value_list: list):
+        self._set_lists(self.string_list if hasattr(self, "_rope") else [""], value_list)
+
+    @property
+    def temp_value_table_list(self) -> list[TempValueTable]:
+        """このクエリが使う値の一時テーブル(実行する直前にdriverが作る)"""
+        self._flatten()
+        return self._temp_value_table_list
+
+    def _set_lists(self, string_list: list[str], value_list: list):
+        """string_list, value_listからロープを組み直す(後方互換用)"""
+        rope = [string_list[0]]
+        for value, string in zip(value_list, string_list[1:]):
+            rope.append(Placeholder(value))
+            rope.append(string)
+        self._set_rope(tuple(rope))
+        # 長さが合っていない場合にraise_for_lengthで検知できるように、そのまま保持
+        self._flatten_cache = (list(string_list), list(value_list))
+        self._temp_value_table_list = []
+
+    def is_empty(self) -> bool:
+        """文字も値もない空のクエリかどうか"""
+        if self._rope == "":
+            return True
+        string_list, value_list = self._flatten()
+        return value_list.__len__() == 0 and string_list[0] == ""
 
     def view_plan(self, is_detail: bool = False):
         if is_detail:
@@ -38,57 +156,41 @@ class Query:
             )
 
     def copy(self) -> Self:
-        """自Queryオブジェクトのコピーを取得"""
-        _query = Query()
-        _query.string_list = self.string_list.copy()
-        _query.value_list = self.value_list.copy()
-        _query.driver = self.driver  # driverはコピーして別インスタンスにしてはいけない
+        """自Queryオブジェクトのコピーを取得(ロープは不変なので共有するだけ)"""
+        _query = Query.from_rope(self._rope, self.driver)  # driverはコピーして別インスタンスにしてはいけない
+        _query._flatten_cache = self._flatten_cache
+        _query._temp_value_table_list = self._temp_value_table_list
+        _query._compiled_sql = self._compiled_sql
         return _query
 
     def straight_set(self, query: Self):
         """他Queryオブジェクトを自Queryオブジェクトに上書き(driverはマージ)"""
-        _query = query.copy()
-        self.string_list = _query.string_list
-        self.value_list = _query.value_list
-        self.merge_driver(_query.driver)
+        self._set_rope(query._rope)
+        self._flatten_cache = query._flatten_cache
+        self._temp_value_table_list = query._temp_value_table_list
+        self._compiled_sql = query._compiled_sql
+        self.merge_driver(query.driver)
 
     def __add__(self, other: str | Self) -> Self:
-        self = self.copy()
         if isinstance(other, str):
-            self.string_list[-1] = f"{self.string_list[-1]}{other}"
-            return self
+            return Query.from_rope((self._rope, other), self.driver)
         if isinstance(other, Query):
-            other = other.copy()
-            # stringのselfとotherをつなげる
-            self.string_list[-1] = f"{self.string_list[-1]}{other.string_list[0]}"
-            self.string_list += other.string_list[1:]  # 要素数が1でも ["aaa"][1:] -> [] ってなるので問題ないです。
-            # valueのselfとotherをつなげる
-            self.value_list += other.value_list
+            _query = Query.from_rope((self._rope, other._rope), self.driver)
             # selfかotherにdriverがあったら採用する
-            self.merge_driver(other.driver)
-
-            return self
+            _query.merge_driver(other.driver)
+            return _query
 
     def __radd__(self, other: str) -> Self:
-        self = self.copy()
-        self.string_list[0] = f"{other}{self.string_list[0]}"
-        return self
+        return Query.from_rope((other, self._rope), self.driver)
 
     def __mul__(self, other: str | int | sqlite3.Binary | None) -> Self:
-        self = self.copy()
         if isinstance(other, Query):
             raise TypeError("Query*Queryは対応していません。Query+Queryは対応しています。")
 
-        self.string_list.append("")
-        self.value_list.append(other)
-        return self
+        return Query.from_rope((self._rope, Placeholder(other)), self.driver)
 
     def __rmul__(self, other: str | int | sqlite3.Binary | None) -> Self:
-        self = self.copy()
-
-        self.string_list.insert(0, "")
-        self.value_list.insert(0, other)
-        return self
+        return Query.from_rope((Placeholder(other), self._rope), self.driver)
 
     def __str__(self) -> str:
         query_string, placeholder_dict = self.measurement()
@@ -115,8 +217,8 @@ class Query:
     def execute(self, time_log: utils.LogLike | None = None):
         if self.driver is None:
             raise ValueError("実行するにはdriverが必要です。")
-        query_string, placeholder_dict = self.measurement()
-        self.driver.execute(query_string, placeholder_dict, time_log=time_log)
+        sql, parameters = self.compile()
+        self.driver.execute(sql, parameters, time_log=time_log, temp_value_table_list=self.temp_value_table_list)
 
     def commit(self, time_log: utils.LogLike | None = None):
         if self.driver is None:
@@ -126,61 +228,65 @@ class Query:
     def measurement(self) -> tuple[str, dict]:
         """現時点のクエリを観測"""
         self.raise_for_length()
-        query_string = self.string_list[0]
-        string_list2 = self.string_list[1:]
+        string_list, value_list = self._flatten()
+        query_string_list = [string_list[0]]
         placeholder_dict = dict()
 
-        for i, (value, string) in enumerate(zip(self.value_list, string_list2)):
+        for i, (value, string) in enumerate(zip(value_list, string_list[1:])):
             # 変数名 (例: ':p2')
             value_name = f"p{i}"
-            query_string += f":{value_name}{string}"
+            query_string_list.append(f":{value_name}{string}")
             placeholder_dict[value_name] = value
 
-        query_string = query_string.strip()
+        query_string = "".join(query_string_list).strip()
 
         return query_string, placeholder_dict
 
+    def compile(self) -> tuple[str, tuple]:
+        """
+        実行用に観測。プレースホルダは?で、パラメータはタプル
+        SQL文字列はこのQueryオブジェクトにキャッシュされ、StatementCacheで同じ形のクエリに使い回される
+        """
+        self.raise_for_length()
+        string_list, value_list = self._flatten()
+        if self._compiled_sql is None:
+            self._compiled_sql = "?".join(string_list).strip()
+        return self._compiled_sql, tuple(value_list)
+
     def substitute(self) -> str:
         """現時点のプレースホルダをクエリ文字列に代入する(CREATE INDEXで必要になった)"""
-        query_string = self.string_list[0]
-        string_list2 = self.string_list[1:]
+        string_list, value_list = self._flatten()
+        query_string_list = [string_list[0]]
 
-        for i, (value, string) in enumerate(zip(self.value_list, string_list2)):
+        for value, string in zip(value_list, string_list[1:]):
             if isinstance(value, str):
                 value = f"'{value}'"
-            query_string += value.__str__()
-            query_string += string
+            query_string_list.append(value.__str__())
+            query_string_list.append(string)
 
-        return query_string
+        return "".join(query_string_list)
 
 
 def query_join_comma(query_list: list[Query], no_empty: bool = False) -> Query:
-    base_query = Query()
-    # :p0, :p1
-    i = 0
-    for query in query_list:
-        if no_empty and query.string_list.__len__() == 1 and query.string_list[0] == "":
-            continue
-        # 初回のみカンマいらぬ
-        if i > 0:
-            base_query += ", "
-        i += 1
-        base_query += query
-
-    return base_query
+    return _query_join(query_list, ", ", no_empty)
 
 
 def query_join_space(query_list: list[Query], no_empty: bool = False) -> Query:
-    base_query = Query()
-    # :p0, :p1
-    i = 0
+    return _query_join(query_list, " ", no_empty)
+
+
+def _query_join(query_list: list[Query], separator: str, no_empty: bool) -> Query:
+    """区切り文字でつなぐ。1つのロープにまとめるので要素数に対して線形"""
+    rope_list = []
+    driver = None
     for query in query_list:
-        if no_empty and query.string_list.__len__() == 1 and query.string_list[0] == "":
+        if no_empty and query.is_empty():
             continue
-        # 初回のみスペースいらぬ
-        if i > 0:
-            base_query += " "
-        i += 1
-        base_query += query
-
-    return base_query
+        # 初回のみ区切り文字いらぬ
+        if rope_list.__len__() > 0:
+            rope_list.append(separator)
+        rope_list.append(query._rope)
+        if not query.driver is None:
+            driver = query.driver
+
+    return Query.from_rope(tuple(rope_list), driver)
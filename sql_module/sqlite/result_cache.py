@@ -0,0 +1,172 @@
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from typing import Hashable
+import re
+import sqlite3
+import threading
+
+# SELECTが読むテーブル(FROM / JOINの後ろ。json_each(...)などのテーブル値関数は除く)
+READ_TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+([\w.]+)\b(?!\s*\()", re.IGNORECASE)
+# 書き込むテーブル
+WRITE_TABLE_PATTERN = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM"
+    r"|DROP\s+TABLE(?:\s+IF\s+EXISTS)?|ALTER\s+TABLE)\s+([\w.]+)",
+    re.IGNORECASE,
+)
+
+
+class CachedCursor:
+    def __init__(self, description: tuple, row_list: list[sqlite3.Row]):
+        """キャッシュした結果を、sqlite3.Cursorと同じようにfetchするためのもの(Driver.fetchallなどから使う)"""
+        self.description = description
+        self.row_list = row_list
+        self.connection = None  # コネクションを使わないのでロックもいらない
+        self._position = 0
+
+    def fetchall(self) -> list[sqlite3.Row]:
+        row_list = self.row_list[self._position :]
+        self._position = self.row_list.__len__()
+        return row_list
+
+    def fetchmany(self, size: int) -> list[sqlite3.Row]:
+        row_list = self.row_list[self._position : self._position + size]
+        self._position += row_list.__len__()
+        return row_list
+
+    def fetchone(self) -> sqlite3.Row | None:
+        if self._position >= self.row_list.__len__():
+            return None
+        row = self.row_list[self._position]
+        self._position += 1
+        return row
+
+
+@dataclass
+class CachedResult:
+    description: tuple
+    row_list: list[sqlite3.Row]
+    data_version: int
+    write_count_dict: dict[str, int]  # 読むテーブルごとの、実行したときの書き込み回数
+
+
+@dataclass
+class ResultCache:
+    """
+    Select(is_cache=True)の結果のLRUキャッシュ。キーはコンパイルしたSQL('?'のプレースホルダ)とパラメータ
+    次のどちらかが変わったら使わない
+    - PRAGMA data_version(書き込み用コネクションで見る): 他のコネクション・プロセスがコミットしたら変わる
+    - このライブラリ(driver.execute, executemany)で書き込んだテーブルごとの回数: 読むテーブルと、その外部キーの親テーブル(ON DELETE CASCADEで消える)
+    driver.executeを通さない書き込みや、ユーザーが作ったトリガーで別のテーブルに書き込んだ分は分からないので、そういうテーブルには使わないこと
+    """
+
+    max_size: int = 256
+    max_row_count: int = 100000  # キャッシュしている行数の合計の上限。これより多い結果はキャッシュしない
+    hit: int = 0
+    miss: int = 0
+    invalidate_count: int = 0  # 書き込みでキャッシュが古くなっていた回数
+    _result_dict: OrderedDict = field(default_factory=OrderedDict, repr=False)
+    _row_count: int = field(default=0, repr=False)
+    _write_count_dict: dict[str, int] = field(default_factory=dict, repr=False)
+    _uncommitted_table_name_set: set[str] = field(default_factory=set, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return self._result_dict.__len__()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hit + self.miss
+        if total == 0:
+            return 0.0
+        return self.hit / total
+
+    def get_key(self, sql: str, parameters: tuple) -> Hashable:
+        # 1と'1'、1と1.0を区別する。sqlite3.Binary(memoryview)はハッシュできないのでbytesに
+        return sql, tuple(
+            (value.__class__, bytes(value) if isinstance(value, memoryview) else value) for value in parameters
+        )
+
+    def get(self, key: Hashable, data_version: int) -> CachedCursor | None:
+        with self._lock:
+            result = self._result_dict.get(key)
+            if result is None:
+                self.miss += 1
+                return None
+            if not self._is_fresh(result, data_version):
+                self._pop(key)
+                self.invalidate_count += 1
+                self.miss += 1
+                return None
+            self.hit += 1
+            self._result_dict.move_to_end(key)
+            return CachedCursor(result.description, result.row_list)
+
+    def set(
+        self,
+        key: Hashable,
+        description: tuple,
+        row_list: list[sqlite3.Row],
+        data_version: int,
+        write_count_dict: dict[str, int],
+    ):
+        if row_list.__len__() > self.max_row_count:
+            return
+        with self._lock:
+            if key in self._result_dict:
+                self._pop(key)
+            self._result_dict[key] = CachedResult(description, row_list, data_version, write_count_dict)
+            self._row_count += row_list.__len__()
+            # 古いものから捨てる
+            while self._result_dict.__len__() > self.max_size or self._row_count > self.max_row_count:
+                self._pop(next(iter(self._result_dict)))
+
+    def get_read_table_name_list(self, sql: str) -> list[str]:
+        return list(dict.fromkeys(table_name.lower() for table_name in READ_TABLE_PATTERN.findall(sql)))
+
+    def get_write_count_dict(self, table_name_list: list[str]) -> dict[str, int]:
+        """実行する前に取っておく(実行中に書き込まれたら次は使わない)"""
+        with self._lock:
+            return {table_name: self._write_count_dict.get(table_name, 0) for table_name in table_name_list}
+
+    def record_write(self, query: str):
+        """書き込みのクエリを実行したとき。書き込むテーブルの回数を増やす"""
+        match = WRITE_TABLE_PATTERN.match(query)
+        if match is None:
+            return
+        table_name = match.group(1).lower()
+        with self._lock:
+            self._write_count_dict[table_name] = self._write_count_dict.get(table_name, 0) + 1
+            self._uncommitted_table_name_set.add(table_name)
+
+    def record_commit(self):
+        """
+        コミット・ロールバックしたとき。トランザクション中に書き込んだテーブルの回数をもう一度増やす
+        (プール時、書き込み中に読み取り用コネクションでキャッシュした結果は、コミット前の中身なので)
+        """
+        with self._lock:
+            for table_name in self._uncommitted_table_name_set:
+                self._write_count_dict[table_name] = self._write_count_dict.get(table_name, 0) + 1
+            self._uncommitted_table_name_set.clear()
+
+    def clear(self):
+        """コネクションを閉じたとき(data_versionはコネクションごとの値なので)"""
+        with self._lock:
+            self._result_dict.clear()
+            self._row_count = 0
+
+    def reset_stats(self):
+        self.hit = 0
+        self.miss = 0
+        self.invalidate_count = 0
+
+    def _is_fresh(self, result: CachedResult, data_version: int) -> bool:
+        if result.data_version != data_version:
+            return False
+        return all(
+            self._write_count_dict.get(table_name, 0) == write_count
+            for table_name, write_count in result.write_count_dict.items()
+        )
+
+    def _pop(self, key: Hashable):
+        result = self._result_dict.pop(key)
+        self._row_count -= result.row_list.__len__()
@@ -0,0 +1,112 @@
+from dataclasses import dataclass, field
+import random
+import re
+import sqlite3
+import threading
+
+# sqlite3.OperationalError.sqlite_errorcodeの下位8bit
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+_TABLE_NAME_PATTERN = re.compile(r"\b(?:INTO|UPDATE|FROM|TABLE)\s+(\w+)", re.IGNORECASE)
+
+
+@dataclass
+class RetryPolicy:
+    """
+    'database is locked'(SQLITE_BUSY, SQLITE_LOCKED)になったときのリトライ方法
+    待ち時間は指数バックオフ(base_sec * 2^回数、max_secまで)にジッター(0からその値までの一様乱数)をかけたもの
+    timeout_secの分はsqlite側で待ってからエラーになるので、その後にさらに待つ分
+    """
+
+    max_retry: int = 5
+    base_sec: float = 0.05
+    max_sec: float = 2.0
+    max_replay: int = 3  # run_transactionでトランザクションを最初からやり直す回数
+
+    def get_wait_sec(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_sec, self.base_sec * 2**attempt))
+
+    def is_retryable(self, e: Exception) -> bool:
+        if not isinstance(e, sqlite3.OperationalError):
+            return False
+        error_code = getattr(e, "sqlite_errorcode", None)
+        if not error_code is None:
+            return error_code & 0xFF in (SQLITE_BUSY, SQLITE_LOCKED)
+        message = str(e)
+        return "database is locked" in message or "database table is locked" in message
+
+
+@dataclass
+class RetryCounter:
+    retry_count: int = 0
+    wait_sec: float = 0.0
+    give_up_count: int = 0  # リトライしきれずにraiseした回数
+
+
+@dataclass
+class RetryStats:
+    """
+    リトライの回数と待ち時間の集計。テーブルごと・ステートメントの形(?のままのSQL)ごとに見れる
+    どこで複数プロセスの書き込みがぶつかっているかを探すのに使う
+    """
+
+    total: RetryCounter = field(default_factory=RetryCounter)
+    table_dict: dict[str, RetryCounter] = field(default_factory=dict)
+    statement_dict: dict[str, RetryCounter] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # 複数プロセスのワーカーから集めるときにpickleできるように
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def merge(self, other: "RetryStats"):
+        """他(別プロセスのワーカーなど)の集計を足し込む"""
+        with self._lock:
+            pair_list = [(self.total, other.total)]
+            for name, counter in other.table_dict.items():
+                pair_list.append((self.table_dict.setdefault(name, RetryCounter()), counter))
+            for statement, counter in other.statement_dict.items():
+                pair_list.append((self.statement_dict.setdefault(statement, RetryCounter()), counter))
+            for counter, other_counter in pair_list:
+                counter.retry_count += other_counter.retry_count
+                counter.wait_sec += other_counter.wait_sec
+                counter.give_up_count += other_counter.give_up_count
+
+    def record_retry(self, statement: str, wait_sec: float):
+        with self._lock:
+            for counter in self._get_counter_list(statement):
+                counter.retry_count += 1
+                counter.wait_sec += wait_sec
+
+    def record_give_up(self, statement: str):
+        with self._lock:
+            for counter in self._get_counter_list(statement):
+                counter.give_up_count += 1
+
+    def get_table_name(self, statement: str) -> str | None:
+        match = _TABLE_NAME_PATTERN.search(statement)
+        if match is None:
+            return None
+        return match.group(1)
+
+    def reset(self):
+        with self._lock:
+            self.total = RetryCounter()
+            self.table_dict = {}
+            self.statement_dict = {}
+
+    def _get_counter_list(self, statement: str) -> list[RetryCounter]:
+        counter_list = [self.total, self.statement_dict.setdefault(statement, RetryCounter())]
+        table_name = self.get_table_name(statement)
+        if not table_name is None:
+            counter_list.append(self.table_dict.setdefault(table_name, RetryCounter()))
+        return counter_list
@@ -0,0 +1,116 @@
+from dataclasses import dataclass, field
+import threading
+
+
+@dataclass
+class TableSchema:
+    """1つのテーブルのPRAGMAの結果(Infoのraw_xxx_listと同じ形のdictのリスト)"""
+
+    name: str
+    raw_column_list: list[dict[str]] = field(default_factory=list)  # PRAGMA table_info
+    raw_foreign_key_list: list[dict[str]] = field(default_factory=list)  # PRAGMA foreign_key_list
+    raw_index_list: list[dict[str]] = field(default_factory=list)  # PRAGMA index_list
+    raw_index_info_dict: dict[str, list[dict[str]]] = field(default_factory=dict)  # インデックス名: PRAGMA index_info
+
+
+@dataclass
+class SchemaCatalogStats:
+    hit: int = 0
+    load_count: int = 0  # スキーマが変わって読み直した回数
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hit + self.load_count
+        if total == 0:
+            return 0.0
+        return self.hit / total
+
+
+@dataclass
+class SchemaCatalog:
+    """
+    データベース全体のテーブル・カラム・インデックス・外部キーの情報
+    sqlite_masterと各テーブルのPRAGMAを、テーブル値関数(pragma_table_infoなど)でまとめて数クエリで読んで、PRAGMA schema_versionが変わるまで使い回す
+    (CREATE, DROP, ALTERなどでschema_versionは増える。他のコネクション・プロセスでの変更も同じ)
+    Table.exists, Table.info, SQLiteDataBase.get_exists_table_listはここから返す
+    """
+
+    stats: SchemaCatalogStats = field(default_factory=SchemaCatalogStats)
+    _schema_version: int | None = field(default=None, repr=False)
+    _table_name_list: list[str] = field(default_factory=list, repr=False)
+    _table_schema_dict: dict[str, TableSchema] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get_table_name_list(self, driver) -> list[str]:
+        """sqlite_masterのtype = 'table'の名前(sqlite_sequenceや全文検索のテーブルも含む)"""
+        table_name_list, _ = self._load(driver)
+        return list(table_name_list)
+
+    def exists(self, driver, table_name: str) -> bool:
+        _, table_schema_dict = self._load(driver)
+        return table_name in table_schema_dict
+
+    def get_table_schema(self, driver, table_name: str) -> TableSchema:
+        """テーブルがなければ中身が空のTableSchema(PRAGMAを直接実行したときと同じ)"""
+        _, table_schema_dict = self._load(driver)
+        return table_schema_dict.get(table_name, TableSchema(table_name))
+
+    def clear(self):
+        """ロールバックしたとき(schema_versionが戻るので、同じ番号で中身の違うスキーマを読んでいるかもしれない)"""
+        with self._lock:
+            self._schema_version = None
+
+    def _load(self, driver) -> tuple[list[str], dict[str, TableSchema]]:
+        """
+        schema_versionが変わっていたら読み直して、(テーブル名のリスト, テーブル名: TableSchema)を返す
+        driver.executeは書き込み用コネクションのロックを取るので、self._lockを持ったまま呼ばない
+        (transactionのブロックは書き込み用コネクションのロックを持ったままここに来るので、逆の順番で取ると止まる)
+        """
+        driver.execute("SELECT schema_version FROM pragma_schema_version")
+        schema_version = driver.fetchone()[0]
+        with self._lock:
+            if schema_version == self._schema_version:
+                self.stats.hit += 1
+                return self._table_name_list, self._table_schema_dict
+
+        raw_table_list = self._fetchall(driver, "SELECT name FROM sqlite_master WHERE type = 'table'")
+        table_name_list = [raw_table["name"] for raw_table in raw_table_list]
+        table_schema_dict = {table_name: TableSchema(table_name) for table_name in table_name_list}
+        for raw_column in self._fetchall(
+            driver,
+            "SELECT m.name AS table_name, p.* FROM sqlite_master AS m, pragma_table_info(m.name) AS p "
+            "WHERE m.type = 'table'",
+        ):
+            table_schema_dict[raw_column.pop("table_name")].raw_column_list.append(raw_column)
+        for raw_foreign_key in self._fetchall(
+            driver,
+            "SELECT m.name AS table_name, p.* FROM sqlite_master AS m, pragma_foreign_key_list(m.name) AS p "
+            "WHERE m.type = 'table'",
+        ):
+            table_schema_dict[raw_foreign_key.pop("table_name")].raw_foreign_key_list.append(raw_foreign_key)
+        for raw_index in self._fetchall(
+            driver,
+            "SELECT m.name AS table_name, p.* FROM sqlite_master AS m, pragma_index_list(m.name) AS p "
+            "WHERE m.type = 'table'",
+        ):
+            table_schema_dict[raw_index.pop("table_name")].raw_index_list.append(raw_index)
+        for raw_index_info in self._fetchall(
+            driver,
+            "SELECT m.name AS table_name, l.name AS index_name, p.* FROM sqlite_master AS m, "
+            "pragma_index_list(m.name) AS l, pragma_index_info(l.name) AS p "
+            "WHERE m.type = 'table'",
+        ):
+            table_schema = table_schema_dict[raw_index_info.pop("table_name")]
+            table_schema.raw_index_info_dict.setdefault(raw_index_info.pop("index_name"), []).append(raw_index_info)
+
+        # 読んでいる間に他のスレッドが読み直していても、入れ替えるだけなので問題ない(次の呼び出しでschema_versionを見直す)
+        with self._lock:
+            self._table_name_list = table_name_list
+            self._table_schema_dict = table_schema_dict
+            self._schema_version = schema_version
+            self.stats.load_count += 1
+        return table_name_list, table_schema_dict
+
+    def _fetchall(self, driver, query: str) -> list[dict[str]]:
+        driver.execute(query)
+        return driver.fetchall(True)
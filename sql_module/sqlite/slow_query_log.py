@@ -0,0 +1,289 @@
+from dataclasses import dataclass, field
+from collections import deque
+from collections.abc import Sequence
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+import json
+import logging
+import re
+import sqlite3
+import threading
+
+# EXPLAIN QUERY PLANの全件走査の行。"SCAN post", "SCAN p"(別名), "SCAN post USING COVERING INDEX ..."
+SCAN_PATTERN = re.compile(r"^SCAN (\w+)")
+# 別名 -> テーブル名。"FROM post p", "JOIN post AS p"
+ALIAS_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+([\w.]+)\s+(?:AS\s+)?(\w+)", re.IGNORECASE)
+# SQL文字列 -> 実行計画を覚えておく数
+PLAN_CACHE_MAX_SIZE = 1024
+
+
+def get_redacted_value(value: object) -> object:
+    """ログに値を出さないように、型と長さだけにする"""
+    if value is None:
+        return None
+    if isinstance(value, (str, bytes, memoryview)):
+        return f"<{value.__class__.__name__}:{value.__len__()}>"
+    return f"<{value.__class__.__name__}>"
+
+
+def get_row_count(conn: sqlite3.Connection, table_name: str) -> int | None:
+    """行数の見積もり。テーブルでなければNone"""
+    try:
+        row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table_name,)).fetchone()
+    except sqlite3.OperationalError:
+        # ANALYZEしていなければsqlite_stat1がない
+        row = None
+    if not row is None:
+        return int(row[0].split()[0])
+    try:
+        # rowidのテーブルならO(log n)
+        row = conn.execute(f'SELECT MAX(_rowid_) FROM "{table_name}"').fetchone()
+    except sqlite3.OperationalError:
+        # 別名や、WITHOUT ROWIDのテーブル
+        return None
+    return row[0] or 0
+
+
+def get_plan_text_list(raw_plan_list: list[tuple[int, int, str]]) -> list[str]:
+    """EXPLAIN QUERY PLANの(id, parent, detail)を、親子関係で字下げした行に"""
+    depth_dict = {0: -1}
+    plan_text_list = []
+    for plan_id, parent_id, detail in raw_plan_list:
+        depth = depth_dict.get(parent_id, -1) + 1
+        depth_dict[plan_id] = depth
+        plan_text_list.append("  " * depth + detail)
+    return plan_text_list
+
+
+@dataclass
+class FullScan:
+    table_name: str
+    row_count: int  # sqlite_stat1(ANALYZEしていれば)か、MAX(rowid)の見積もり
+    detail: str
+
+
+@dataclass
+class CachedPlan:
+    schema_version: int
+    plan_text_list: list[str]
+    full_scan_list: list[FullScan]
+
+
+@dataclass
+class SlowQueryEntry:
+    time_text: str
+    duration_ms: float
+    sql: str
+    parameters: object  # redactならget_redacted_valueしたもの
+    plan_text_list: list[str] | None  # 実行計画が取れなかった(ジェネレータのexecutemanyなど)ならNone
+    full_scan_list: list[FullScan]
+    is_executemany: bool = False
+
+    @property
+    def is_flagged(self) -> bool:
+        """大きいテーブルを全件走査している"""
+        return self.full_scan_list.__len__() > 0
+
+    def to_dict(self) -> dict[str]:
+        return {
+            "time": self.time_text,
+            "duration_ms": self.duration_ms,
+            "sql": self.sql,
+            "parameters": self.parameters,
+            "plan": self.plan_text_list,
+            "full_scan": [
+                {"table_name": full_scan.table_name, "row_count": full_scan.row_count, "detail": full_scan.detail}
+                for full_scan in self.full_scan_list
+            ],
+            "is_executemany": self.is_executemany,
+            "is_flagged": self.is_flagged,
+        }
+
+
+@dataclass
+class SlowQueryLog:
+    """
+    driver.execute, executemanyでthreshold_ms以上かかったSQLを記録する(SQLiteDataBase.slow_query_log)
+    そのSQLのEXPLAIN QUERY PLANを同じコネクションで取って(SQLとschema_versionごとにキャッシュ)、
+    large_row_count行以上のテーブルをSCAN(全件走査)していたらフラグを立てる
+    log_pathがあれば1行1JSONでローテーションするファイルに書き出す。最近のものはentry_listにも残る
+    database.slow_query_log.threshold_ms = 100
+    """
+
+    threshold_ms: float | None = None  # Noneなら記録しない
+    log_path: Path | str | None = None
+    max_bytes: int = 10 * 1024 * 1024  # ログファイル1つの大きさ。超えたら.1, .2, ...にずらす
+    backup_count: int = 5
+    is_redact: bool = True  # パラメータの値を出さずに型と長さだけにする
+    large_row_count: int = 10000  # これ以上の行のテーブルのSCANにフラグを立てる
+    max_entry_count: int = 100  # entry_listに残す数
+    count: int = 0
+    flagged_count: int = 0
+    entry_list: deque = field(default_factory=deque, repr=False)
+    _plan_dict: dict[str, CachedPlan] = field(default_factory=dict, repr=False)
+    _logger: logging.Logger | None = field(default=None, repr=False)
+    _handler: RotatingFileHandler | None = field(default=None, repr=False)
+    _handler_path: Path | None = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def is_slow(self, time_ns: int) -> bool:
+        return not self.threshold_ms is None and time_ns >= self.threshold_ms * 1e6
+
+    def record(
+        self,
+        conn: sqlite3.Connection,
+        sql: str,
+        parameters: object,
+        time_ns: int,
+        is_executemany: bool = False,
+    ) -> SlowQueryEntry:
+        """
+        遅かった1回の実行を記録(書き込み用コネクションならロックの中で)
+        executemanyのparametersは行のリスト。実行計画には最初の行を使う
+        """
+        if is_executemany:
+            if isinstance(parameters, Sequence) and parameters.__len__() > 0:
+                plan_parameters = parameters[0]
+                log_parameters = {"first": self._get_log_parameters(parameters[0]), "row_count": parameters.__len__()}
+            else:
+                # ジェネレータはもう読んでしまっている
+                plan_parameters = None
+                log_parameters = None
+        else:
+            plan_parameters = parameters
+            log_parameters = self._get_log_parameters(parameters)
+
+        if is_executemany and plan_parameters is None:
+            plan = None
+        else:
+            plan = self.get_plan(conn, sql, plan_parameters)
+        entry = SlowQueryEntry(
+            datetime.now().isoformat(timespec="milliseconds"),
+            time_ns / 1e6,
+            sql,
+            log_parameters,
+            None if plan is None else plan.plan_text_list,
+            [] if plan is None else plan.full_scan_list,
+            is_executemany,
+        )
+
+        with self._lock:
+            self.count += 1
+            if entry.is_flagged:
+                self.flagged_count += 1
+            self.entry_list.append(entry)
+            while self.entry_list.__len__() > self.max_entry_count:
+                self.entry_list.popleft()
+            logger = self._get_logger()
+        if not logger is None:
+            logger.log(
+                logging.WARNING if entry.is_flagged else logging.INFO, json.dumps(entry.to_dict(), ensure_ascii=False)
+            )
+        return entry
+
+    def get_plan(self, conn: sqlite3.Connection, sql: str, parameters: object = None) -> CachedPlan | None:
+        """SQLの実行計画と全件走査。スキーマが変わるまで(インデックスを作るなど)キャッシュ。取れなければNone"""
+        try:
+            schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            with self._lock:
+                plan = self._plan_dict.get(sql)
+            if not plan is None and plan.schema_version == schema_version:
+                return plan
+
+            if parameters is None or parameters.__len__() == 0:
+                raw_plan_list = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+            else:
+                raw_plan_list = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+        except sqlite3.Error:
+            # DROP TABLEした後など
+            return None
+
+        raw_plan_list = [(raw_plan[0], raw_plan[1], raw_plan[3]) for raw_plan in raw_plan_list]
+        plan = CachedPlan(
+            schema_version, get_plan_text_list(raw_plan_list), self._get_full_scan_list(conn, sql, raw_plan_list)
+        )
+        with self._lock:
+            if self._plan_dict.__len__() >= PLAN_CACHE_MAX_SIZE:
+                self._plan_dict.clear()
+            self._plan_dict[sql] = plan
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self.count = 0
+            self.flagged_count = 0
+            self.entry_list.clear()
+            self._plan_dict.clear()
+
+    def close(self):
+        """ログファイルを閉じる(次に記録するときにまた開く)"""
+        with self._lock:
+            if not self._handler is None:
+                self._logger.removeHandler(self._handler)
+                self._handler.close()
+            self._handler = None
+            self._handler_path = None
+
+    def _get_log_parameters(self, parameters: object) -> object:
+        if parameters is None:
+            return None
+        if isinstance(parameters, dict):
+            if self.is_redact:
+                return {key: get_redacted_value(value) for key, value in parameters.items()}
+            return {key: self._get_json_value(value) for key, value in parameters.items()}
+        if self.is_redact:
+            return [get_redacted_value(value) for value in parameters]
+        return [self._get_json_value(value) for value in parameters]
+
+    def _get_json_value(self, value: object) -> object:
+        if isinstance(value, (bytes, memoryview)):
+            return bytes(value).hex()
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        return repr(value)
+
+    def _get_full_scan_list(
+        self, conn: sqlite3.Connection, sql: str, raw_plan_list: list[tuple[int, int, str]]
+    ) -> list[FullScan]:
+        alias_dict = {alias.lower(): table_name for table_name, alias in ALIAS_PATTERN.findall(sql)}
+        full_scan_list = []
+        for _, _, detail in raw_plan_list:
+            match = SCAN_PATTERN.match(detail)
+            if match is None:
+                continue
+            # "SCAN (subquery-1)"はマッチしない。"SCAN CONSTANT ROW"などテーブルでないものは行数がNone
+            name = match.group(1)
+            table_name = name
+            row_count = get_row_count(conn, table_name)
+            if row_count is None and name.lower() in alias_dict:
+                table_name = alias_dict[name.lower()]
+                row_count = get_row_count(conn, table_name)
+            if not row_count is None and row_count >= self.large_row_count:
+                full_scan_list.append(FullScan(table_name, row_count, detail))
+        return full_scan_list
+
+    def _get_logger(self) -> logging.Logger | None:
+        """log_pathのRotatingFileHandlerを付けたLogger(log_pathが変わったら付け直す)。ロックの中で"""
+        log_path = None if self.log_path is None else Path(self.log_path)
+        if log_path == self._handler_path:
+            return self._logger
+        if not self._handler is None:
+            self._logger.removeHandler(self._handler)
+            self._handler.close()
+            self._handler = None
+        self._handler_path = log_path
+        if log_path is None:
+            return None
+
+        if self._logger is None:
+            self._logger = logging.getLogger(f"sql_module.slow_query_log.{id(self)}")
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        self._handler = RotatingFileHandler(
+            log_path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding="utf-8"
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger.addHandler(self._handler)
+        return self._logger
@@ -1,9 +1,21 @@
 from pathlib import Path
 from dataclasses import dataclass
+from typing import Literal, Callable
+import contextlib
 
 from sql_module.sqlite.driver import Driver
+from sql_module.sqlite.statement_cache import StatementCache
+from sql_module.sqlite.write_queue import WriteQueue
+from sql_module.sqlite.retry import RetryPolicy, RetryStats
+from sql_module.sqlite.pragma import get_pragma_dict
+from sql_module.sqlite.id_resolver import IDResolverCache
+from sql_module.sqlite.schema_catalog import SchemaCatalog
+from sql_module.sqlite.result_cache import ResultCache
+from sql_module.sqlite.statement_stats import StatementStatsRegistry
+from sql_module.sqlite.slow_query_log import SlowQueryLog
 
 from sql_module import utils, Table, TableDefinition, IDTableDefinition, AtIDTableDefinition, SQLiteMaster, conds
+from sql_module.sqlite.index_advisor import IndexAdvisor, IndexAdvice
 
 
 @dataclass
@@ -11,12 +23,119 @@ class SQLiteDataBase:
     db_path: Path | str | None = None
     is_wal_mode: bool = True
     timeout_sec: int | float = 5
+    reader_count: int = 0  # 1以上なら、読み取りをスレッドごとの読み取り用コネクションで並列に行う(WALモード向け)
+    retry_policy: RetryPolicy | None = None  # 'database is locked'のリトライ方法。Noneならリトライしない
+    # コネクションを開くたびに適用するPRAGMA。"durable", "balanced", "bulk_load", "read_replica"(PRAGMA_PROFILE_DICT)
+    pragma_profile: str | None = None
+    pragma_dict: dict[str, str | int] | None = None  # プロファイルに上書きする個別のPRAGMA
+    id_resolver_max_size: int = 100000  # resolve_idsでキャッシュする{値: id}の数(テーブルのカラムごと)
+    slow_query_ms: float | None = None  # これ以上かかったSQLをslow_query_logに記録する。Noneなら記録しない
+    slow_query_log_path: Path | str | None = None  # slow_query_logを書き出すファイル(ローテーションする)
 
     def __post_init__(self):
-        self.driver = Driver(self.db_path, self.timeout_sec)
+        self.driver = Driver(
+            self.db_path,
+            self.timeout_sec,
+            reader_count=self.reader_count,
+            pragma_dict=get_pragma_dict(self.pragma_profile, self.pragma_dict),
+            retry_policy=self.retry_policy,
+            id_resolver_cache=IDResolverCache(self.id_resolver_max_size),
+            slow_query_log=SlowQueryLog(self.slow_query_ms, self.slow_query_log_path),
+        )
         if not self.db_path is None:
             Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
         self._set_journal_mode()
+        self.write_queue = None
+
+    @property
+    def statement_cache(self) -> StatementCache:
+        """insert / update / selectのコンパイル済みステートメントのキャッシュ。hit, miss, hit_rateで効き具合が見れる"""
+        return self.driver.statement_cache
+
+    @property
+    def retry_stats(self) -> RetryStats:
+        """'database is locked'のリトライ回数と待ち時間。テーブルごと(table_dict)・ステートメントごと(statement_dict)"""
+        return self.driver.retry_stats
+
+    @property
+    def id_resolver_cache(self) -> IDResolverCache:
+        """resolve_idsの{値: id}のキャッシュ。get_stats()でテーブルのカラムごとのヒット率やINの平均キー数が見れる"""
+        return self.driver.id_resolver_cache
+
+    @property
+    def schema_catalog(self) -> SchemaCatalog:
+        """テーブル・インデックスなどの情報のキャッシュ。PRAGMA schema_versionが変わったら読み直す。stats.load_countで読み直した回数が見れる"""
+        return self.driver.schema_catalog
+
+    @property
+    def result_cache(self) -> ResultCache:
+        """select(is_cache=True)の結果のキャッシュ。hit, miss, hit_rate, invalidate_countで効き具合が見れる"""
+        return self.driver.result_cache
+
+    @property
+    def stats(self) -> StatementStatsRegistry:
+        """
+        SQLのフィンガープリントごとの実行回数・時間(合計・平均・p95・p99)・fetchした行数・変更した行数
+        database.stats.top(by="total_time"), database.stats.reset(), database.stats.to_json(path)
+        """
+        return self.driver.statement_stats
+
+    @property
+    def slow_query_log(self) -> SlowQueryLog:
+        """
+        slow_query_ms以上かかったSQL・パラメータ(is_redactなら型と長さだけ)・時間・EXPLAIN QUERY PLAN
+        large_row_count行以上のテーブルをSCANしていたらis_flagged。entry_listに最近のもの、slow_query_log_pathにJSONで
+        """
+        return self.driver.slow_query_log
+
+    def advise_index(self, sql_list: list[str] | None = None, min_row_count: int = 1000) -> IndexAdvice:
+        """
+        記録した文(stats)をEXPLAIN QUERY PLANして、作るといいインデックス(create_list)と消していいインデックス(drop_list)を出す
+        sql_listがあればstatsの代わりにそれを見る。print(advice)でcreate_index, delete_indexのコードが見れる
+        """
+        return IndexAdvisor(self.driver, min_row_count).advise(sql_list=sql_list)
+
+    def set_pragma_profile(self, pragma_profile: str | None, pragma_dict: dict[str, str | int] | None = None):
+        """
+        PRAGMAをプロファイル(とpragma_dict)に切り替える。前のプロファイルにしかないPRAGMAはSQLiteのデフォルトに戻す
+        書き込み用コネクションにはすぐ、プールの読み取り用コネクションには次のクエリのときに適用し、今後開くコネクションにも適用する
+        """
+        self.driver.set_pragma_dict(get_pragma_dict(pragma_profile, pragma_dict))
+
+    def get_pragma(self, pragma_name: str) -> str | int:
+        """今のコネクションのPRAGMAの値"""
+        self.driver.execute(f"PRAGMA {pragma_name}")
+        return self.driver.fetchone()[0]
+
+    def transaction(
+        self, mode: Literal["deferred", "immediate", "exclusive"] = "deferred"
+    ) -> contextlib.AbstractContextManager[Driver]:
+        """
+        ブロック内の書き込みを1つのトランザクションにまとめる(コミットはブロックを抜けるときに1回だけ)
+        with database.transaction("immediate"):
+            for ...:
+                user.regist_current(...)
+        """
+        return self.driver.transaction(mode)
+
+    def savepoint(self) -> contextlib.AbstractContextManager[Driver]:
+        """transactionのブロック内で、例外で抜けたらこのブロックの分だけ取り消す"""
+        return self.driver.savepoint()
+
+    def run_transaction(
+        self, func: Callable[[], object], mode: Literal["deferred", "immediate", "exclusive"] = "immediate"
+    ):
+        """funcを1つのトランザクションで実行し、'database is locked'なら最初からやり直す"""
+        return self.driver.run_transaction(func, mode)
+
+    def get_write_queue(self, max_batch_size: int = 1000, max_latency_sec: float = 0.05) -> WriteQueue:
+        """
+        書き込みをためてまとめてコミットするWriteQueueを取得(初回のみ作成。引数も初回のみ有効)
+        insert, updateの戻り値はFutureで、コミットされたら結果が入る
+        """
+        if self.write_queue is None:
+            self.write_queue = WriteQueue(self.driver, max_batch_size, max_latency_sec)
+        return self.write_queue
 
     def get_table(self, name: str) -> Table:
         return Table(driver=self.driver, name=name)
@@ -40,9 +159,8 @@ class SQLiteDataBase:
         return sqlite_master
 
     def get_exists_table_list(self) -> list[Table]:
-        # SELECT name FROM sqlite_master WHERE type='table'
-        sqlite_master = self.get_sqlite_master_table_definition()
-        exists_table_name_list = sqlite_master.get_exists_table_name_list()
+        # SELECT name FROM sqlite_master WHERE type='table' (schema_catalogから)
+        exists_table_name_list = self.driver.schema_catalog.get_table_name_list(self.driver)
         return [self.get_table(exists_table_name) for exists_table_name in exists_table_name_list]
 
     def _set_journal_mode(self):
@@ -0,0 +1,70 @@
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from typing import Hashable
+import threading
+
+
+@dataclass
+class CompiledStatement:
+    """
+    コンパイル済みのステートメント。値だけ差し替えれば同じSQL文字列を使い回せる
+    例:
+    string_list: ('INSERT INTO post (content, lang) VALUES (', ', ', ')')
+    sql: 'INSERT INTO post (content, lang) VALUES (?, ?)'
+    """
+
+    string_list: tuple[str, ...]
+    sql: str
+    extra: dict = field(default_factory=dict)  # select_typeなど、ビルダーが副産物として出すもの
+
+
+@dataclass
+class StatementCache:
+    """
+    クエリの「形」(テーブル・カラム・upsert・RETURNING・condの構造など)をキーにした、コンパイル済みステートメントのLRUキャッシュ
+    ヒットすればQueryBuilderを通さずに値だけ差し替える
+    """
+
+    max_size: int = 512
+    hit: int = 0
+    miss: int = 0
+    _statement_dict: OrderedDict = field(default_factory=OrderedDict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)  # 複数スレッドから使われるので
+
+    def __len__(self) -> int:
+        return self._statement_dict.__len__()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hit + self.miss
+        if total == 0:
+            return 0.0
+        return self.hit / total
+
+    def get(self, key: Hashable) -> CompiledStatement | None:
+        with self._lock:
+            statement = self._statement_dict.get(key)
+            if statement is None:
+                self.miss += 1
+                return None
+            self.hit += 1
+            self._statement_dict.move_to_end(key)
+            return statement
+
+    def set(self, key: Hashable, string_list: list[str], sql: str, **extra) -> CompiledStatement:
+        statement = CompiledStatement(tuple(string_list), sql, extra)
+        with self._lock:
+            self._statement_dict[key] = statement
+            self._statement_dict.move_to_end(key)
+            # 古いものから捨てる
+            while self._statement_dict.__len__() > self.max_size:
+                self._statement_dict.popitem(last=False)
+        return statement
+
+    def clear(self):
+        with self._lock:
+            self._statement_dict.clear()
+
+    def reset_stats(self):
+        self.hit = 0
+        self.miss = 0
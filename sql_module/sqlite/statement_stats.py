@@ -0,0 +1,235 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal
+from array import array
+import json
+import re
+import threading
+
+# フィンガープリントで'?'にするリテラル
+STRING_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL_PATTERN = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+# conds.In(temp_table)の一時テーブル名(中身のハッシュ)
+TEMP_VALUE_TABLE_PATTERN = re.compile(r"sql_module_in_\w+")
+# IN (?, ?, ?) / VALUES (?, ?), (?, ?) の個数違いをまとめる
+PLACEHOLDER_LIST_PATTERN = re.compile(r"\?(?:\s*,\s*\?)+")
+ROW_LIST_PATTERN = re.compile(r"(\((?:\?, \.\.\.|\?)\))(?:\s*,\s*\1)+")
+SINGLE_IN_PATTERN = re.compile(r"\bIN \(\?\)", re.IGNORECASE)
+# SQL文字列 -> StatementStatsを覚えておく数
+SQL_CACHE_MAX_SIZE = 4096
+# これだけ実行がたまったら集計する
+FOLD_SIZE = 4096
+# p95, p99に使う実行時間の数
+SAMPLE_MAX_SIZE = 2048
+
+
+def get_fingerprint(sql: str) -> str:
+    """
+    値と個数の違いを除いたSQLの形
+    "INSERT INTO post (content, lang) VALUES (?, ?), (?, ?), (?, ?)" -> "INSERT INTO post (content, lang) VALUES (?, ...), ..."
+    "SELECT * FROM post WHERE id IN (?, ?, ?) LIMIT 8" -> "SELECT * FROM post WHERE id IN (?, ...) LIMIT ?"
+    """
+    fingerprint = STRING_LITERAL_PATTERN.sub("?", sql)
+    fingerprint = NUMBER_LITERAL_PATTERN.sub("?", fingerprint)
+    fingerprint = TEMP_VALUE_TABLE_PATTERN.sub("sql_module_in_?", fingerprint)
+    fingerprint = " ".join(fingerprint.split())
+    fingerprint = PLACEHOLDER_LIST_PATTERN.sub("?, ...", fingerprint)
+    fingerprint = ROW_LIST_PATTERN.sub(r"\1, ...", fingerprint)
+    fingerprint = SINGLE_IN_PATTERN.sub("IN (?, ...)", fingerprint)
+    return fingerprint
+
+
+@dataclass
+class StatementStats:
+    """
+    1つのフィンガープリントの実行統計
+    実行ごとには時間と変更した行数をarrayに追記するだけにして(ホットループのオーバーヘッドを減らすため)、集計はFOLD_SIZEごとか見るときにまとめてする
+    p95, p99は等間隔に間引いた最大SAMPLE_MAX_SIZE個の実行時間から
+    """
+
+    fingerprint: str
+    call_count: int = 0
+    total_time_ns: int = 0
+    min_time_ns: int | None = None
+    max_time_ns: int = 0
+    rows_returned: int = 0  # fetchした行数
+    rows_changed: int = 0  # insert, update, deleteした行数(cursor.rowcount)
+    fetch_time_ns: int = 0  # fetchにかかった時間の合計(sqlite3はfetchしながら実行するので、SELECTはこちらが大きいこともある)
+    sample_sql: str = ""  # 最初に実行したSQL(フィンガープリントはそのまま実行できないので、EXPLAIN QUERY PLANにはこっちを使う)
+    sql_count: int = 0  # このフィンガープリントになったSQL文字列の数。1なら埋め込んだ値もいつも同じ
+    _sample_array: array = field(default_factory=lambda: array("q"), repr=False)
+    _sample_step: int = field(default=1, repr=False)
+    _pending_time_ns_array: array = field(default_factory=lambda: array("q"), repr=False)
+    _pending_rows_changed_array: array = field(default_factory=lambda: array("q"), repr=False)
+
+    @property
+    def total_time_ms(self) -> float:
+        return self.total_time_ns / 1e6
+
+    @property
+    def fetch_time_ms(self) -> float:
+        return self.fetch_time_ns / 1e6
+
+    @property
+    def mean_time_ms(self) -> float:
+        if self.call_count == 0:
+            return 0.0
+        return self.total_time_ns / self.call_count / 1e6
+
+    @property
+    def max_time_ms(self) -> float:
+        return self.max_time_ns / 1e6
+
+    @property
+    def p95_time_ms(self) -> float:
+        return self.get_percentile_ms(0.95)
+
+    @property
+    def p99_time_ms(self) -> float:
+        return self.get_percentile_ms(0.99)
+
+    def get_percentile_ms(self, percentile: float) -> float:
+        if self._sample_array.__len__() == 0:
+            return 0.0
+        sorted_sample_list = sorted(self._sample_array)
+        index = min(int(percentile * sorted_sample_list.__len__()), sorted_sample_list.__len__() - 1)
+        return sorted_sample_list[index] / 1e6
+
+    def fold(self):
+        """追記しておいた実行時間を集計する(StatementStatsRegistryのロックの中で)"""
+        time_ns_array = self._pending_time_ns_array
+        rows_changed_array = self._pending_rows_changed_array
+        if time_ns_array.__len__() == 0:
+            return
+        self._pending_time_ns_array = array("q")
+        self._pending_rows_changed_array = array("q")
+
+        self.call_count += time_ns_array.__len__()
+        self.total_time_ns += sum(time_ns_array)
+        self.rows_changed += sum(rows_changed_array)
+        min_time_ns = min(time_ns_array)
+        if self.min_time_ns is None or min_time_ns < self.min_time_ns:
+            self.min_time_ns = min_time_ns
+        self.max_time_ns = max(self.max_time_ns, max(time_ns_array))
+        # 全体から等間隔に間引く。多くなったら半分にして間隔を倍に
+        offset = (self.call_count - time_ns_array.__len__()) % self._sample_step
+        self._sample_array.extend(time_ns_array[(self._sample_step - offset) % self._sample_step :: self._sample_step])
+        while self._sample_array.__len__() > SAMPLE_MAX_SIZE:
+            self._sample_array = self._sample_array[::2]
+            self._sample_step *= 2
+
+    def to_dict(self) -> dict[str]:
+        return {
+            "fingerprint": self.fingerprint,
+            "call_count": self.call_count,
+            "total_time_ms": self.total_time_ms,
+            "mean_time_ms": self.mean_time_ms,
+            "min_time_ms": 0.0 if self.min_time_ns is None else self.min_time_ns / 1e6,
+            "max_time_ms": self.max_time_ms,
+            "p95_time_ms": self.p95_time_ms,
+            "p99_time_ms": self.p99_time_ms,
+            "rows_returned": self.rows_returned,
+            "rows_changed": self.rows_changed,
+            "fetch_time_ms": self.fetch_time_ms,
+        }
+
+
+@dataclass
+class StatementStatsRegistry:
+    """
+    driver.execute, executemanyの実行統計をフィンガープリント(get_fingerprint)ごとに集計する(SQLiteDataBase.stats)
+    時間はperf_counter_nsで、'database is locked'のリトライの待ち時間も含む
+    database.stats.top(by="total_time")
+    """
+
+    is_enabled: bool = True
+    _stats_dict: dict[str, StatementStats] = field(default_factory=dict, repr=False)  # フィンガープリント: 統計
+    _sql_stats_dict: dict[str, StatementStats] = field(default_factory=dict, repr=False)  # SQL文字列: 統計
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return self._stats_dict.__len__()
+
+    def record(self, sql: str, time_ns: int, rows_changed: int = 0) -> StatementStats:
+        """1回の実行を記録。戻り値のStatementStatsはfetchした行数(add_rows_returned)に使う"""
+        stats = self._sql_stats_dict.get(sql)
+        if stats is None:
+            stats = self._get_stats(sql)
+        stats._pending_time_ns_array.append(time_ns)
+        stats._pending_rows_changed_array.append(rows_changed)
+        if stats._pending_time_ns_array.__len__() >= FOLD_SIZE:
+            with self._lock:
+                stats.fold()
+        return stats
+
+    def _get_stats(self, sql: str) -> StatementStats:
+        fingerprint = get_fingerprint(sql)
+        with self._lock:
+            stats = self._stats_dict.get(fingerprint)
+            if stats is None:
+                stats = StatementStats(fingerprint, sample_sql=sql)
+                self._stats_dict[fingerprint] = stats
+            stats.sql_count += 1
+            # 値を埋め込んだSQLが大量に来ても膨らまないように
+            if self._sql_stats_dict.__len__() >= SQL_CACHE_MAX_SIZE:
+                self._sql_stats_dict.clear()
+            self._sql_stats_dict[sql] = stats
+        return stats
+
+    def add_rows_returned(self, stats: StatementStats, row_count: int, fetch_time_ns: int = 0):
+        with self._lock:
+            stats.rows_returned += row_count
+            stats.fetch_time_ns += fetch_time_ns
+
+    def get(self, sql: str) -> StatementStats | None:
+        """SQL(値が入っていても、個数が違ってもいい)の統計"""
+        with self._lock:
+            stats = self._stats_dict.get(get_fingerprint(sql))
+            if not stats is None:
+                stats.fold()
+            return stats
+
+    def get_list(self) -> list[StatementStats]:
+        with self._lock:
+            for stats in self._stats_dict.values():
+                stats.fold()
+            return list(self._stats_dict.values())
+
+    def top(
+        self,
+        n: int = 10,
+        by: Literal[
+            "total_time",
+            "mean_time",
+            "max_time",
+            "p95_time",
+            "p99_time",
+            "fetch_time",
+            "call_count",
+            "rows_returned",
+            "rows_changed",
+        ] = "total_time",
+    ) -> list[StatementStats]:
+        """byの大きい順にn個"""
+        if by in ["call_count", "rows_returned", "rows_changed"]:
+            attribute_name = by
+        elif by in ["total_time", "mean_time", "max_time", "p95_time", "p99_time", "fetch_time"]:
+            attribute_name = f"{by}_ms"
+        else:
+            raise ValueError(f"by: {by}はありません。")
+        return sorted(self.get_list(), key=lambda stats: getattr(stats, attribute_name), reverse=True)[:n]
+
+    def reset(self):
+        with self._lock:
+            self._stats_dict.clear()
+            self._sql_stats_dict.clear()
+
+    def to_dict_list(self) -> list[dict[str]]:
+        return [stats.to_dict() for stats in self.top(self.__len__())]
+
+    def to_json(self, path: Path | str | None = None) -> str:
+        """total_timeの大きい順のJSON。pathがあれば書き出す"""
+        text = json.dumps(self.to_dict_list(), ensure_ascii=False, indent=2)
+        if not path is None:
+            Path(path).write_text(text, encoding="utf-8")
+        return text
@@ -0,0 +1,163 @@
+# 標準ライブラリ
+from dataclasses import dataclass, field
+import time
+
+# このライブラリ
+from sql_module import exceptions, Driver
+from sql_module.sqlite.table.info import Info
+from sql_module.sqlite.pragma import PRAGMA_PROFILE_DICT
+
+
+@dataclass
+class ForeignKeyViolation:
+    """PRAGMA foreign_key_checkで見つかった、参照先のない行"""
+
+    table_name: str
+    rowid: int | None
+    column_name: str
+    parent_table_name: str
+    parent_column_name: str | None
+    value: object
+
+
+@dataclass
+class BulkLoadReport:
+    table_name: str
+    dropped_index_list: list[str] = field(default_factory=list)  # 一時的に消して作り直したインデックス
+    violation_count: int = 0
+    violation_list: list[ForeignKeyViolation] = field(default_factory=list)  # 最大max_violation件
+    elapsed_sec: float = 0.0
+
+    def __str__(self) -> str:
+        text = f"bulk_load: {self.table_name} ({self.elapsed_sec:.2f}秒) 作り直したインデックス: {self.dropped_index_list}"
+        if self.violation_count == 0:
+            return text
+        text += f"\n外部キー違反: {self.violation_count}件"
+        for violation in self.violation_list:
+            text += (
+                f"\n  rowid={violation.rowid}: {violation.column_name}={violation.value!r}"
+                f" -> {violation.parent_table_name}.{violation.parent_column_name}"
+            )
+        return text
+
+
+class BulkLoad:
+    def __init__(
+        self,
+        driver: Driver,
+        table_name: str,
+        is_drop_unique: bool = False,
+        is_raise_violation: bool = True,
+        max_violation: int = 100,
+    ):
+        """
+        大量に流し込む間だけ、インデックスを消し、foreign_keys・synchronous・ジャーナルを緩める
+        抜けるときにインデックスを作り直し、PRAGMA foreign_key_checkで外部キー違反を調べる
+        ユニークインデックスはON CONFLICT(upsert)に必要なので、is_drop_uniqueでなければ消さない
+        """
+        self.driver = driver
+        self.table_name = table_name
+        self.is_drop_unique = is_drop_unique
+        self.is_raise_violation = is_raise_violation
+        self.max_violation = max_violation
+        self.report = BulkLoadReport(table_name)
+
+    def __enter__(self) -> BulkLoadReport:
+        self.driver.open_full()
+        self._start = time.perf_counter()
+        # 他のスレッドのトランザクションはcommit, rollbackまで待つ
+        self.driver.write_lock.acquire()
+        # foreign_keysはトランザクション中に変えられない
+        if self.driver.is_in_transaction or self.driver.conn.in_transaction:
+            self.driver.write_lock.release()
+            raise exceptions.DefenseAccidentException("トランザクション中(コミット前)はbulk_loadできません。")
+        try:
+            self._relax_pragma()
+            self._drop_index()
+            self._transaction = self.driver.transaction("immediate")
+            self._transaction.__enter__()
+        except BaseException:
+            self._restore()
+            self.driver.write_lock.release()
+            raise
+        return self.report
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            # ブロック内のバルクは全部1つのトランザクション。例外ならロールバック
+            self._transaction.__exit__(exc_type, exc_value, traceback)
+        finally:
+            self._restore()
+            self.driver.write_lock.release()
+        if exc_type is None:
+            self._check_foreign_key()
+        self.report.elapsed_sec = time.perf_counter() - self._start
+        if exc_type is None and self.report.violation_count > 0 and self.is_raise_violation:
+            raise exceptions.ForeignKeyViolationError(str(self.report), self.report)
+
+    def _relax_pragma(self):
+        self._pragma_dict = {}
+        relax_pragma_dict = {"foreign_keys": "OFF", **PRAGMA_PROFILE_DICT["bulk_load"]}
+        journal_mode = self._get_pragma("journal_mode")
+        if journal_mode == "wal":
+            # 流し込み中はチェックポイントしない(最後にまとめてする)
+            relax_pragma_dict["wal_autocheckpoint"] = 0
+        else:
+            relax_pragma_dict["journal_mode"] = "MEMORY"
+        for pragma_name, pragma_value in relax_pragma_dict.items():
+            self._pragma_dict[pragma_name] = self._get_pragma(pragma_name)
+            self.driver.execute(f"PRAGMA {pragma_name} = {pragma_value}")
+
+    def _drop_index(self):
+        """CREATE INDEXで作ったインデックス(origin == 'c')を、作り直せるようにsqlを控えてから消す"""
+        info = Info(self.driver, self.table_name)
+        self._index_sql_list = []
+        for raw_index in info.raw_index_list:
+            if raw_index["origin"] != "c":
+                continue
+            if raw_index["unique"] and not self.is_drop_unique:
+                continue
+            self.driver.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", (raw_index["name"],))
+            self._index_sql_list.append(self.driver.fetchone()[0])
+            self.driver.execute(f"DROP INDEX {raw_index['name']}")
+            self.report.dropped_index_list.append(raw_index["name"])
+        self.driver.commit()
+
+    def _restore(self):
+        try:
+            # インデックスを作り直す(緩めたままのほうが速い)
+            if hasattr(self, "_index_sql_list"):
+                with self.driver.transaction():
+                    for index_sql in self._index_sql_list:
+                        self.driver.execute(index_sql)
+        finally:
+            if self._get_pragma("journal_mode") == "wal":
+                self.driver.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            for pragma_name, pragma_value in getattr(self, "_pragma_dict", {}).items():
+                self.driver.execute(f"PRAGMA {pragma_name} = {pragma_value}")
+
+    def _check_foreign_key(self):
+        self.driver.execute(f"PRAGMA foreign_key_check({self.table_name})")
+        raw_violation_list = self.driver.fetchall()
+        self.report.violation_count = raw_violation_list.__len__()
+        if self.report.violation_count == 0:
+            return
+
+        info = Info(self.driver, self.table_name)
+        foreign_key_dict = {raw_foreign_key["id"]: raw_foreign_key for raw_foreign_key in info.raw_foreign_key_list}
+        for raw_violation in raw_violation_list[: self.max_violation]:
+            table_name, rowid, parent_table_name, foreign_key_id = raw_violation
+            raw_foreign_key = foreign_key_dict[foreign_key_id]
+            value = None
+            if not rowid is None:
+                self.driver.execute(f"SELECT {raw_foreign_key['from']} FROM {table_name} WHERE rowid = ?", (rowid,))
+                value = self.driver.fetchone()[0]
+            self.report.violation_list.append(
+                ForeignKeyViolation(
+                    table_name, rowid, raw_foreign_key["from"], parent_table_name, raw_foreign_key["to"], value
+                )
+            )
+
+    def _get_pragma(self, pragma_name: str) -> str | int:
+        self.driver.execute(f"PRAGMA {pragma_name}")
+        return self.driver.fetchone()[0]
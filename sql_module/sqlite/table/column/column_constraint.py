@@ -1,10 +1,11 @@
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Callable, Literal
 import datetime
 import sqlite3
 
 from sql_module.sqlite.table.column.interface import ColumnLike
-from sql_module import exceptions, get_sql_value
+from sql_module import exceptions, get_sql_value, get_sql_encoder, get_python_decoder
 
 
 @dataclass
@@ -19,6 +20,17 @@ class ColumnConstraint:
     primary: bool = False  # AUTO_INCREMENTは廃止されました。そのうちuuid対応するかも
     references: ColumnLike | None = None  # ColumnLikeは別ファイルのColumnと相互依存しているために使っている
     default_value: str | int | bytes | Path | datetime.date | None = None  # bool, datetime.datetime内包
+    collate: Literal["BINARY", "NOCASE", "RTRIM"] | None = None  # 比較とインデックスの照合順序。Noneならsqliteのデフォルト(BINARY)
+    # プレースホルダ用の値の変換関数。get_column時に型に特化したものを1回だけ作る
+    encoder: Callable[[str | int | bytes | Path | datetime.date | None], str | int | sqlite3.Binary | None] = field(
+        init=False, repr=False, compare=False
+    )
+    # fetchした値をpythonの型に戻す関数。変換不要ならNone
+    decoder: Callable[[str | int | bytes], object] | None = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.encoder = get_sql_encoder(self.python_type, is_not_null=self.not_null)
+        self.decoder = get_python_decoder(self.python_type)
 
     @property
     def sql_type(self) -> str:
@@ -59,4 +71,6 @@ class ColumnConstraint:
         """
         カラム情報に応じてpythonの値をsqlの値に変換
         """
+        if is_placeholder:
+            return self.encoder(python_value)
         return get_sql_value(python_value, self.python_type, is_not_null=self.not_null, is_placeholder=is_placeholder)
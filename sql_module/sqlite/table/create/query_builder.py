@@ -81,6 +81,9 @@ class CreateQueryBuilder:
         # default
         if not constraint.default_value is None:
             constraint_str_list.append(f"DEFAULT {constraint.sql_default_value}")
+        # collate
+        if not constraint.collate is None:
+            constraint_str_list.append(f"COLLATE {constraint.collate}")
 
         constraint_query = utils.join_space(constraint_str_list)
         return constraint_query
@@ -13,7 +13,12 @@ from sql_module.sqlite.table.expression.cond.cond import (
     StartsWith,
     EndsWith,
     Contains,
+    Match,
     In,
+    NotIn,
+    IN_INLINE_MAX,
+    get_prefix_upper_bound,
+    escape_like,
     Range,
     TRUE,
     FALSE,
@@ -2,9 +2,12 @@
 from pathlib import Path
 from dataclasses import dataclass
 import datetime
-from typing import Self
+import json
+from typing import Self, Literal
 
 from sql_module import Query, query_join_comma, expressions, funcs
+from sql_module.sqlite.query import Placeholder
+from sql_module.sqlite.temp_value_table import TempValueTable
 from sql_module.sqlite.table.sub_query import SubQuery
 from sql_module.sqlite.table.column.interface import ColumnLike
 
@@ -240,28 +243,98 @@ class Less(CondCond):
         self.straight_set(query)
 
 
+def get_prefix_upper_bound(prefix: str) -> str | None:
+    """
+    prefixで始まる文字列がすべて収まる上限(これ未満)。BINARYの比較はUTF-8のバイト順 = コードポイント順なので、最後の文字を1つ進める
+    'abc' -> 'abd', 'ab\U0010ffff' -> 'ac'(最大のコードポイントは捨てて1つ前を進める), 全部最大ならNone(上限なし)
+    """
+    char_list = list(prefix)
+    while char_list.__len__() > 0:
+        code_point = ord(char_list.pop()) + 1
+        # サロゲートはUTF-8にできないので飛ばす
+        if 0xD800 <= code_point <= 0xDFFF:
+            code_point = 0xE000
+        if code_point <= 0x10FFFF:
+            return "".join(char_list) + chr(code_point)
+    return None
+
+
+def escape_like(value: str, escape_char: str = "\\") -> str:
+    """LIKEのワイルドカード(%, _)とエスケープ文字自身をエスケープ"""
+    return value.replace(escape_char, escape_char * 2).replace("%", escape_char + "%").replace("_", escape_char + "_")
+
+
 class StartsWith(CondCond):
     def __init__(
         self,
         column: ColumnLike | funcs.Func,
         value: str | int | bytes | Path | datetime.date | ColumnLike | SubQuery,
         is_column_only_name: bool = False,
+        is_range: bool = False,
     ):
         """
         例:
-        'device.bender LIKE :p0%', {'p0': 'Xiaomi'}
+        'device.bender LIKE :p0 || '%'', {'p0': 'Xiaomi'}
+
+        普通のインデックスはLIKEに使われない(case_sensitive_likeがOFFなので)。インデックスを使いたいときは
+        - カラムがcollate="NOCASE"なら: 'device.bender LIKE :p0 ESCAPE '\\'', {'p0': 'Xiaomi%'}
+          (パターンがプレースホルダ1つならNOCASEのインデックスが使われる。LIKEと同じく大文字小文字を区別しない)
+        - is_rangeなら: 'device.bender >= :p0 AND device.bender < :p1', {'p0': 'Xiaomi', 'p1': 'Xiaomj'}
+          (普通のインデックスが使われる。カラムの照合順序で比べるので、BINARYなら大文字小文字を区別する)
         """
         query = Query()
         if value is None:
             raise TypeError("None禁止")
 
+        is_text = isinstance(value, str) and isinstance(column, ColumnLike)
+        if is_text and is_range:
+            self.straight_set(self._get_range_query(column, value, is_column_only_name))
+            return
+
         query += self.get_column_name_query(column, is_column_only_name)
+        if is_text and column.constraint.collate == "NOCASE":
+            query += " LIKE "
+            query *= escape_like(value) + "%"
+            query += " ESCAPE '\\'"
+            self.straight_set(query)
+            return
+
         query += " LIKE "
         query += self.get_value_query(column, value, is_column_only_name)
         query += " || '%'"
 
         self.straight_set(query)
 
+    def _get_range_query(self, column: ColumnLike, value: str, is_column_only_name: bool) -> Query:
+        if column.constraint.collate == "NOCASE":
+            # NOCASEはASCIIの大文字を小文字にして比べるので、範囲も小文字で作る('Z' -> '['だと'z'が入らない)
+            value = "".join(char.lower() if char.isascii() else char for char in value)
+        greater = GreaterEq(column, value, is_column_only_name)
+        upper_bound = get_prefix_upper_bound(value)
+        if upper_bound is None:
+            return greater
+        return greater & Less(column, upper_bound, is_column_only_name)
+
+
+def get_fts_rowid_query(column: ColumnLike, is_column_only_name: bool, where_query: Query) -> Query:
+    """
+    全文検索のテーブル(Table.create_fts)で引いたrowidで元テーブルを絞る
+    'post.rowid IN (SELECT rowid FROM post_fts WHERE {where_query})'
+    """
+    table_name = column.name.table_name
+    query = Query("rowid" if is_column_only_name else f"{table_name}.rowid")
+    query += f" IN (SELECT rowid FROM {table_name}_fts WHERE "
+    query += where_query
+    query += ")"
+    return query
+
+
+def get_fts_column_query(column: ColumnLike) -> Query:
+    """post.content -> post_fts.content"""
+    if not isinstance(column, ColumnLike):
+        raise ValueError(f"{column}はカラムではないので全文検索できません。")
+    return Query(f"{column.name.table_name}_fts.{column.name.name}")
+
 
 class EndsWith(CondCond):
     def __init__(
@@ -269,19 +342,25 @@ class EndsWith(CondCond):
         column: ColumnLike | funcs.Func,
         value: str | int | bytes | Path | datetime.date | ColumnLike | SubQuery,
         is_column_only_name: bool = False,
+        use_fts: bool = False,
     ):
         """
         例:
-        'device.bender LIKE %:p0', {'p0': 'ホールディングス'}
+        'device.bender LIKE '%' || :p0', {'p0': 'ホールディングス'}
+
+        use_ftsなら全文検索のテーブル(create_ftsをtokenizer="trigram"で作ったもの)のインデックスで引く(3文字以上のとき)
+        'device.rowid IN (SELECT rowid FROM device_fts WHERE device_fts.bender LIKE '%' || :p0)'
         """
         query = Query()
         if value is None:
             raise TypeError("None禁止")
 
-        query += self.get_column_name_query(column, is_column_only_name)
-        query += "LIKE '%' || "
+        query += get_fts_column_query(column) if use_fts else self.get_column_name_query(column, is_column_only_name)
+        query += " LIKE '%' || "
         query += self.get_value_query(column, value, is_column_only_name)
 
+        if use_fts:
+            query = get_fts_rowid_query(column, is_column_only_name, query)
         self.straight_set(query)
 
 
@@ -291,48 +370,163 @@ class Contains(CondCond):
         column: ColumnLike | funcs.Func,
         value: str | int | bytes | Path | datetime.date | ColumnLike | SubQuery,
         is_column_only_name: bool = False,
+        use_fts: bool = False,
     ):
         """
         例:
-        'device.bender LIKE %:p0', {'p0': 'うおｗ'}
+        'device.bender LIKE '%' || :p0 || '%'', {'p0': 'うおｗ'}
+
+        use_ftsなら全文検索のテーブル(create_ftsをtokenizer="trigram"で作ったもの)のインデックスで引く(3文字以上のとき)
+        'device.rowid IN (SELECT rowid FROM device_fts WHERE device_fts.bender LIKE '%' || :p0 || '%')'
         """
         query = Query()
         if value is None:
             raise TypeError("None禁止")
 
-        query += self.get_column_name_query(column, is_column_only_name)
-        query += "LIKE '%' || "
+        query += get_fts_column_query(column) if use_fts else self.get_column_name_query(column, is_column_only_name)
+        query += " LIKE '%' || "
         query += self.get_value_query(column, value, is_column_only_name)
         query += " || '%'"
 
+        if use_fts:
+            query = get_fts_rowid_query(column, is_column_only_name, query)
         self.straight_set(query)
 
 
+class Match(CondCond):
+    def __init__(
+        self,
+        column: ColumnLike,
+        value: str,
+        is_column_only_name: bool = False,
+    ):
+        """
+        全文検索のテーブル(Table.create_fts)でのFTS5のMATCH。valueはFTS5のクエリ構文('"東京" AND 駅', 'sql*'など)
+        例:
+        'post.rowid IN (SELECT rowid FROM post_fts WHERE post_fts.content MATCH :p0)', {'p0': '東京 AND 駅'}
+        """
+        if not isinstance(value, str):
+            raise TypeError("MATCHはstrのみです。")
+
+        query = get_fts_column_query(column)
+        query += " MATCH "
+        query *= value
+
+        self.straight_set(get_fts_rowid_query(column, is_column_only_name, query))
+
+
+# In / NotInの値の渡し方の切り替え(benchmark/in_strategy.py)
+# これ以下の個数ならプレースホルダを並べる。これより多いとjson_each(?)1つのほうが速く、ステートメントの形も個数によらない
+IN_INLINE_MAX = 32
+
+
 class In(CondCond):
+    operator = " IN "
+
     def __init__(
         self,
         column: ColumnLike | funcs.Func,
         value_list: list[str | int | bytes | Path | datetime.date | None] | SubQuery,
         is_column_only_name: bool = False,
+        strategy: Literal["auto", "inline", "json_each", "temp_table"] = "auto",
     ):
         """
         例:
         'channel.name IN (:p0, :p1, :p2)', {'p0': 'おお', 'p0': 'どわーｗふ', 'p0': 'ぬ'}
+
+        strategyで値の渡し方を変えられる
+        - "inline": 'channel.name IN (:p0, :p1, :p2)' 値1つにプレースホルダ1つ(SQLITE_MAX_VARIABLE_NUMBERまで)
+        - "json_each": 'channel.name IN (SELECT value FROM json_each(:p0))' 値をJSONの配列にしてプレースホルダ1つ(bytesは不可)
+        - "temp_table": 'channel.name IN temp.sql_module_in_xxx' 値を一時テーブルに入れる。同じ値のリストなら一時テーブルを使い回すので、何度も引くときに
+          (一時テーブルは実行するときに書き込み用コネクションに作るので、そのクエリは書き込み用コネクションで実行される)
+        - "auto": IN_INLINE_MAX個まではinline、それより多ければjson_each(bytesがあればtemp_table)
         """
         query = Query()
 
         query += self.get_column_name_query(column, is_column_only_name)
-        query += " IN ("
+        query += self.operator
         if isinstance(value_list, SubQuery):
+            query += "("
             query += value_list
-        else:
+            query += ")"
+            self.straight_set(query)
+            return
+        # カラムとの比較が混ざっていればそのまま並べる
+        if any(isinstance(value, ColumnLike | SubQuery) for value in value_list):
             value_query_list = [self.get_value_query(column, value, is_column_only_name) for value in value_list]
-            joined_value_query = query_join_comma(value_query_list)
-            query += joined_value_query
-        query += ")"
+            query += "(" + query_join_comma(value_query_list) + ")"
+            self.straight_set(query)
+            return
+
+        sql_value_list = [self._get_sql_value(column, value) for value in value_list]
+        strategy = self._get_strategy(column, sql_value_list, strategy)
+        if strategy == "inline":
+            # 値ごとにQueryを作らず、ロープを直接組む
+            rope_list = ["("]
+            for i, sql_value in enumerate(sql_value_list):
+                if i > 0:
+                    rope_list.append(", ")
+                rope_list.append(Placeholder(sql_value))
+            rope_list.append(")")
+            query += Query.from_rope(tuple(rope_list))
+        elif strategy == "json_each":
+            query += "(SELECT value FROM json_each("
+            query *= json.dumps(sql_value_list, ensure_ascii=False)
+            query += "))"
+        elif strategy == "temp_table":
+            # テーブルはここでは作らず、このcondを含むクエリを実行する直前にdriverが作る
+            query += Query.from_rope(TempValueTable(sql_value_list))
+        else:
+            raise ValueError(f"strategy: {strategy}はありません。")
 
         self.straight_set(query)
 
+    def _get_sql_value(self, column: ColumnLike | funcs.Func, value):
+        if isinstance(column, ColumnLike):
+            return column.constraint.get_sql_value(value)
+        # havingなどで使う
+        if not isinstance(value, int):
+            raise ValueError("having句ではintのみ対応です。")
+        return value
+
+    def _get_strategy(
+        self, column: ColumnLike | funcs.Func, sql_value_list: list, strategy: str
+    ) -> Literal["inline", "json_each", "temp_table"]:
+        is_bytes = any(isinstance(sql_value, bytes | memoryview) for sql_value in sql_value_list)  # sqlite3.Binaryはmemoryview
+        is_temp_table_ok = not getattr(column, "driver", None) is None
+        if strategy == "json_each" and is_bytes:
+            raise ValueError("bytesの値はjson_eachで渡せません。")
+        if strategy == "temp_table" and not is_temp_table_ok:
+            raise ValueError(f"{column}はdriverを持たないので一時テーブルを作れません。")
+        if strategy != "auto":
+            return strategy
+
+        if sql_value_list.__len__() <= IN_INLINE_MAX:
+            return "inline"
+        if not is_bytes:
+            return "json_each"
+        if is_temp_table_ok:
+            return "temp_table"
+        return "inline"
+
+
+class NotIn(In):
+    operator = " NOT IN "
+
+    def __init__(
+        self,
+        column: ColumnLike | funcs.Func,
+        value_list: list[str | int | bytes | Path | datetime.date | None] | SubQuery,
+        is_column_only_name: bool = False,
+        strategy: Literal["auto", "inline", "json_each", "temp_table"] = "auto",
+    ):
+        """
+        例:
+        'channel.name NOT IN (:p0, :p1, :p2)', {'p0': 'おお', 'p0': 'どわーｗふ', 'p0': 'ぬ'}
+        strategyはInと同じ。値にNoneがあるとSQLのNOT INなので何にも当てはまらない
+        """
+        super().__init__(column, value_list, is_column_only_name, strategy)
+
 
 class Range(CondCond):
     def __init__(
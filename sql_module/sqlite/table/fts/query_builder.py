@@ -0,0 +1,68 @@
+from sql_module import utils, Driver, Query
+from sql_module.sqlite.table.column.name import ColumnName
+
+
+def get_fts_table_name(table_name: str) -> str:
+    """post -> post_fts"""
+    return f"{table_name}_fts"
+
+
+class FTSQueryBuilder:
+    def __init__(self, driver: Driver):
+        """
+        全文検索(FTS5)の外部コンテンツテーブルと、元テーブルと同期するトリガーのクエリ
+        クエリ例:
+        CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(content, content='post', content_rowid='rowid', tokenize='trigram')
+        CREATE TRIGGER IF NOT EXISTS post_fts_ai AFTER INSERT ON post BEGIN INSERT INTO post_fts(rowid, content) VALUES (new.rowid, new.content); END
+        """
+        self.driver = driver
+
+    def get_create_query(
+        self, table_name: str, column_name_list: list[ColumnName], tokenizer: str, exists_ok: bool
+    ) -> Query:
+        exists_ok_string = " IF NOT EXISTS" if exists_ok else ""
+        columns_query = utils.join_comma([column_name.name for column_name in column_name_list])
+        return Query(
+            f"CREATE VIRTUAL TABLE{exists_ok_string} {get_fts_table_name(table_name)} USING fts5({columns_query}, "
+            f"content='{table_name}', content_rowid='rowid', tokenize='{tokenizer}')",
+            driver=self.driver,
+        )
+
+    def get_trigger_query_list(self, table_name: str, column_name_list: list[ColumnName]) -> list[Query]:
+        """insert, delete, updateで全文検索のテーブルを同期するトリガー(updateは対象のカラムが変わったときのみ)"""
+        fts_table_name = get_fts_table_name(table_name)
+        columns_query = utils.join_comma([column_name.name for column_name in column_name_list])
+        new_values_query = utils.join_comma([f"new.{column_name.name}" for column_name in column_name_list])
+        old_values_query = utils.join_comma([f"old.{column_name.name}" for column_name in column_name_list])
+        insert_string = f"INSERT INTO {fts_table_name}(rowid, {columns_query}) VALUES (new.rowid, {new_values_query});"
+        delete_string = (
+            f"INSERT INTO {fts_table_name}({fts_table_name}, rowid, {columns_query}) "
+            f"VALUES ('delete', old.rowid, {old_values_query});"
+        )
+        return [
+            Query(
+                f"CREATE TRIGGER IF NOT EXISTS {fts_table_name}_ai AFTER INSERT ON {table_name} BEGIN {insert_string} END",
+                driver=self.driver,
+            ),
+            Query(
+                f"CREATE TRIGGER IF NOT EXISTS {fts_table_name}_ad AFTER DELETE ON {table_name} BEGIN {delete_string} END",
+                driver=self.driver,
+            ),
+            Query(
+                f"CREATE TRIGGER IF NOT EXISTS {fts_table_name}_au AFTER UPDATE OF {columns_query} ON {table_name} "
+                f"BEGIN {delete_string} {insert_string} END",
+                driver=self.driver,
+            ),
+        ]
+
+    def get_rebuild_query(self, table_name: str) -> Query:
+        """元テーブルの今の行から全文検索のインデックスを作り直す"""
+        fts_table_name = get_fts_table_name(table_name)
+        return Query(f"INSERT INTO {fts_table_name}({fts_table_name}) VALUES ('rebuild')", driver=self.driver)
+
+    def get_drop_query_list(self, table_name: str) -> list[Query]:
+        fts_table_name = get_fts_table_name(table_name)
+        return [
+            Query(f"DROP TRIGGER IF EXISTS {fts_table_name}_{suffix}", driver=self.driver)
+            for suffix in ["ai", "ad", "au"]
+        ] + [Query(f"DROP TABLE IF EXISTS {fts_table_name}", driver=self.driver)]
@@ -35,12 +35,18 @@ class IndexQueryBuilder:
         return Query(f"DROP INDEX{exists_ok_string}", driver=self.driver)
 
     def get_index_name(
-        self, column_name_list: list[ColumnName], index_name: str | None = None, is_unique: bool = False
+        self,
+        column_name_list: list[ColumnName],
+        index_name: str | None = None,
+        is_unique: bool = False,
+        is_keep_order: bool = False,
     ):
+        """is_keep_orderなら、複合インデックスのカラムの順番のまま名前にする(順番違いの同じカラムのインデックスと区別するため)"""
         if not index_name is None:
             return index_name
         table_name = column_name_list[0].table_name
-        columns_name = utils.join_under(sorted([column_name.name for column_name in column_name_list]))
+        name_list = [column_name.name for column_name in column_name_list]
+        columns_name = utils.join_under(name_list if is_keep_order else sorted(name_list))
 
         if is_unique:
             head_name = "ux"
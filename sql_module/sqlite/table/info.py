@@ -84,7 +84,8 @@ class Info:
     multi_index_list: list[MultiIndex] = field(default_factory=list)
 
     def __post_init__(self):
-        """必要な情報を取得"""
+        """必要な情報を取得(driver.schema_catalogから。スキーマが変わっていなければクエリは1つだけ)"""
+        self.table_schema = self.driver.schema_catalog.get_table_schema(self.driver, self.table_name)
         self.raw_column_list = self.get_raw_column_list()
         self.raw_foreign_key_list = self.get_raw_foreign_key_list()
         self.raw_index_list = self.get_raw_index_list()
@@ -99,20 +100,20 @@ class Info:
         return text
 
     def get_raw_column_list(self) -> list[dict[str]]:
-        self.driver.execute(f"PRAGMA table_info({self.table_name});")
-        return self.driver.fetchall(True)
+        # PRAGMA table_info(テーブル名);
+        return self.table_schema.raw_column_list
 
     def get_raw_foreign_key_list(self) -> list[dict[str]]:
-        self.driver.execute(f"PRAGMA foreign_key_list({self.table_name});")
-        return self.driver.fetchall(True)
+        # PRAGMA foreign_key_list(テーブル名);
+        return self.table_schema.raw_foreign_key_list
 
     def get_raw_index_list(self) -> list[dict[str]]:
-        self.driver.execute(f"PRAGMA index_list({self.table_name});")
-        return self.driver.fetchall(True)
+        # PRAGMA index_list(テーブル名);
+        return self.table_schema.raw_index_list
 
     def get_index(self, index_name: str) -> list[dict[str]]:
-        self.driver.execute(f"PRAGMA index_info({index_name});")
-        return self.driver.fetchall(True)
+        # PRAGMA index_info(インデックス名);
+        return self.table_schema.raw_index_info_dict.get(index_name, [])
 
     def get_foreign_key(self, column_name: str) -> str | None:
         """必要な情報を取得"""
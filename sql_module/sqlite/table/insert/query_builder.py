@@ -5,6 +5,7 @@ import datetime
 from typing import Literal
 
 from sql_module import utils, Driver, Field, Query, query_join_comma
+from sql_module import exceptions
 from sql_module.exceptions import FetchNotFoundError
 
 
@@ -25,10 +26,47 @@ class Insert(Query):
             self.driver.commit(time_log=time_log)
 
 
+# 複数行VALUESの1ステートメントの最大行数。増やしてもパース・バインドが重くなるだけで速くならない(benchmark/multi_value_insert.py)
+MULTI_VALUE_MAX_ROW = 500
+# これより多いカラムのテーブルはexecutemanyのほうが速い(benchmark/multi_value_insert.py)
+MULTI_VALUE_MAX_COLUMN = 30
+
+
 class InsertQueryBuilder:
     def __init__(self, driver: Driver):
         self.driver = driver
 
+    def get_bulk_strategy(
+        self, column_count: int, is_returning_id: bool = False
+    ) -> Literal["executemany", "multi_value"]:
+        """
+        バルクinsertのやり方を選ぶ
+        - executemany: 1行ずつステートメントを実行
+        - multi_value: 'INSERT ... VALUES (...), (...), ...'で複数行ずつ実行。カラムが少ないほど速い
+        RETURNING idはexecutemanyでは受け取れないのでmulti_value
+        """
+        if is_returning_id or column_count <= MULTI_VALUE_MAX_COLUMN:
+            return "multi_value"
+        return "executemany"
+
+    def get_multi_value_row_count(self, column_count: int) -> int:
+        """複数行VALUESの1ステートメントの行数。プレースホルダの数がSQLITE_MAX_VARIABLE_NUMBERを超えないようにする"""
+        max_variable_number = self.driver.get_max_variable_number()
+        if column_count > max_variable_number:
+            raise exceptions.BulkError(
+                f"カラム数: {column_count}がプレースホルダの上限: {max_variable_number}を超えています。"
+            )
+        return min(MULTI_VALUE_MAX_ROW, max_variable_number // column_count)
+
+    def get_multi_value_query(self, record: list[Field], row_count: int) -> Query:
+        """
+        複数行VALUESの部分のクエリ。値はexecuteのときに行を平らにして渡すので、プレースホルダは?のまま
+        '(name, age) VALUES (?, ?), (?, ?)'
+        """
+        keys = self._get_keys(record)
+        row_place_holder = "(" + utils.join_comma(["?" for _ in record]) + ")"
+        return Query(f"({keys}) VALUES " + utils.join_comma([row_place_holder for _ in range(row_count)]))
+
     def get_head_query(self) -> Query:
         """最初のクエリ作成"""
         return Query("INSERT INTO", driver=self.driver)
@@ -101,3 +139,9 @@ class InsertQueryBuilder:
             return Query("RETURNING id")
 
         return Query()
+
+    def get_returning_query(self, returning_name_list: list[str] | tuple[str, ...]) -> Query:
+        """['screen_name', 'id'] -> 'RETURNING screen_name, id'"""
+        if returning_name_list.__len__() == 0:
+            return Query()
+        return Query("RETURNING " + utils.join_comma(list(returning_name_list)))
@@ -0,0 +1,99 @@
+# 標準ライブラリ
+from dataclasses import dataclass, field
+import dataclasses
+from typing import Self, Iterator, Sequence
+
+# このライブラリ
+from sql_module import exceptions, Column, Field
+
+
+@dataclass
+class RecordBatch:
+    """
+    バルクinsertやバルクupdateで使うレコードの束。セルごとにFieldオブジェクトを作らないのでメモリにやさしい
+    row_list(行のタプルのリスト)か、column_value_list(カラムごとの値の列)のどちらかを指定する
+
+    例:
+    RecordBatch([post._post_id_column, post.content_column], row_list=[(1, "うな"), (2, "ぬ")])
+    RecordBatch([post._post_id_column, post.content_column], column_value_list=[array.array("q", [1, 2]), ["うな", "ぬ"]])
+    """
+
+    column_list: list[Column]
+    row_list: Sequence[tuple] | None = None
+    column_value_list: Sequence[Sequence] | None = None  # list, array.array, numpy.ndarrayなど(tolistを持っていればok)
+    upsert_list: list[bool] | None = None  # column_listと同じ順番
+    constant_field_list: list[Field] = field(default_factory=list)  # 全行で同じ値のカラム(updated_atなど)
+    chunk_size: int = 10000  # column_value_listをPythonの値に変換するときの単位
+
+    def __post_init__(self):
+        if (self.row_list is None) == (self.column_value_list is None):
+            raise exceptions.BulkError("RecordBatchはrow_listかcolumn_value_listのどちらか一方を指定してください。")
+        if self.upsert_list is None:
+            self.upsert_list = [False for _ in self.column_list]
+        if self.upsert_list.__len__() != self.column_list.__len__():
+            raise exceptions.BulkError(
+                f"upsert_listの長さ: {self.upsert_list.__len__()}がcolumn_listの長さ: {self.column_list.__len__()}と違います。"
+            )
+        if self.column_value_list is None:
+            return
+        if self.column_value_list.__len__() != self.column_list.__len__():
+            raise exceptions.BulkError(
+                f"column_value_listの長さ: {self.column_value_list.__len__()}がcolumn_listの長さ: {self.column_list.__len__()}と違います。"
+            )
+        length_set = {values.__len__() for values in self.column_value_list}
+        if length_set.__len__() > 1:
+            raise exceptions.BulkError(f"column_value_listの各カラムの長さが揃っていません。長さ: {length_set}")
+
+    def __len__(self) -> int:
+        if not self.row_list is None:
+            return self.row_list.__len__()
+        if self.column_value_list.__len__() == 0:
+            return 0
+        return self.column_value_list[0].__len__()
+
+    def append_constant(self, field_: Field) -> Self:
+        """全行で同じ値のカラムを足したRecordBatchを取得(元のRecordBatchは変えない)"""
+        return dataclasses.replace(self, constant_field_list=self.constant_field_list + [field_])
+
+    def get_first_record(self) -> list[Field]:
+        """1行目をFieldのリストにしたもの。ステートメントの見本に使う"""
+        first_row = next(self.iter_rows())
+        record = [
+            Field(column, value, upsert) for column, value, upsert in zip(self.column_list, first_row, self.upsert_list)
+        ]
+        return record + self.constant_field_list
+
+    def iter_rows(self) -> Iterator[tuple]:
+        """
+        Pythonの値の行を順に取得(constant_field_listは含まない)
+        column_value_listの場合はchunk_sizeごとにPythonの値に変換するので、numpyなどでもメモリが膨らまない
+        """
+        if not self.row_list is None:
+            yield from self.row_list
+            return
+        # Pythonのリストならそのままzipでok
+        if all(isinstance(values, list | tuple) for values in self.column_value_list):
+            yield from zip(*self.column_value_list)
+            return
+        for start in range(0, self.__len__(), self.chunk_size):
+            chunk_list = [self._to_list(values[start : start + self.chunk_size]) for values in self.column_value_list]
+            yield from zip(*chunk_list)
+
+    def iter_sql_rows(self) -> Iterator[tuple]:
+        """カラムごとのエンコーダでsqlの値に変換した行を順に取得。constant_field_listの値は1回だけ変換して各行の後ろにつける"""
+        encoder_list = [column.constraint.encoder for column in self.column_list]
+        constant_value_tuple = tuple([field_.sql_value for field_ in self.constant_field_list])
+        width = self.column_list.__len__()
+
+        for i, row in enumerate(self.iter_rows()):
+            if row.__len__() != width:
+                raise exceptions.BulkError(
+                    f"カラム数が等しくない行が存在します。カラム数: {width}\n{i + 1}行目の長さ: {row.__len__()}"
+                )
+            yield tuple([encoder(value) for encoder, value in zip(encoder_list, row)]) + constant_value_tuple
+
+    def _to_list(self, values: Sequence) -> list:
+        # array.arrayやnumpy.ndarrayはtolistでPythonの値(int, strなど)にする
+        if hasattr(values, "tolist"):
+            return values.tolist()
+        return list(values)
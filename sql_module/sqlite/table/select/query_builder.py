@@ -1,7 +1,8 @@
 # 標準ライブラリ
 from dataclasses import dataclass
+import itertools
 import sqlite3
-from typing import Literal
+from typing import Literal, Callable, Iterator
 from pathlib import Path
 import datetime
 
@@ -21,6 +22,7 @@ from sql_module import (
     Join,
     OrderBy,
     expressions,
+    decode_row_list,
 )
 from sql_module.sqlite.table.sub_query import SubQuery
 
@@ -33,9 +35,101 @@ class SelectType:
 
 
 class Select(SubQuery):
+    # 式に射影したカラム(カラム以外の式はNone)。Noneなら'SELECT *'などで分からない
+    column_list: list[Column | None] | None = None
+    # 'SELECT *'のときに、fetchしたカラム名からカラムを引く辞書
+    column_dict: dict[str, Column] | None = None
+    # Trueならdriver.result_cacheを使う
+    is_cache: bool = False
+
     def set_select_type(self, select_type: SelectType):
         self.select_type = select_type
 
+    def set_column_list(self, column_list: list[Column | None] | None):
+        self.column_list = column_list
+
+    def set_column_dict(self, column_dict: dict[str, Column]):
+        self.column_dict = column_dict
+
+    def set_is_cache(self, is_cache: bool):
+        self.is_cache = is_cache
+
+    def execute(self, time_log: utils.LogLike | None = None):
+        if not self.is_cache:
+            super().execute(time_log=time_log)
+            return
+        if self.driver is None:
+            raise ValueError("実行するにはdriverが必要です。")
+        sql, parameters = self.compile()
+        self.driver.execute_cached(sql, parameters, time_log=time_log, temp_value_table_list=self.temp_value_table_list)
+
+    def get_decoder_list(self) -> list[Callable[[str | int | bytes], object] | None]:
+        """fetchする各カラムのデコーダ(ColumnConstraint.decoder)のリスト"""
+        decoder_list = []
+        for i, description in enumerate(self.driver.get_description()):
+            column = None
+            if not self.column_list is None:
+                if i < self.column_list.__len__():
+                    column = self.column_list[i]
+            elif not self.column_dict is None:
+                column = self.column_dict.get(description[0])
+
+            if column is None:
+                decoder_list.append(None)
+            else:
+                decoder_list.append(column.constraint.decoder)
+        return decoder_list
+
+    def __iter__(self) -> Iterator[sqlite3.Row]:
+        """for row in select: みたいに1行ずつ取り出す。中身はiter_batchesなのでメモリは一定"""
+        return itertools.chain.from_iterable(self.iter_batches())
+
+    def iter_batches(
+        self, size: int = 1000, dict_output: bool = False, typed: bool = False
+    ) -> Iterator[list[sqlite3.Row]] | Iterator[list[dict[str]]] | Iterator[list[tuple]]:
+        """
+        sizeごとにfetchmanyして、そのかたまりを順に返すジェネレータ。結果がどれだけ大きくても一度にメモリに載るのはsize行だけ
+        呼んだ時点で実行したcursorを掴むので、ループの中で別のクエリを実行してもいい
+        Args:
+            dict_output (bool): 辞書で出力
+            typed (bool): datetime, bool, Pathなどpythonの型に戻す。かたまりごとにまとめてデコードする
+        """
+        if not typed:
+            return self.driver.iter_batches(size, dict_output)
+
+        decoder_list = self.get_decoder_list()
+        name_list = [description[0] for description in self.driver.get_description()]
+        return self._iter_typed_batches(self.driver.iter_batches(size), decoder_list, name_list, dict_output)
+
+    def _iter_typed_batches(
+        self,
+        batch_iterator: Iterator[list[sqlite3.Row]],
+        decoder_list: list[Callable[[str | int | bytes], object] | None],
+        name_list: list[str],
+        dict_output: bool,
+    ) -> Iterator[list[tuple]] | Iterator[list[dict[str]]]:
+        for row_list in batch_iterator:
+            typed_row_list = decode_row_list(row_list, decoder_list)
+            if dict_output:
+                typed_row_list = [dict(zip(name_list, typed_row)) for typed_row in typed_row_list]
+            yield typed_row_list
+
+    def iter_typed(self, size: int = 1000, dict_output: bool = False) -> Iterator[tuple] | Iterator[dict[str]]:
+        """datetime, bool, Pathなどpythonの型に戻しながら1行ずつ取り出すジェネレータ"""
+        return itertools.chain.from_iterable(self.iter_batches(size, dict_output, typed=True))
+
+    def fetchall_typed(
+        self, dict_output: bool = False, size: int = 1000, time_log: utils.LogLike | None = None
+    ) -> list[tuple] | list[dict[str]]:
+        """全行をpythonの型に戻して取り出す"""
+        timer = utils.Timer(time_log=time_log)
+
+        typed_list = list(self.iter_typed(size, dict_output))
+
+        timer.finish("fetchall_typed時間")
+
+        return typed_list
+
     def fetchall(
         self, dict_output: bool = False, time_log: utils.LogLike | None = None
     ) -> list[dict[str]] | list[sqlite3.Row]:
@@ -65,14 +159,12 @@ class Select(SubQuery):
         return [fetch[0] for fetch in fetchmany]
 
     def fetchgrid_value_list(self, limit: int, time_log: utils.LogLike | None = None) -> list[list[int | str | None]]:
-        all_list = []
-        while True:
-            fetchmany_value_list = self.fetchmany_value_list(limit, time_log=time_log)
-            # fetchmany_listがなくなるまで
-            if fetchmany_value_list.__len__() == 0:
-                break
-
-            all_list.append(fetchmany_value_list)
+        """単一カラムのfetchした値をlimitごとのリストに分ける。全部メモリに載るので、大きいテーブルはiter_batchesを使う"""
+        timer = utils.Timer(time_log=time_log)
+
+        all_list = [[fetch[0] for fetch in row_list] for row_list in self.iter_batches(limit)]
+
+        timer.finish("fetchmany時間")
 
         return all_list
 
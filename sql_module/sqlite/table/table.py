@@ -1,8 +1,11 @@
 # 標準ライブラリ
 from pathlib import Path
 from dataclasses import dataclass, field
+import dataclasses
 import datetime
-from typing import Self, Literal
+import itertools
+import sqlite3
+from typing import Self, Literal, Iterable, Iterator
 
 # 主要要素
 from sql_module.sqlite.table.column.name import ColumnName
@@ -14,6 +17,9 @@ from sql_module.sqlite.table.info import Info
 # index系
 from sql_module.sqlite.table.index.query_builder import IndexQueryBuilder
 
+# 全文検索系
+from sql_module.sqlite.table.fts.query_builder import FTSQueryBuilder, get_fts_table_name
+
 # create系
 from sql_module import CompositeConstraint
 from sql_module.sqlite.table.create.query_builder import CreateQueryBuilder
@@ -21,6 +27,11 @@ from sql_module.sqlite.table.create.query_builder import CreateQueryBuilder
 # insert系
 from sql_module.sqlite.table.insert.query_builder import InsertQueryBuilder, Insert
 
+# バルク系
+from sql_module.sqlite.table.record.batch import RecordBatch
+from sql_module.sqlite.table.bulk_load import BulkLoad
+from sql_module.sqlite.temp_value_table import TempValueTable
+
 # update系
 from sql_module.sqlite.table.update.query_builder import UpdateQueryBuilder, Update
 
@@ -67,6 +78,7 @@ class Table:
         primary: bool = False,  # AUTO_INCREMENTは廃止されました。そのうちuuid対応するかも
         references: Column | None = None,
         default_value: str | int | bytes | Path | datetime.date | None = None,  # bool, datetime.datetime内包
+        collate: Literal["BINARY", "NOCASE", "RTRIM"] | None = None,  # NOCASEなら大文字小文字を区別しない(ASCIIのみ)
     ) -> Column:
         """カラムを取得"""
         # カラム名
@@ -79,6 +91,7 @@ class Table:
             primary=primary,
             references=references,
             default_value=default_value,
+            collate=collate,
         )
         # カラム
         column = Column(driver=self.driver, name=column_name, constraint=column_constraint)
@@ -87,21 +100,9 @@ class Table:
     def exists(self) -> bool:
         """
         存在しているかどうか
-        # placeholder = {"p0": "table", "p1": "post"}
-        # select.driver.execute("SELECT EXISTS (SELECT 1 FROM sqlite_master WHERE type = :p0 AND name = :p1)", placeholder)
-        """
-        table = Table(driver=self.driver, name="sqlite_master")
-        type_column = table.get_column("type", str)
-        name_column = table.get_column("name", str)
-        sqlite_master_select = table.select(
-            1, conds.Eq(type_column, "table") & conds.Eq(name_column, self.name), is_execute=False
-        )
-        select = self.select(conds.Exists(sqlite_master_select), is_from=False)
-        result = select.fetchone()[0]
-        if result:
-            return True
-        else:
-            return False
+        sqlite_masterはdriver.schema_catalogにキャッシュしていて、PRAGMA schema_versionが変わったときだけ読み直す
+        """
+        return self.driver.schema_catalog.exists(self.driver, self.name)
 
     def info(self, show: bool = False) -> Info:
         """
@@ -127,21 +128,27 @@ class Table:
         is_unique: bool = False,
         where: conds.Cond | None = None,
         index_name: str | None = None,
+        is_keep_order: bool = False,
         time_log: utils.LogLike | None = None,
     ):
-        """インデックス生成(複合)"""
+        """
+        インデックス生成(複合)
+        複合インデックスのカラムはデフォルトでは名前順。is_keep_orderならcolumn_listの順番のまま
+        (左端プレフィックスで使えるのは前のカラムからなので、等号で絞るカラムを前、範囲や並び替えのカラムを後ろにしたいとき)
+        """
         if isinstance(column_list, Column):
             column_list.create_index(exists_ok, is_unique, where, index_name, time_log=time_log)
             return
         if isinstance(column_list, list):
             column_name_list = [column.name for column in column_list]
             # index_name引数がある場合、インデックス名にカラム名の順序があるのでソート大事
-            sorted_column_name_list = sorted(column_name_list, key=lambda column_name: column_name.name)
+            if not is_keep_order:
+                column_name_list = sorted(column_name_list, key=lambda column_name: column_name.name)
 
             query_builder = IndexQueryBuilder(self.driver)
             head_query = query_builder.get_create_head_query(exists_ok, is_unique)
-            _index_name = query_builder.get_index_name(sorted_column_name_list, index_name, is_unique)
-            on_query = query_builder.get_on_query(sorted_column_name_list)
+            _index_name = query_builder.get_index_name(column_name_list, index_name, is_unique, is_keep_order)
+            on_query = query_builder.get_on_query(column_name_list)
             where_query = query_builder.get_where_query(where)
 
             create_index = head_query + " " + _index_name + " " + on_query + " " + where_query
@@ -158,20 +165,22 @@ class Table:
         not_exists_ok: bool = True,
         is_unique: bool = False,
         index_name: str | None = None,
+        is_keep_order: bool = False,
         time_log: utils.LogLike | None = None,
     ):
-        """インデックス削除(複合)"""
+        """インデックス削除(複合)。is_keep_orderで作ったものはis_keep_orderで消す"""
         if isinstance(column_list, Column):
             column_list.delete_index(not_exists_ok, is_unique, index_name, time_log=time_log)
             return
         if isinstance(column_list, list):
             column_name_list = [column.name for column in column_list]
             # index_name引数がある場合、インデックス名にカラム名の順序があるのでソート大事
-            sorted_column_name_list = sorted(column_name_list, key=lambda column_name: column_name.name)
+            if not is_keep_order:
+                column_name_list = sorted(column_name_list, key=lambda column_name: column_name.name)
 
             query_builder = IndexQueryBuilder(self.driver)
             head_query = query_builder.get_delete_head_query(not_exists_ok)
-            _index_name = query_builder.get_index_name(sorted_column_name_list, index_name, is_unique)
+            _index_name = query_builder.get_index_name(column_name_list, index_name, is_unique, is_keep_order)
 
             delete_index = head_query + " " + _index_name
 
@@ -180,6 +189,41 @@ class Table:
             return
         raise TypeError("index削除はカラムのみです。")
 
+    def create_fts(
+        self,
+        column_list: list[Column] | Column,
+        tokenizer: Literal["trigram", "unicode61", "porter"] | str = "trigram",
+        exists_ok: bool = True,
+        time_log: utils.LogLike | None = None,
+    ):
+        """
+        全文検索(FTS5)のテーブル'{テーブル名}_fts'を作る。元テーブルの行を参照する外部コンテンツテーブルで、insert, update, deleteはトリガーで同期
+        作ったときに今ある行もインデックスする
+        tokenizer="trigram"なら部分一致(conds.Contains, EndsWithのuse_fts=True)も全文検索のインデックスで引ける(3文字以上)
+        """
+        if isinstance(column_list, Column):
+            column_list = [column_list]
+        column_name_list = [column.name for column in column_list]
+        query_builder = FTSQueryBuilder(self.driver)
+        is_exists = Table(self.driver, get_fts_table_name(self.name)).exists()
+        if is_exists and not exists_ok:
+            raise exceptions.SQLException(f"全文検索のテーブル: {get_fts_table_name(self.name)}は既にあります。")
+
+        timer = utils.Timer(time_log=time_log)
+        with self.driver.transaction():
+            query_builder.get_create_query(self.name, column_name_list, tokenizer, exists_ok).execute()
+            for trigger_query in query_builder.get_trigger_query_list(self.name, column_name_list):
+                trigger_query.execute()
+            if not is_exists:
+                query_builder.get_rebuild_query(self.name).execute()
+        timer.finish("全文検索テーブル作成時間")
+
+    def delete_fts(self):
+        """全文検索のテーブルとトリガーを消す"""
+        with self.driver.transaction():
+            for drop_query in FTSQueryBuilder(self.driver).get_drop_query_list(self.name):
+                drop_query.execute()
+
     def create(
         self,
         column_list: list[Column],
@@ -227,6 +271,7 @@ class Table:
 
         query += self.name
         query.execute()
+        self.driver.id_resolver_cache.invalidate(self.name)
 
     def insert(
         self,
@@ -247,23 +292,37 @@ class Table:
         'INSERT INTO work (site_id, content_id, title, channel_id) VALUES (:p0, :p1, :p2, :p3) ON CONFLICT (site_id, content_id) DO UPDATE SET title = excluded.title, channel_id = excluded.channel_id'
         {'p0': 3, 'p1': 20, 'p2': 'おお', 'p3': 1}
         """
-        query_builder = InsertQueryBuilder(self.driver)
-        # 最初のクエリ
-        head_query = query_builder.get_head_query()
-        # VALUES
-        value_query = query_builder.get_value_query(record)
-        # ON CONFLICT
-        on_conflict_query = query_builder.get_on_conflict_query(record)
-        # RETURNING id
-        returning_id_query = query_builder.get_returning_id_query(is_returning_id)
-
-        insert_base = head_query + f" {self.name} " + value_query + " " + on_conflict_query + " " + returning_id_query
+        if isinstance(record, Field):
+            record = [record]
+        statement_key = self._get_insert_statement_key(record, is_returning_id)
+        statement = self.driver.statement_cache.get(statement_key)
+
+        if statement is None:
+            query_builder = InsertQueryBuilder(self.driver)
+            # 最初のクエリ
+            head_query = query_builder.get_head_query()
+            # VALUES
+            value_query = query_builder.get_value_query(record)
+            # ON CONFLICT
+            on_conflict_query = query_builder.get_on_conflict_query(record)
+            # RETURNING id
+            returning_id_query = query_builder.get_returning_id_query(is_returning_id)
+
+            insert_base = (
+                head_query + f" {self.name} " + value_query + " " + on_conflict_query + " " + returning_id_query
+            )
 
-        insert = Insert()
-        insert.straight_set(insert_base)
+            insert = Insert()
+            insert.straight_set(insert_base)
+            self.driver.statement_cache.set(statement_key, insert.string_list, insert.compile()[0])
+        else:
+            # 同じ形のクエリなら値だけ差し替える
+            value_list = [field_.sql_value for field_ in record]
+            insert = Insert.from_compiled(statement, value_list, self.driver)
 
         if is_execute:
             insert.execute(time_log=time_log)
+            self._invalidate_id_resolver_if_do_update(record)
             # fetch待ちがあると 「OperationalError: cannot commit transaction - SQL statements in progress」になるので、fetch_idしないときのみコミット。
             if not is_returning_id and is_commit:
                 insert.commit(time_log=time_log)
@@ -272,42 +331,280 @@ class Table:
 
     def bulk_insert(
         self,
-        record_list: list[list[Field]] | list[Field],
+        record_list: list[list[Field]] | list[Field] | RecordBatch,
+        strategy: Literal["auto", "executemany", "multi_value"] = "auto",
+        is_returning_id: bool = False,
         time_log: utils.LogLike | None = None,
-    ):
+    ) -> list[int] | None:
         """
         バルクインサートをついに実装！
+        1レコード目のカラムからステートメントを1度だけ作り、各行はカラムごとのエンコーダで直接タプルにして流し込む
 
         Args:
-            record_list (list[list[Field]] | list[Field]): バルクinsertしたいレコードのリスト
+            record_list (list[list[Field]] | list[Field] | RecordBatch): バルクinsertしたいレコードのリスト。RecordBatchならセルごとのFieldが不要
+            strategy (Literal["auto", "executemany", "multi_value"]): 流し込み方
+            - "executemany": 1行ずつステートメントを実行
+            - "multi_value": 'INSERT ... VALUES (...), (...), ...'でプレースホルダの上限まで複数行ずつ実行
+            - "auto": カラム数から速いほう(カラムが少ないならmulti_value)
+            is_returning_id (bool): 挿入した行のidのリストを返す(multi_valueのみ)。ON CONFLICT DO NOTHINGで飛ばされた行のidは入らない
         """
         if record_list.__len__() == 0:
-            return
+            return [] if is_returning_id else None
 
-        sample_query_string = None
-        sample_placeholder_dict = None
-
-        placeholder_dict_list = []
-        for i, record in enumerate(record_list):
-            insert = self.insert(record, is_execute=False)
-            query_string, placeholder_dict = insert.measurement()
-            # クエリ文字列やプレースホルダの長さはすべて等しい必要がある
-            # 1行目のクエリ文字列とプレースホルダの長さを見本とする
-            if i == 0:
-                sample_query_string = query_string
-                sample_placeholder_dict = placeholder_dict
-            elif query_string != sample_query_string:
-                raise exceptions.BulkError(
-                    f"クエリ文字列が等しくないレコードが存在します。\n1レコード目: {sample_query_string}\n{i + 1}レコード目: {query_string}"
+        first_record, sql_row_iter = self._get_bulk_sql_rows(record_list)
+        query_builder = InsertQueryBuilder(self.driver)
+        if strategy == "auto":
+            strategy = query_builder.get_bulk_strategy(first_record.__len__(), is_returning_id)
+        if strategy == "executemany":
+            if is_returning_id:
+                raise exceptions.BulkError("executemanyではRETURNING idを受け取れません。strategyを'multi_value'にしてください。")
+            sql, _ = self.insert(first_record, is_execute=False).compile()
+            self._bulk_execute(sql, sql_row_iter, time_log=time_log)
+            self._invalidate_id_resolver_if_do_update(first_record)
+            return None
+
+        returning_name_list = ("id",) if is_returning_id else ()
+        timer = utils.Timer(time_log=time_log)
+        # _bulk_executeと同じく、途中で失敗したらこのバルクの分は全部取り消す
+        with self.driver.transaction("immediate"):
+            returning_row_list = [
+                returning_row
+                for returning_row_list, _ in self._iter_multi_value_execute(
+                    first_record, sql_row_iter, returning_name_list
                 )
-            elif placeholder_dict.__len__() != sample_placeholder_dict.__len__():
-                raise exceptions.BulkError(
-                    f"クエリ文字列が等しくないレコードが存在します。\n1レコード目の長さ: {sample_placeholder_dict.__len__()}\n{i + 1}レコード目の長さ: {placeholder_dict.__len__()}"
+                for returning_row in returning_row_list
+            ]
+        timer.finish("バルク(複数行VALUES)insert時間")
+        if is_returning_id:
+            return [returning_row[0] for returning_row in returning_row_list]
+        return None
+
+    def _iter_multi_value_execute(
+        self, first_record: list[Field], sql_row_iter: Iterator[tuple], returning_name_list: tuple[str, ...]
+    ) -> Iterator[tuple[list[sqlite3.Row], tuple[tuple, ...]]]:
+        """
+        プレースホルダの上限に収まる行数ずつ、複数行VALUESのinsertを実行
+        1ステートメントごとに(RETURNINGの行のリスト, 流し込んだ行のタプル)を返す。トランザクションは呼び出し側で
+        """
+        row_count = InsertQueryBuilder(self.driver).get_multi_value_row_count(first_record.__len__())
+        for sql_row_chunk in itertools.batched(sql_row_iter, row_count):
+            sql = self._get_multi_value_sql(first_record, sql_row_chunk.__len__(), returning_name_list)
+            self.driver.execute(sql, tuple(itertools.chain.from_iterable(sql_row_chunk)))
+            self._invalidate_id_resolver_if_do_update(first_record)
+            returning_row_list = []
+            if returning_name_list.__len__() > 0:
+                # 次のexecuteやコミットの前に結果を読み切る
+                returning_row_list = self.driver.fetchall()
+            yield returning_row_list, sql_row_chunk
+
+    def _invalidate_id_resolver_if_do_update(self, record: list[Field]):
+        """
+        'ON CONFLICT DO UPDATE'のinsertを実行したあとに呼ぶ。既にあった行のユニークカラムも書き換わるかもしれないので、resolve_idsのキャッシュを捨てる
+        (ただのinsertとDO NOTHINGは既にある行を変えないので捨てない)
+        """
+        is_on_conflict = any(field_.upsert for field_ in record)
+        is_do_update = is_on_conflict and not all(field_.upsert for field_ in record)
+        if is_do_update:
+            self.driver.id_resolver_cache.invalidate(self.name)
+
+    def _get_multi_value_sql(self, record: list[Field], row_count: int, returning_name_list: tuple[str, ...]) -> str:
+        """'INSERT INTO post (...) VALUES (?, ?), (?, ?) ON CONFLICT ... RETURNING id'。行数ごとにStatementCacheに入れる"""
+        statement_key = (
+            "insert_multi_value",
+            self.name,
+            tuple((field_.column.name.name, field_.upsert) for field_ in record),
+            returning_name_list,
+            row_count,
+        )
+        statement = self.driver.statement_cache.get(statement_key)
+        if not statement is None:
+            return statement.sql
+
+        query_builder = InsertQueryBuilder(self.driver)
+        # 最初のクエリ
+        head_query = query_builder.get_head_query()
+        # VALUES (...), (...)
+        multi_value_query = query_builder.get_multi_value_query(record, row_count)
+        # ON CONFLICT
+        on_conflict_query = query_builder.get_on_conflict_query(record)
+        # RETURNING
+        returning_query = query_builder.get_returning_query(returning_name_list)
+
+        insert = head_query + f" {self.name} " + multi_value_query + " " + on_conflict_query + " " + returning_query
+        sql, _ = insert.compile()
+        self.driver.statement_cache.set(statement_key, insert.string_list, sql)
+        return sql
+
+    def bulk_upsert(
+        self,
+        record_list: list[list[Field]] | list[Field] | RecordBatch,
+        key_column_list: list[Column] | Column,
+        returning_column_list: list[Column] | Column | None = None,
+        time_log: utils.LogLike | None = None,
+    ) -> dict:
+        """
+        ナチュラルキー(key_column_list)でバルクupsertして、{キー: id}の辞書を取得。既にあった行のキーも含む
+        キーが複数カラムならキーはタプル、returning_column_listが複数カラムなら値はタプル(Noneならidカラム)
+
+        key_column_list以外のカラムがあれば'ON CONFLICT DO UPDATE'で上書き、なければ'DO NOTHING'
+        DO NOTHINGで飛ばされた(既にあった)行だけ、最後にINでまとめて引く
+
+        screen_name_id_dict = screen_name.bulk_upsert(record_list, screen_name.screen_name_column)
+        -> {'yaiyai': 1, 'una': 2, ...}
+        """
+        if not isinstance(key_column_list, list):
+            key_column_list = [key_column_list]
+        returning_name_list = self._get_returning_name_list(returning_column_list)
+        if record_list.__len__() == 0:
+            return {}
+
+        first_record, sql_row_iter = self._get_bulk_sql_rows(record_list)
+        name_list = [field_.column.name.name for field_ in first_record]
+        key_name_list = [column.name.name for column in key_column_list]
+        for key_name in key_name_list:
+            if not key_name in name_list:
+                raise exceptions.BulkError(f"キーのカラム: {key_name}がレコードにありません。レコードのカラム: {name_list}")
+        key_index_list = [name_list.index(key_name) for key_name in key_name_list]
+        # ON CONFLICTの対象はキーのカラム
+        upsert_record = [Field(field_.column, field_.value, field_.column.name.name in key_name_list) for field_ in first_record]
+
+        timer = utils.Timer(time_log=time_log)
+        key_count = key_name_list.__len__()
+        sql_result_dict = {}
+        sql_key_list = []
+        with self.driver.transaction("immediate"):
+            for returning_row_list, sql_row_chunk in self._iter_multi_value_execute(
+                upsert_record, sql_row_iter, (*key_name_list, *returning_name_list)
+            ):
+                for returning_row in returning_row_list:
+                    sql_result_dict[tuple(returning_row[:key_count])] = tuple(returning_row[key_count:])
+                sql_key_list.extend(tuple(sql_row[i] for i in key_index_list) for sql_row in sql_row_chunk)
+            # RETURNINGで返ってこなかった(DO NOTHINGで飛ばされた)キー
+            missing_sql_key_list = list(dict.fromkeys(key for key in sql_key_list if not key in sql_result_dict))
+            if missing_sql_key_list.__len__() > 0:
+                sql_result_dict |= self.lookup_by_key(key_column_list, missing_sql_key_list, returning_column_list)
+        timer.finish("バルクupsert時間")
+
+        # SQLの値 -> Pythonの値
+        decoder_list = [column.constraint.decoder for column in key_column_list]
+        result_dict = {}
+        for sql_key in sql_key_list:
+            if not sql_key in sql_result_dict:
+                continue
+            key = tuple(
+                value if decoder is None or value is None else decoder(value)
+                for decoder, value in zip(decoder_list, sql_key)
+            )
+            result = sql_result_dict[sql_key]
+            result_dict[key[0] if key_count == 1 else key] = result[0] if result.__len__() == 1 else result
+        return result_dict
+
+    def _get_returning_name_list(self, returning_column_list: list[Column] | Column | None) -> tuple[str, ...]:
+        """bulk_upsert, lookup_by_keyで返すカラム名(Noneならidカラム)"""
+        if returning_column_list is None:
+            return ("id",)
+        if isinstance(returning_column_list, list):
+            return tuple(column.name.name for column in returning_column_list)
+        return (returning_column_list.name.name,)
+
+    def lookup_by_key(
+        self,
+        key_column_list: list[Column] | Column,
+        sql_key_list: list[tuple],
+        returning_column_list: list[Column] | Column | None = None,
+        chunk_size: int | None = None,
+    ) -> dict[tuple, tuple]:
+        """
+        キー(SQLの値のタプル)のリストから{キー: returning_column_listの値のタプル}をINでまとめて引く(Noneならidカラム)
+        chunk_size(最大でプレースホルダの上限)ごとに区切る。テーブルにないキーは辞書に入らない
+        'SELECT screen_name, id FROM screen_name WHERE screen_name IN (?, ?)'
+        'SELECT site_id, content_id, id FROM work WHERE (site_id, content_id) IN (VALUES (?, ?), (?, ?))'
+
+        screen_name.table.lookup_by_key(screen_name.screen_name_column, [("yaiyai",), ("una",)])
+        -> {('yaiyai',): (1,), ('una',): (2,)}
+        """
+        if not isinstance(key_column_list, list):
+            key_column_list = [key_column_list]
+        key_name_list = [column.name.name for column in key_column_list]
+        returning_name_list = self._get_returning_name_list(returning_column_list)
+        key_count = key_name_list.__len__()
+        key_chunk_size = self.driver.get_max_variable_number() // key_count
+        if not chunk_size is None:
+            key_chunk_size = min(key_chunk_size, chunk_size)
+        select_head = f"SELECT {utils.join_comma([*key_name_list, *returning_name_list])} FROM {self.name} WHERE "
+        sql_result_dict = {}
+        for sql_key_chunk in itertools.batched(sql_key_list, key_chunk_size):
+            if key_count == 1:
+                where = f"{key_name_list[0]} IN (" + utils.join_comma(["?" for _ in sql_key_chunk]) + ")"
+            else:
+                row_place_holder = "(" + utils.join_comma(["?" for _ in key_name_list]) + ")"
+                where = (
+                    f"({utils.join_comma(key_name_list)}) IN (VALUES "
+                    + utils.join_comma([row_place_holder for _ in sql_key_chunk])
+                    + ")"
                 )
-            placeholder_dict_list.append(placeholder_dict)
+            self.driver.execute(select_head + where, tuple(itertools.chain.from_iterable(sql_key_chunk)))
+            for row in self.driver.fetchall():
+                sql_result_dict[tuple(row[:key_count])] = tuple(row[key_count:])
+        return sql_result_dict
+
+    def _get_bulk_sql_rows(
+        self, record_list: list[list[Field]] | list[Field] | RecordBatch
+    ) -> tuple[list[Field], Iterator[tuple]]:
+        """見本となる1レコード目と、sqlの値に変換した行のイテレータを取得"""
+        if isinstance(record_list, RecordBatch):
+            return record_list.get_first_record(), record_list.iter_sql_rows()
+
+        first_record = record_list[0]
+        if isinstance(first_record, Field):
+            first_record = [first_record]
+        # カラム名やupsertの組み合わせはすべて等しい必要がある
+        # 1行目のカラムを見本とする
+        sample_column_key = self._get_bulk_column_key(first_record)
+        encoder_list = [field_.column.constraint.encoder for field_ in first_record]
+
+        def generate_sql_rows():
+            for i, record in enumerate(record_list):
+                if isinstance(record, Field):
+                    record = [record]
+                column_key = self._get_bulk_column_key(record)
+                if column_key != sample_column_key:
+                    raise exceptions.BulkError(
+                        f"カラムが等しくないレコードが存在します。\n1レコード目: {sample_column_key}\n{i + 1}レコード目: {column_key}"
+                    )
+                yield tuple([encoder(field_.value) for encoder, field_ in zip(encoder_list, record)])
+
+        return first_record, generate_sql_rows()
+
+    def _get_bulk_column_key(self, record: list[Field]) -> tuple[tuple[str, bool], ...]:
+        """バルクで各行の形が同じか比べるためのカラムのタプル"""
+        return tuple([(field_.column.name.name, field_.upsert) for field_ in record])
+
+    def _bulk_execute(
+        self,
+        sql: str,
+        parameters: Iterable[tuple],
+        time_log: utils.LogLike | None = None,
+        temp_value_table_list: list[TempValueTable] | None = None,
+    ):
+        # 途中の行で失敗したら、それまでに流し込んだ行も取り消す(transactionのブロック内ならsavepointになり、このバルクの分だけ)
+        # 行はジェネレータでやり直せないので、immediateで先に書き込みロックを取る(ここはリトライできる)
+        with self.driver.transaction("immediate"):
+            self.driver.executemany(sql, parameters, time_log=time_log, temp_value_table_list=temp_value_table_list)
+
+    def bulk_load(
+        self, is_drop_unique: bool = False, is_raise_violation: bool = True, max_violation: int = 100
+    ) -> BulkLoad:
+        """
+        大量の行を流し込むときのモード。withで使い、ブロック内のバルクを1つのトランザクションにまとめる
+        ブロックの間はインデックス(ユニークはis_drop_uniqueのときのみ)を消し、foreign_keys・synchronous・ジャーナルを緩める
+        抜けるときにインデックスを作り直し、外部キー違反があればForeignKeyViolationError(is_raise_violationがFalseならreportに入るだけ)
 
-        self.driver.executemany(sample_query_string, placeholder_dict_list, time_log=time_log)
-        self.driver.commit(time_log=time_log)
+        with post.bulk_load() as report:
+            post.bulk_insert(record_batch)
+        print(report)
+        """
+        return BulkLoad(self.driver, self.name, is_drop_unique, is_raise_violation, max_violation)
 
     def update(
         self,
@@ -330,22 +627,47 @@ class Table:
             raise exceptions.DefenseAccidentException(
                 "where無しでupdateする場合、事故防止のためにnon_where_safe引数をFalseにしてください。"
             )
-        query_builder = UpdateQueryBuilder(self.driver)
-        # 最初のクエリ
-        head_query = query_builder.get_head_query()
-        # set部分
-        set_query = query_builder.get_set_query(record)
-        # where部分
-        where_query = query_builder.get_where_query(where)
-        # RETURNING id
-        returning_id_query = query_builder.get_returning_id_query(is_returning_id)
-
-        update_base = head_query + f" {self.name} " + set_query + " " + where_query + " " + returning_id_query
-
-        update = Update()
-        update.straight_set(update_base)
+        if isinstance(record, Field):
+            record = [record]
+        where_value_list = []
+        statement_key = (
+            "update",
+            self.name,
+            tuple(field_.column.name.name for field_ in record),
+            self._get_statement_key_part(where, where_value_list),
+            is_returning_id,
+        )
+        statement = self.driver.statement_cache.get(statement_key)
+
+        if statement is None:
+            query_builder = UpdateQueryBuilder(self.driver)
+            # 最初のクエリ
+            head_query = query_builder.get_head_query()
+            # set部分
+            set_query = query_builder.get_set_query(record)
+            # where部分
+            where_query = query_builder.get_where_query(where)
+            # RETURNING id
+            returning_id_query = query_builder.get_returning_id_query(is_returning_id)
+
+            update_base = head_query + f" {self.name} " + set_query + " " + where_query + " " + returning_id_query
+
+            update = Update()
+            update.straight_set(update_base)
+            self.driver.statement_cache.set(
+                statement_key,
+                update.string_list,
+                update.compile()[0],
+                temp_value_table_list=update.temp_value_table_list,
+            )
+        else:
+            # 同じ形のクエリなら値だけ差し替える
+            value_list = [field_.sql_value for field_ in record] + where_value_list
+            update = Update.from_compiled(statement, value_list, self.driver)
 
         if is_execute:
+            # resolve_idsのキャッシュの値とidの組み合わせが変わるかもしれない(is_execute=Falseでコンパイルだけなら何もしない)
+            self.driver.id_resolver_cache.invalidate(self.name)
             update.execute(time_log=time_log)
             # fetch待ちがあると 「OperationalError: cannot commit transaction - SQL statements in progress」になるので、fetch_idしないときのみコミット。
             if not is_returning_id and is_commit:
@@ -355,16 +677,18 @@ class Table:
 
     def bulk_update(
         self,
-        record_list: list[list[Field]] | list[Field],
+        record_list: list[list[Field]] | list[Field] | RecordBatch,
         where_list: list[conds.Cond] | None,
         non_where_safe: bool = True,
         time_log: utils.LogLike | None = None,
     ):
         """
         バルクアップデートをついに実装！
+        1レコード目とwhereからステートメントを1度だけ作り、各行はset部分の値 + whereの値のタプルにしてexecutemanyへ流し込む
 
         Args:
-            record_list (list[list[Field]] | list[Field]): バルクupdateしたいレコードのリスト
+            record_list (list[list[Field]] | list[Field] | RecordBatch): バルクupdateしたいレコードのリスト
+            where_list (list[conds.Cond] | None): 各レコードのwhere。record_listと同じ長さ
         """
         if record_list.__len__() == 0:
             return
@@ -377,30 +701,33 @@ class Table:
                 f"updateに使うrecord_listとwhere_listの長さは統一してください。record_listの長さ: {record_list.__len__()}, where_listの長さ: {where_list.__len__()}"
             )
 
-        sample_query_string = None
-        sample_placeholder_dict = None
-
-        placeholder_dict_list = []
-        for i, (record, where) in enumerate(zip(record_list, where_list)):
-            update = self.update(record, where, non_where_safe, is_execute=False)
-            query_string, placeholder_dict = update.measurement()
-            # クエリ文字列やプレースホルダの長さはすべて等しい必要がある
-            # 1行目のクエリ文字列とプレースホルダの長さを見本とする
-            if i == 0:
-                sample_query_string = query_string
-                sample_placeholder_dict = placeholder_dict
-            elif query_string != sample_query_string:
-                raise exceptions.BulkError(
-                    f"クエリ文字列が等しくないレコードが存在します。\n1レコード目: {sample_query_string}\n{i + 1}レコード目: {query_string}"
-                )
-            elif placeholder_dict.__len__() != sample_placeholder_dict.__len__():
-                raise exceptions.BulkError(
-                    f"クエリ文字列が等しくないレコードが存在します。\n1レコード目の長さ: {sample_placeholder_dict.__len__()}\n{i + 1}レコード目の長さ: {placeholder_dict.__len__()}"
-                )
-            placeholder_dict_list.append(placeholder_dict)
+        self.driver.id_resolver_cache.invalidate(self.name)
+        first_record, sql_row_iter = self._get_bulk_sql_rows(record_list)
+        sample_where = where_list[0]
+        sample_update = self.update(first_record, sample_where, non_where_safe, is_execute=False)
+        sql, _ = sample_update.compile()
+        # whereの構造もすべて等しい必要がある
+        sample_where_key = self._get_bulk_where_key(sample_where)
+
+        def generate_parameters():
+            for i, (sql_row, where) in enumerate(zip(sql_row_iter, where_list)):
+                if self._get_bulk_where_key(where) != sample_where_key:
+                    raise exceptions.BulkError(
+                        f"whereの構造が等しくないレコードが存在します。\n1レコード目: {sample_where}\n{i + 1}レコード目: {where}"
+                    )
+                if where is None:
+                    yield sql_row
+                else:
+                    yield sql_row + tuple(where.value_list)
+
+        self._bulk_execute(
+            sql, generate_parameters(), time_log=time_log, temp_value_table_list=sample_update.temp_value_table_list
+        )
 
-        self.driver.executemany(sample_query_string, placeholder_dict_list, time_log=time_log)
-        self.driver.commit(time_log=time_log)
+    def _get_bulk_where_key(self, where: conds.Cond | None) -> tuple[str, ...] | None:
+        if where is None:
+            return None
+        return tuple(where.string_list)
 
     def bulk_query(self, executable_query_list: list[Query], time_log: utils.LogLike | None = None):
         """
@@ -408,16 +735,17 @@ class Table:
             executable_query_list (list[Query]): 実行可能なQueryオブジェクトのリスト
         """
         timer = utils.Timer(time_log=time_log)
+        # 中身がわからないので、resolve_idsのキャッシュは捨てる
+        self.driver.id_resolver_cache.invalidate(self.name)
 
         try:
-            for i, query in enumerate(executable_query_list):
-                query.execute()
+            # 失敗したら全部取り消す(transactionのブロック内ならこのバルクの分だけ)
+            with self.driver.savepoint():
+                for i, query in enumerate(executable_query_list):
+                    query.execute()
         except Exception as e:
-            self.driver.rollback()
             raise RuntimeError(f"バルクindex={i}, query(placeholderじゃない部分)={query} failed: {e}") from e
 
-        self.driver.commit()
-
         timer.finish("バルクquery時間")
 
     def select(
@@ -431,6 +759,7 @@ class Table:
         limit: int | None = None,
         is_from: bool = True,
         is_execute: bool = True,
+        is_cache: bool = False,
         time_log: utils.LogLike | None = None,
     ) -> Select:
         """
@@ -439,7 +768,61 @@ class Table:
         クエリ・パラメータ例:
         'SELECT * FROM work WHERE id = :p0'
         {'p0': 3}
+
+        is_cacheなら結果をdriver.result_cacheにキャッシュし、同じSQLとパラメータならテーブルに書き込まれるまで使い回す(全行をメモリに載せる)
         """
+        value_list = []
+        try:
+            statement_key = (
+                "select",
+                self.name,
+                *[
+                    self._get_statement_key_part(part, value_list)
+                    for part in [expression, join, where, group_by, having, order_by]
+                ],
+                limit,
+                is_from,
+            )
+            statement = self.driver.statement_cache.get(statement_key)
+        except TypeError:
+            # キャッシュできない式が含まれている場合はQueryBuilderに任せる
+            statement_key = None
+            statement = None
+
+        if statement is None:
+            select = self._build_select(expression, where, join, group_by, order_by, having, limit, is_from)
+            if not statement_key is None:
+                self.driver.statement_cache.set(
+                    statement_key,
+                    select.string_list,
+                    select.compile()[0],
+                    select_type=select.select_type,
+                    temp_value_table_list=select.temp_value_table_list,
+                )
+        else:
+            # 同じ形のクエリなら値だけ差し替える
+            select = Select.from_compiled(statement, value_list, self.driver)
+            select.set_select_type(dataclasses.replace(statement.extra["select_type"]))
+
+        select.set_column_list(self._get_projected_column_list(expression))
+        select.set_is_cache(is_cache)
+
+        if is_execute:
+            select.execute(time_log=time_log)
+
+        return select
+
+    def _build_select(
+        self,
+        expression: list[expressions.Expression | Literal[1]] | expressions.Expression | Literal[1] | None,
+        where: conds.Cond | None,
+        join: list[Join] | Join | None,
+        group_by: list[Column] | Column | None,
+        order_by: list[OrderBy] | OrderBy | None,
+        having: conds.Cond | None,
+        limit: int | None,
+        is_from: bool,
+    ) -> Select:
         query_builder = SelectQueryBuilder(self.driver)
         # 最初のクエリ
         head_query = query_builder.get_head_query()
@@ -486,7 +869,39 @@ class Table:
 
         select.straight_set(select_base)
 
-        if is_execute:
-            select.execute(time_log=time_log)
-
         return select
+
+    def _get_projected_column_list(
+        self, expression: list[expressions.Expression | Literal[1]] | expressions.Expression | Literal[1] | None
+    ) -> list[Column | None] | None:
+        """式の各要素のうちカラムはそのまま、それ以外はNone。'SELECT *'ならNone"""
+        if expression is None:
+            return None
+        if not isinstance(expression, list):
+            expression = [expression]
+        return [element if isinstance(element, Column) else None for element in expression]
+
+    def _get_insert_statement_key(self, record: list[Field], is_returning_id: bool) -> tuple:
+        """insertの形。カラム名とupsertの組み合わせ、RETURNINGの有無で決まる"""
+        return (
+            "insert",
+            self.name,
+            tuple((field_.column.name.name, field_.upsert) for field_ in record),
+            is_returning_id,
+        )
+
+    def _get_statement_key_part(self, part, value_list: list):
+        """
+        StatementCacheのキーの一部を作る。Queryオブジェクトはその文字列部分(構造)をキーにし、値はvalue_listに追記する。
+        キーにできないものが来たらTypeError
+        """
+        if part is None or isinstance(part, bool | int | str):
+            return part
+        if isinstance(part, Column):
+            return part.name.__str__()
+        if isinstance(part, Query):
+            value_list.extend(part.value_list)
+            return (part.__class__.__name__, tuple(part.string_list))
+        if isinstance(part, list):
+            return tuple(self._get_statement_key_part(element, value_list) for element in part)
+        raise TypeError(f"{part}はStatementCacheのキーにできません。")
@@ -1,6 +1,7 @@
 from pathlib import Path
 import datetime
 import sqlite3
+from typing import Callable
 
 from sql_module import exceptions
 
@@ -99,3 +100,142 @@ def _get_placeholder_string(string: Path | str, is_placeholder: bool):
     if is_placeholder:
         return f"{string}"
     return f"'{string}'"
+
+
+def get_sql_encoder(
+    python_type: type, is_not_null: bool = False
+) -> Callable[[str | int | bytes | Path | datetime.date | None], str | int | sqlite3.Binary | None]:
+    """
+    pythonの型に特化した、プレースホルダ用の値の変換関数(エンコーダ)を取得
+    get_sql_valueと同じ変換をするが、型の分岐はここで1回だけ済ませ、よくある値(intにint, strにstr)は素通しする
+    """
+    if python_type in [datetime.date, datetime.datetime]:
+        encoder = _encode_datetime
+    elif python_type in [str, Path]:
+        encoder = _encode_str
+    elif python_type in [bytes]:
+        encoder = _encode_bytes
+    elif python_type in [int, bool]:
+        encoder = _encode_int
+    else:
+        raise exceptions.SQLTypeError(f"値の型: {python_type}はSQLの型に変換できません。")
+
+    if is_not_null:
+
+        def not_null_encoder(python_value):
+            if python_value is None:
+                raise exceptions.SQLValueError(
+                    "not_nullが適用されたカラムでNoneは挿入不可で、whereで考慮する必要はないです。"
+                )
+            return encoder(python_value)
+
+        return not_null_encoder
+
+    def nullable_encoder(python_value):
+        if python_value is None:
+            return None
+        return encoder(python_value)
+
+    return nullable_encoder
+
+
+def _encode_int(python_value: int) -> int:
+    # 素通し
+    if python_value.__class__ is int:
+        return python_value
+    # (type, value)の組み合わせが(int, int), (int, bool), (bool, int), (bool, bool)でok。boolはintのサブクラス。
+    if isinstance(python_value, bool):
+        return int(python_value)  # True -> 1, False -> 0
+    if isinstance(python_value, int):
+        return python_value
+    raise exceptions.SQLTypeError(
+        f"sqliteのint系カラムに、入力した型: {python_value.__class__.__name__} は対応していません。"
+    )
+
+
+def _encode_str(python_value: str | Path) -> str:
+    # 素通し
+    if python_value.__class__ is str:
+        return python_value
+    # (type, value)の組み合わせが(str, str), (str, Path), (Path, str), (Path, Path)でok
+    if isinstance(python_value, str | Path):
+        return f"{python_value}"
+    raise exceptions.SQLTypeError(
+        f"sqliteのstr系カラムに、入力した型: {python_value.__class__.__name__} は対応していません。"
+    )
+
+
+def _encode_bytes(python_value: bytes) -> sqlite3.Binary:
+    if isinstance(python_value, bytes):
+        return sqlite3.Binary(python_value)
+    raise exceptions.SQLTypeError(
+        f"sqliteのbytes系カラムに、入力した型: {python_value.__class__.__name__} は対応していません。"
+    )
+
+
+def _encode_datetime(python_value: datetime.date | str) -> str:
+    # microsecondやtimezoneがあったら取り除きながら datetime.datetime(2026, 1, 28, 3, 21, 53) -> '2026-01-28 03:21:53'
+    # strftimeより、isoformatの先頭19文字('%Y-%m-%d %H:%M:%S'と同じ形)を取るほうがずっと速い
+    if isinstance(python_value, datetime.datetime):
+        return python_value.isoformat(" ", "seconds")[:19]
+    # datetime.date(2026, 1, 28) -> '2026-01-28 00:00:00'
+    if isinstance(python_value, datetime.date):
+        return f"{python_value.isoformat()} 00:00:00"
+    if isinstance(python_value, str):
+        # CURRENT_TIMESTAMPの場合
+        if python_value == "CURRENT_TIMESTAMP":
+            raise exceptions.SQLValueError("プレースホルダで'CURRENT_TIMESTAMP'を使用できません。")
+        # バリデーション。fromisoformatで読んで、書き戻したものと一致すれば'%Y-%m-%d %H:%M:%S'形式でかつ範囲もok
+        try:
+            if (
+                python_value.__len__() == 19
+                and datetime.datetime.fromisoformat(python_value).isoformat(" ") == python_value
+            ):
+                return python_value
+        except ValueError:
+            pass
+        raise exceptions.SQLValueError(
+            "sqliteのdatetime.date系カラムに入力できる文字列はISO形式の'%Y-%m-%d %H:%M:%S'形式で、さらに範囲も合っている必要があります。"
+        )
+    # 非対応
+    raise exceptions.SQLTypeError(
+        f"sqliteのdatetime.date系カラムに、入力した型: {python_value.__class__.__name__} は対応していません。"
+    )
+
+
+def get_python_decoder(python_type: type) -> Callable[[str | int | bytes], object] | None:
+    """
+    fetchしたsqlの値をpythonの型に戻す変換関数(デコーダ)を取得。変換不要(int, str, bytes)ならNone
+    datetime系はTEXT('%Y-%m-%d %H:%M:%S'), boolはINTEGER(0/1)で保存しているので戻す
+    """
+    if python_type == datetime.datetime:
+        return datetime.datetime.fromisoformat
+    if python_type == datetime.date:
+        return _decode_date
+    if python_type == bool:
+        return bool
+    if python_type == Path:
+        return Path
+    return None
+
+
+def _decode_date(sql_value: str) -> datetime.date:
+    # '2026-01-28 00:00:00' -> datetime.date(2026, 1, 28)
+    return datetime.date.fromisoformat(sql_value[:10])
+
+
+def decode_row_list(
+    row_list: list[tuple] | list[sqlite3.Row], decoder_list: list[Callable[[str | int | bytes], object] | None]
+) -> list[tuple]:
+    """
+    fetchした行のリストを、カラムごとのデコーダでまとめて変換
+    行 -> 列に転置して、デコーダがある列だけ変換してから行に戻すので、セルごとに型で分岐しない
+    """
+    index_decoder_list = [(i, decoder) for i, decoder in enumerate(decoder_list) if not decoder is None]
+    if index_decoder_list.__len__() == 0 or row_list.__len__() == 0:
+        return [tuple(row) for row in row_list]
+
+    column_value_list = list(zip(*row_list))
+    for i, decoder in index_decoder_list:
+        column_value_list[i] = [value if value is None else decoder(value) for value in column_value_list[i]]
+    return list(zip(*column_value_list))
@@ -0,0 +1,93 @@
+from dataclasses import dataclass, field
+from collections import OrderedDict
+import hashlib
+import sqlite3
+
+# 一時テーブル名の頭
+TEMP_VALUE_TABLE_PREFIX = "sql_module_in_"
+
+
+class TempValueTable:
+    """
+    ロープ上の値の一時テーブル(conds.In / NotInのtemp_table)。展開すると'temp.sql_module_in_xxx'になる
+    テーブルは組み立てるときには作らず、このノードを含むクエリを実行する直前にdriverが作る
+    (tempスキーマはコネクションごとなので、そのクエリは書き込み用コネクションで実行する)
+    """
+
+    __slots__ = ("table_name", "value_list")
+
+    def __init__(self, value_list: list):
+        # sqlite3.Binary(memoryview)のreprは中身を含まないのでbytesにする
+        hash_value_list = [bytes(value) if isinstance(value, memoryview) else value for value in value_list]
+        digest = hashlib.sha1(repr(hash_value_list).encode()).hexdigest()[:16]
+        self.table_name = f"temp.{TEMP_VALUE_TABLE_PREFIX}{digest}"
+        self.value_list = value_list
+
+
+@dataclass
+class TempValueTableCache:
+    """
+    書き込み用コネクションのtempスキーマに作った値の一時テーブル
+    中身のハッシュが同じなら使い回し、max_size個を超えたら古いものから消す(実行中のクエリが使うものは消さない)
+    メソッドはどれも書き込み用コネクションのロックの中で呼ぶ
+    """
+
+    max_size: int = 8
+    _name_dict: OrderedDict = field(default_factory=OrderedDict, repr=False)
+
+    def __len__(self) -> int:
+        return self._name_dict.__len__()
+
+    def prepare(self, conn: sqlite3.Connection, temp_value_table_list: list[TempValueTable]):
+        """クエリを実行する直前に、まだない一時テーブルを作って値を入れる"""
+        is_in_transaction = conn.in_transaction
+        for temp_value_table in temp_value_table_list:
+            table_name = temp_value_table.table_name
+            if table_name in self._name_dict:
+                self._name_dict.move_to_end(table_name)
+                continue
+            conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {table_name.removeprefix('temp.')} (value PRIMARY KEY)")
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {table_name} (value) VALUES (?)",
+                ((value,) for value in temp_value_table.value_list),
+            )
+            self._name_dict[table_name] = True
+        # tempスキーマへの書き込みだけで暗黙のトランザクションを残さない
+        if not is_in_transaction and conn.in_transaction:
+            conn.commit()
+        self._drop_old(conn, {temp_value_table.table_name for temp_value_table in temp_value_table_list})
+
+    def _drop_old(self, conn: sqlite3.Connection, keep_name_set: set[str]):
+        for table_name in list(self._name_dict):
+            if self._name_dict.__len__() <= self.max_size:
+                return
+            if table_name in keep_name_set:
+                continue
+            del self._name_dict[table_name]
+            try:
+                conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+            except sqlite3.OperationalError:
+                # まだ読んでいる途中のcursorがある。コネクションを閉じれば消える
+                pass
+
+    def sync(self, conn: sqlite3.Connection):
+        """
+        rollback, ROLLBACK TOのあと。取り消されたCREATE, DROPに合わせて、実際にある一時テーブルに揃える
+        (消えたテーブルを使い回すと'no such table'になる)
+        """
+        name_set = set()
+        for row in conn.execute("SELECT name FROM temp.sqlite_master WHERE type = 'table'").fetchall():
+            if row[0].startswith(TEMP_VALUE_TABLE_PREFIX):
+                name_set.add(f"temp.{row[0]}")
+        for table_name in list(self._name_dict):
+            if not table_name in name_set:
+                del self._name_dict[table_name]
+        # 取り消されたDROPで戻ってきたものは、いちばん古い扱いにする
+        for table_name in name_set:
+            if not table_name in self._name_dict:
+                self._name_dict[table_name] = True
+                self._name_dict.move_to_end(table_name, last=False)
+
+    def clear(self):
+        """コネクションを閉じたとき(tempスキーマごと消える)"""
+        self._name_dict.clear()
@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+from concurrent.futures import Future
+from typing import Callable
+import queue
+import threading
+import time
+
+from sql_module import Driver, Field, Table, TableDefinition, conds
+
+
+@dataclass
+class WriteJob:
+    func: Callable[[], object]
+    future: Future
+    enqueued_at: float
+
+
+@dataclass
+class WriteQueue:
+    """
+    書き込みをためて、1つの書き込みスレッドでまとめてトランザクションで実行するキュー(write-behind)
+    1行ごとにコミット(fsync)しないので、複数のスレッドから大量にinsertするときに速く、'database is locked'にもなりにくい
+    max_batch_size件たまるか、最初の1件からmax_latency_sec経ったらコミットする
+
+    例:
+    write_queue = database.get_write_queue()
+    future = write_queue.insert(post, [Field(post.content_column, "うな")], is_returning_id=True)
+    post_id = future.result()  # コミットされるまで待つ
+    """
+
+    driver: Driver
+    max_batch_size: int = 1000
+    max_latency_sec: float = 0.05
+
+    def __post_init__(self):
+        self._job_queue: queue.Queue[WriteJob | None] = queue.Queue()
+        self._is_closed = False
+        self._thread = threading.Thread(target=self._run, name="sql_module_write_queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, func: Callable[[], object]) -> Future:
+        """
+        書き込みスレッドのトランザクション内でfuncを実行する。funcの戻り値はコミット後にFutureに入る
+        funcの中のコミット(bulk_insertなど)はバッチのコミットまで待つ
+        """
+        if self._is_closed:
+            raise RuntimeError("閉じたWriteQueueには追加できません。")
+        future = Future()
+        self._job_queue.put(WriteJob(func, future, time.monotonic()))
+        return future
+
+    def insert(
+        self, table: Table | TableDefinition, record: list[Field] | Field, is_returning_id: bool = False
+    ) -> Future:
+        """行を挿入するのを予約。is_returning_idならFutureの結果はid"""
+
+        def insert_job() -> int | None:
+            table.insert(record, is_commit=False, is_returning_id=is_returning_id)
+            if is_returning_id:
+                # fetch_idはコミットしてしまうので、直接fetchする
+                return self.driver.fetchone()["id"]
+            return None
+
+        return self.submit(insert_job)
+
+    def update(
+        self,
+        table: Table | TableDefinition,
+        record: list[Field] | Field,
+        where: conds.Cond | None = None,
+        non_where_safe: bool = True,
+    ) -> Future:
+        """行を更新するのを予約"""
+
+        def update_job():
+            table.update(record, where, non_where_safe, is_commit=False)
+
+        return self.submit(update_job)
+
+    def flush(self, timeout_sec: float | None = None):
+        """ここまでに予約した書き込みがコミットされるまで待つ"""
+        self.submit(lambda: None).result(timeout_sec)
+
+    def close(self):
+        """残りをコミットしてから書き込みスレッドを止める"""
+        if self._is_closed:
+            return
+        self._is_closed = True
+        self._job_queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._job_queue.get()
+            if job is None:
+                return
+            job_list = [job]
+            is_closing = False
+            deadline = job.enqueued_at + self.max_latency_sec
+            # 最初の1件からmax_latency_sec以内に来たものはまとめる
+            while job_list.__len__() < self.max_batch_size:
+                try:
+                    job = self._job_queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if job is None:
+                    is_closing = True
+                    break
+                job_list.append(job)
+
+            self._execute_batch(job_list)
+            if is_closing:
+                return
+
+    def _execute_batch(self, job_list: list[WriteJob]):
+        """job_listを1トランザクションで実行。ジョブごとにSAVEPOINTを切るので、失敗したジョブだけ取り消す"""
+        result_list = []
+        try:
+            with self.driver.transaction():
+                for job in job_list:
+                    try:
+                        with self.driver.savepoint():
+                            result_list.append((job, job.func(), None))
+                    except Exception as e:
+                        result_list.append((job, None, e))
+        except Exception as e:
+            # コミットできなかったらまとめて失敗
+            for job in job_list:
+                job.future.set_exception(e)
+            return
+
+        for job, result, exception in result_list:
+            if exception is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(exception)
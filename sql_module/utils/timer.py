@@ -12,10 +12,11 @@ class Timer:
     time_log: utils.LogLike | None = None
 
     def __post_init__(self):
-        self.start = time.time()
+        # time.time()は時計合わせで戻ることがあるので、経過時間は単調なperf_counterで
+        self.start = time.perf_counter()
 
     def finish(self, time_title: str, decimal_places: int = 6, limit_warning_sec: int = 5):
-        self.end = time.time()
+        self.end = time.perf_counter()
         if not self.time_log is None:
             # 結果をログる
             result_time = self.end - self.start
@@ -0,0 +1,50 @@
+import pytest
+
+import sql_module
+from sql_module import Field, RecordBatch
+
+
+class User(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.rest_id_column = self.get_column("rest_id", str, unique=True)
+        self.screen_name_column = self.get_column("screen_name", str, unique=True)
+
+
+@pytest.fixture
+def user() -> User:
+    database = sql_module.SQLiteDataBase()
+    user = database.get_table_definition(User)
+    user.create()
+    user.insert([Field(user.rest_id_column, "r1"), Field(user.screen_name_column, "alice")])
+    assert user.resolve_ids(user.screen_name_column, ["alice"]) == {"alice": 1}
+    return user
+
+
+def rename_and_reuse(user: User, rename):
+    """r1をbobに変えて(DO UPDATE)、空いたaliceをr2で使う"""
+    rename([Field(user.rest_id_column, "r1", True), Field(user.screen_name_column, "bob")])
+    user.insert([Field(user.rest_id_column, "r2"), Field(user.screen_name_column, "alice")])
+    assert user.resolve_ids(user.screen_name_column, ["alice", "bob"]) == {"alice": 2, "bob": 1}
+
+
+def test_insert_do_update(user: User):
+    rename_and_reuse(user, user.insert)
+
+
+@pytest.mark.parametrize("strategy", ["executemany", "multi_value"])
+def test_bulk_insert_do_update(user: User, strategy: str):
+    rename_and_reuse(user, lambda record: user.bulk_insert([record], strategy))
+
+
+def test_bulk_upsert(user: User):
+    rename_and_reuse(user, lambda record: user.bulk_upsert([record], user.rest_id_column))
+
+
+def test_do_nothing_keeps_cache(user: User):
+    """ただのinsertとDO NOTHINGは既にある行を変えないので、キャッシュを使い続ける"""
+    user.insert([Field(user.rest_id_column, "r2"), Field(user.screen_name_column, "carol")])
+    user.bulk_upsert(RecordBatch([user.screen_name_column], row_list=[("alice",)]), user.screen_name_column)
+    resolver = user.table.driver.id_resolver_cache.get_resolver("user", "screen_name")
+    lookup_count = resolver.stats.lookup_count
+    assert user.resolve_ids(user.screen_name_column, ["alice"]) == {"alice": 1}
+    assert resolver.stats.lookup_count == lookup_count
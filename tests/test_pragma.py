@@ -0,0 +1,33 @@
+import sql_module
+
+PRAGMA_NAME_LIST = ["synchronous", "cache_size", "mmap_size", "wal_autocheckpoint", "busy_timeout"]
+
+
+def get_writer_pragma_dict(database: sql_module.SQLiteDataBase) -> dict:
+    return {pragma_name: database.get_pragma(pragma_name) for pragma_name in PRAGMA_NAME_LIST}
+
+
+def get_reader_pragma_dict(database: sql_module.SQLiteDataBase) -> dict:
+    reader_pool = database.driver.reader_pool
+    return {
+        pragma_name: reader_pool.get_cursor().execute(f"PRAGMA {pragma_name}").fetchone()[0]
+        for pragma_name in PRAGMA_NAME_LIST
+    }
+
+
+def test_timeout_sec_with_profile(tmp_path):
+    """プロファイルがtimeout_secを上書きしない"""
+    database = sql_module.SQLiteDataBase(tmp_path / "test.db", timeout_sec=30, pragma_profile="balanced")
+    assert database.get_pragma("busy_timeout") == 30000
+
+
+def test_switch_profile(tmp_path):
+    """前のプロファイルにしかないPRAGMAはデフォルトに戻り、借りている読み取り用コネクションにも効く"""
+    default_database = sql_module.SQLiteDataBase(tmp_path / "default.db")
+    default_pragma_dict = get_writer_pragma_dict(default_database)
+
+    database = sql_module.SQLiteDataBase(tmp_path / "test.db", reader_count=2, pragma_profile="bulk_load")
+    assert get_reader_pragma_dict(database)["mmap_size"] == 1024 * 1024 * 1024
+    database.set_pragma_profile("durable")
+    assert get_writer_pragma_dict(database) == default_pragma_dict
+    assert get_reader_pragma_dict(database) == default_pragma_dict
@@ -0,0 +1,55 @@
+import threading
+
+import sql_module
+
+JOIN_TIMEOUT_SEC = 10
+
+
+class Post(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.content_column = self.get_column("content", str)
+
+
+def run_two_threads(database: sql_module.SQLiteDataBase, func):
+    """transactionのブロック内のスレッドと、ブロック外のスレッドで同時にfuncを呼ぶ。止まったらFalse"""
+    barrier = threading.Barrier(2)
+    error_list = []
+
+    def in_transaction():
+        try:
+            with database.driver.transaction():
+                barrier.wait()
+                for _ in range(100):
+                    func()
+        except Exception as e:
+            error_list.append(e)
+
+    def out_of_transaction():
+        try:
+            barrier.wait()
+            for _ in range(100):
+                func()
+        except Exception as e:
+            error_list.append(e)
+
+    thread_list = [
+        threading.Thread(target=in_transaction, daemon=True),
+        threading.Thread(target=out_of_transaction, daemon=True),
+    ]
+    for thread in thread_list:
+        thread.start()
+    for thread in thread_list:
+        thread.join(JOIN_TIMEOUT_SEC)
+    assert error_list == []
+    return not any(thread.is_alive() for thread in thread_list)
+
+
+def test_exists_in_and_out_of_transaction():
+    """transactionのブロック(書き込み用コネクションのロック) -> カタログのロック の順と、逆の順で止まらない"""
+    database = sql_module.SQLiteDataBase()
+    post = database.get_table_definition(Post)
+    post.create()
+    database.driver.schema_catalog.clear()
+
+    assert run_two_threads(database, post.table.exists)
+
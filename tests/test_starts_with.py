@@ -0,0 +1,62 @@
+import re
+
+import pytest
+
+import sql_module
+from sql_module import RecordBatch, conds
+
+# 'SEARCH account USING INDEX ...', 'SEARCH account USING COVERING INDEX ...'
+SEARCH_INDEX_PATTERN = re.compile(r"SEARCH account USING (COVERING )?INDEX")
+SCREEN_NAME_LIST = ["user_1", "user_12", "userX1", "USER_2", "user_%x", "user%y", "\U0010ffff", "\U0010ffffx", "z"]
+
+
+class Account(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.screen_name_column = self.get_column("screen_name", str, not_null=True, unique=True)
+        self.nocase_screen_name_column = self.get_column("nocase_screen_name", str, not_null=True, collate="NOCASE")
+
+
+@pytest.fixture
+def account() -> Account:
+    database = sql_module.SQLiteDataBase()
+    account = database.get_table_definition(Account)
+    account.create()
+    account.create_index(account.nocase_screen_name_column)
+    row_list = [(screen_name, screen_name) for screen_name in SCREEN_NAME_LIST]
+    account.bulk_insert(RecordBatch([account.screen_name_column, account.nocase_screen_name_column], row_list=row_list))
+    return account
+
+
+def get_plan(account: Account, where: conds.Cond) -> str:
+    select = account.select(account.id_column, where, is_execute=False)
+    return " / ".join(row["detail"] for row in select.view_plan())
+
+
+def select_screen_name_list(account: Account, where: conds.Cond) -> list[str]:
+    return sorted(account.select(account.screen_name_column, where).fetchall_value_list())
+
+
+def test_range_uses_index(account: Account):
+    plan = get_plan(account, conds.StartsWith(account.screen_name_column, "user_1", is_range=True))
+    assert not SEARCH_INDEX_PATTERN.search(plan) is None, plan
+
+
+def test_nocase_like_uses_index(account: Account):
+    plan = get_plan(account, conds.StartsWith(account.nocase_screen_name_column, "user_1"))
+    assert not SEARCH_INDEX_PATTERN.search(plan) is None, plan
+
+
+@pytest.mark.parametrize("prefix", ["user_", "user_%", "user%", "\U0010ffff"])
+def test_result(account: Account, prefix: str):
+    """%, _はワイルドカードにならず、U+10FFFFの前方一致(範囲の上限がない)も取りこぼさない"""
+    expected_list = sorted(screen_name for screen_name in SCREEN_NAME_LIST if screen_name.startswith(prefix))
+    expected_nocase_list = sorted(
+        screen_name for screen_name in SCREEN_NAME_LIST if screen_name.lower().startswith(prefix.lower())
+    )
+
+    range_where = conds.StartsWith(account.screen_name_column, prefix, is_range=True)
+    nocase_like_where = conds.StartsWith(account.nocase_screen_name_column, prefix)
+    nocase_range_where = conds.StartsWith(account.nocase_screen_name_column, prefix, is_range=True)
+    assert select_screen_name_list(account, range_where) == expected_list
+    assert select_screen_name_list(account, nocase_like_where) == expected_nocase_list
+    assert select_screen_name_list(account, nocase_range_where) == expected_nocase_list
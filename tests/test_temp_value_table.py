@@ -0,0 +1,48 @@
+import pytest
+
+import sql_module
+from sql_module import RecordBatch, conds
+
+
+class Post(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.content_column = self.get_column("content", str)
+
+
+def get_database() -> tuple[sql_module.SQLiteDataBase, Post]:
+    database = sql_module.SQLiteDataBase()
+    post = database.get_table_definition(Post)
+    post.create()
+    post.bulk_insert(RecordBatch([post.content_column], row_list=[(str(i),) for i in range(100)]))
+    return database, post
+
+
+def select_in(post: Post, value_list: list[str], is_execute: bool = True):
+    where = conds.In(post.content_column, value_list, strategy="temp_table")
+    return post.select(post.id_column, where, is_execute=is_execute)
+
+
+def test_after_rollback():
+    """ロールバックで消えた一時テーブルを使い回さない"""
+    database, post = get_database()
+    value_list = [str(i) for i in range(40)]
+    with pytest.raises(ValueError):
+        with database.driver.transaction():
+            assert select_in(post, value_list).fetchall().__len__() == 40
+            raise ValueError
+    assert select_in(post, value_list).fetchall().__len__() == 40
+
+
+def test_build_without_execute():
+    """組み立てただけでは一時テーブルを作らず、max_sizeより多く組み立てても実行するときにある"""
+    database, post = get_database()
+    select_list = [select_in(post, [str(i), str(i + 1)], is_execute=False) for i in range(20)]
+    assert database.driver.temp_value_table_cache.__len__() == 0
+
+    for select in select_list:
+        select.execute()
+        assert select.fetchall().__len__() == 2
+    assert database.driver.temp_value_table_cache.__len__() == database.driver.temp_value_table_cache.max_size
+    # 消されたものは作り直す
+    select_list[0].execute()
+    assert select_list[0].fetchall().__len__() == 2
@@ -0,0 +1,42 @@
+import pytest
+
+import sql_module
+from sql_module import Field, exceptions
+
+
+class Post(sql_module.IDTableDefinition):
+    def set_colmun_difinition(self):
+        self.content_column = self.get_column("content", str)
+
+
+def get_database() -> tuple[sql_module.SQLiteDataBase, Post]:
+    database = sql_module.SQLiteDataBase()
+    post = database.get_table_definition(Post)
+    post.create()
+    return database, post
+
+
+def test_rollback_in_transaction():
+    """ブロック内のrollbackを黙って無視して、ブロックを抜けたときにコミットしない"""
+    database, post = get_database()
+    with pytest.raises(exceptions.DefenseAccidentException):
+        with database.driver.transaction():
+            post.insert(Field(post.content_column, "x"))
+            database.driver.rollback()
+    assert post.select(post.content_column).fetchall_value_list() == []
+
+
+def test_transaction_after_uncommitted_write():
+    """ブロックの前のコミットしていない書き込みに相乗りして、ブロックのロールバックで一緒に消さない"""
+    database, post = get_database()
+    post.insert(Field(post.content_column, "before"), is_commit=False)
+    with pytest.raises(exceptions.DefenseAccidentException):
+        with database.driver.transaction():
+            pass
+    database.driver.commit()
+
+    with pytest.raises(ValueError):
+        with database.driver.transaction():
+            post.insert(Field(post.content_column, "in"))
+            raise ValueError
+    assert post.select(post.content_column).fetchall_value_list() == ["before"]